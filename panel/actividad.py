@@ -0,0 +1,144 @@
+# panel/actividad.py
+"""
+Escritura agrupada de `RegistroActividad`.
+
+Las actividades no se insertan una a una: se acumulan durante la petición
+(ver `panel.middleware.RegistroActividadMiddleware`) o dentro de un bloque
+`agrupar()` y al terminar se guardan todas con un único `bulk_create`. Las
+que se registran dentro de una transacción solo entran en el grupo cuando
+esta se confirma, así que una transacción revertida no deja registros.
+Fuera de un grupo cada actividad se escribe al confirmarse.
+
+Con `PANEL_REGISTRO_EN_SEGUNDO_PLANO = True` los lotes no se escriben en la
+petición sino que pasan a un hilo que los inserta cada pocos segundos. Al
+salir el proceso de forma normal (`atexit`) el hilo vacía la cola antes de
+terminar, de modo que no se pierden actividades.
+"""
+import atexit
+import queue
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError, close_old_connections, connection, transaction
+
+from .models import RegistroActividad
+
+# Segundos que el hilo espera antes de escribir lo acumulado y tamaño máximo del lote.
+INTERVALO_SEGUNDOS = 2
+LOTE_MAXIMO = 500
+
+_local = threading.local()
+
+
+def nueva_actividad(actor, accion, content_object=None, modelo=None, object_id=None):
+    """Construye (sin guardar) un `RegistroActividad`; el tipo de contenido sale de la caché de Django."""
+    if content_object is not None:
+        modelo, object_id = content_object, content_object.pk
+    actividad = RegistroActividad(actor=actor, accion=accion, object_id=object_id)
+    if modelo is not None:
+        actividad.content_type = ContentType.objects.get_for_model(modelo)
+    return actividad
+
+
+def registrar(actividades):
+    """Encola actividades para guardarlas cuando se confirme la transacción actual."""
+    if actividades:
+        transaction.on_commit(partial(_acumular, list(actividades)))
+
+
+def _acumular(actividades):
+    pendientes = getattr(_local, 'pendientes', None)
+    if pendientes is None:
+        escribir(actividades)
+    else:
+        pendientes.extend(actividades)
+
+
+@contextmanager
+def agrupar():
+    """Acumula las actividades registradas dentro del bloque y las guarda juntas al salir."""
+    if getattr(_local, 'pendientes', None) is not None:
+        # Ya hay un grupo abierto más arriba: él se encarga de escribir.
+        yield
+        return
+    _local.pendientes = []
+    try:
+        yield
+    finally:
+        pendientes, _local.pendientes = _local.pendientes, None
+        escribir(pendientes)
+
+
+def escribir(actividades):
+    if not actividades:
+        return
+    if getattr(settings, 'PANEL_REGISTRO_EN_SEGUNDO_PLANO', False):
+        _escritor().cola.put(actividades)
+    else:
+        _guardar(actividades)
+
+
+def _guardar(actividades):
+    try:
+        RegistroActividad.objects.bulk_create(actividades, batch_size=LOTE_MAXIMO)
+    except DatabaseError:
+        # El registro de actividad nunca debe romper la operación que se registra.
+        pass
+
+
+class EscritorEnSegundoPlano(threading.Thread):
+    """Hilo que inserta por lotes las actividades que recibe por su cola."""
+
+    _FIN = object()
+
+    def __init__(self):
+        super().__init__(name='registro-actividad', daemon=True)
+        self.cola = queue.Queue()
+
+    def run(self):
+        terminar = False
+        while not terminar:
+            try:
+                elemento = self.cola.get(timeout=INTERVALO_SEGUNDOS)
+            except queue.Empty:
+                continue
+            lote = []
+            while True:
+                if elemento is self._FIN:
+                    terminar = True
+                    break
+                lote.extend(elemento)
+                if len(lote) >= LOTE_MAXIMO:
+                    break
+                try:
+                    elemento = self.cola.get_nowait()
+                except queue.Empty:
+                    break
+            if lote:
+                close_old_connections()
+                _guardar(lote)
+        connection.close()
+
+    def detener(self):
+        """Pide al hilo que escriba lo pendiente y espera a que termine."""
+        self.cola.put(self._FIN)
+        self.join()
+
+
+_hilo = None
+_lock = threading.Lock()
+
+
+def _escritor():
+    global _hilo
+    if _hilo is None:
+        with _lock:
+            if _hilo is None:
+                hilo = EscritorEnSegundoPlano()
+                hilo.start()
+                atexit.register(hilo.detener)
+                _hilo = hilo
+    return _hilo
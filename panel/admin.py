@@ -4,12 +4,18 @@ from django.contrib import messages
 from django.contrib.admin.models import LogEntry, ADDITION, CHANGE, DELETION
 from django.contrib.auth import get_user_model
 from django.utils.encoding import force_str
+from django.db import transaction
 from django.utils import timezone
 
+from . import estadisticas
 from .models import RegistroActividad
 
 User = get_user_model()
 
+# Objetos que se borran por transacción en las eliminaciones masivas del admin.
+# Las que no lo superan se hacen en una única transacción.
+LOTE_ELIMINACION = 1000
+
 class ActivityLogAdmin(admin.ModelAdmin):
     list_display = ('accion', 'content_object', 'content_type', 'object_id', 'actor', 'timestamp')
     list_filter = ('content_type', 'timestamp')
@@ -78,26 +84,52 @@ class ActivityLogMixin:
         
         super().delete_model(request, obj)
 
+    def log_deletion(self, request, obj, object_repr):
+        # `delete_model` y `delete_queryset` ya escriben el LogEntry de cada
+        # objeto; el que Django añade antes de llamarlos sería un duplicado.
+        return None
+
     def delete_queryset(self, request, queryset):
-        # Registrar eliminación múltiple
-        for obj in queryset:
-            RegistroActividad.objects.create(
-                actor=request.user,
-                accion=f"{obj._meta.verbose_name} eliminado: {str(obj)}",
-                content_object=obj
-            )
-            
-            # Registrar en el log de Django
-            LogEntry.objects.log_action(
-                user_id=request.user.id,
-                content_type_id=ContentType.objects.get_for_model(obj).pk,
-                object_id=obj.pk,
-                object_repr=str(obj),
-                action_flag=DELETION,
-                change_message=''
-            )
-        
-        super().delete_queryset(request, queryset)
+        # Registrar eliminación múltiple: los registros se construyen en memoria
+        # y se insertan con un bulk_create por tabla. Hasta LOTE_ELIMINACION
+        # objetos todo va en una sola transacción. Por encima se borra por
+        # lotes, cada uno en su transacción, para que una acción masiva no
+        # agote el tiempo: si un lote falla, los anteriores ya quedaron
+        # borrados (la eliminación no es todo o nada).
+        content_type_id = ContentType.objects.get_for_model(queryset.model).pk
+        pks = list(queryset.values_list('pk', flat=True))
+        if len(pks) <= LOTE_ELIMINACION:
+            lotes = [queryset]
+        else:
+            lotes = [
+                queryset.filter(pk__in=pks[i:i + LOTE_ELIMINACION])
+                for i in range(0, len(pks), LOTE_ELIMINACION)
+            ]
+        for lote in lotes:
+            # Las estadísticas diarias de las filas borradas se descuentan sumadas.
+            with transaction.atomic(), estadisticas.agrupar():
+                objetos = list(lote)
+                RegistroActividad.objects.bulk_create([
+                    RegistroActividad(
+                        actor=request.user,
+                        accion=f"{obj._meta.verbose_name} eliminado: {str(obj)}",
+                        content_type_id=content_type_id,
+                        object_id=obj.pk,
+                    )
+                    for obj in objetos
+                ])
+                LogEntry.objects.bulk_create([
+                    LogEntry(
+                        user_id=request.user.id,
+                        content_type_id=content_type_id,
+                        object_id=str(obj.pk),
+                        object_repr=str(obj)[:200],
+                        action_flag=DELETION,
+                        change_message='',
+                    )
+                    for obj in objetos
+                ])
+                super().delete_queryset(request, lote)
 
 # Registrar el modelo de actividades
 admin.site.register(RegistroActividad, ActivityLogAdmin)
@@ -0,0 +1,187 @@
+# panel/archivo_actividad.py
+"""
+Archivo del registro de actividad.
+
+Las entradas de `RegistroActividad` más antiguas que
+`PANEL_ACTIVIDAD_RETENCION_DIAS` se pasan a un archivo por mes (hora local)
+en `PANEL_ACTIVIDAD_ARCHIVO_DIR`, con una línea JSON por entrada y
+comprimido con gzip, y después se borran de la tabla por lotes. Así la tabla
+que consulta el panel solo guarda los últimos meses.
+
+Cada mes se reescribe entero en un archivo temporal que sustituye al
+anterior con `os.replace`, de modo que nunca queda un archivo a medias. Las
+filas se borran solo después de ese reemplazo; si el proceso se corta entre
+ambos pasos, la siguiente ejecución vuelve a leerlas y las descarta porque
+su `id` ya está en el archivo.
+
+La búsqueda en meses archivados descomprime el archivo línea a línea sin
+cargarlo entero en memoria.
+"""
+import gzip
+import json
+import os
+import re
+from collections import deque
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import RegistroActividad
+
+LOTE_BORRADO = 2000
+# Máximo de coincidencias que devuelve una búsqueda en el archivo.
+MAX_RESULTADOS = 5000
+_NOMBRE = re.compile(r'^actividad-(\d{4})-(\d{2})\.jsonl\.gz$')
+
+
+def directorio():
+    return str(getattr(settings, 'PANEL_ACTIVIDAD_ARCHIVO_DIR', os.path.join(settings.BASE_DIR, 'archivo_actividad')))
+
+
+def ruta_de_mes(mes):
+    return os.path.join(directorio(), f'actividad-{mes:%Y-%m}.jsonl.gz')
+
+
+def meses_archivados():
+    """Días 1 de los meses que tienen archivo, del más reciente al más antiguo."""
+    if not os.path.isdir(directorio()):
+        return []
+    meses = []
+    for nombre in os.listdir(directorio()):
+        coincidencia = _NOMBRE.match(nombre)
+        if coincidencia:
+            meses.append(date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1))
+    return sorted(meses, reverse=True)
+
+
+def _mes_siguiente(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _leer(ruta):
+    """Genera las entradas de un archivo mensual, descomprimiendo por líneas."""
+    with gzip.open(ruta, 'rt', encoding='utf-8') as archivo:
+        for linea in archivo:
+            if linea.strip():
+                yield json.loads(linea)
+
+
+def _entrada(fila):
+    nombre = f"{fila['actor__first_name'] or ''} {fila['actor__last_name'] or ''}".strip()
+    tipo = None
+    if fila['content_type__model']:
+        tipo = f"{fila['content_type__app_label']}.{fila['content_type__model']}"
+    return {
+        'id': fila['pk'],
+        'timestamp': fila['timestamp'].isoformat(),
+        'actor_id': fila['actor_id'],
+        # Nombre guardado tal cual: el usuario puede no existir cuando se consulte.
+        'actor': nombre or fila['actor__email'],
+        'actor_staff': bool(fila['actor__is_staff']),
+        'accion': fila['accion'],
+        'tipo': tipo,
+        'object_id': fila['object_id'],
+    }
+
+
+def _archivar_mes(mes, filas):
+    """
+    Reescribe el archivo de `mes` con sus entradas previas más `filas`.
+    Devuelve los ids de las filas que ya quedan en el archivo.
+    """
+    os.makedirs(directorio(), exist_ok=True)
+    ruta = ruta_de_mes(mes)
+    temporal = ruta + '.tmp'
+    ids = []
+    with open(temporal, 'wb') as crudo:
+        with gzip.GzipFile(fileobj=crudo, mode='wb') as comprimido:
+            previos = set()
+            if os.path.exists(ruta):
+                for entrada in _leer(ruta):
+                    previos.add(entrada['id'])
+                    comprimido.write(json.dumps(entrada, ensure_ascii=False).encode('utf-8') + b'\n')
+            for fila in filas:
+                ids.append(fila['pk'])
+                if fila['pk'] not in previos:
+                    comprimido.write(json.dumps(_entrada(fila), ensure_ascii=False).encode('utf-8') + b'\n')
+        crudo.flush()
+        os.fsync(crudo.fileno())
+    os.replace(temporal, ruta)
+    return ids
+
+
+def archivar(dias=None, lote=LOTE_BORRADO):
+    """
+    Archiva las entradas anteriores a hoy menos `dias` (por defecto
+    `PANEL_ACTIVIDAD_RETENCION_DIAS`) y las borra de la tabla.
+    Devuelve {mes: entradas archivadas}.
+    """
+    if dias is None:
+        dias = getattr(settings, 'PANEL_ACTIVIDAD_RETENCION_DIAS', 180)
+    limite = _inicio_del_dia(timezone.localdate() - timedelta(days=dias))
+    antiguas = RegistroActividad.objects.filter(timestamp__lt=limite)
+    primera = antiguas.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if primera is None:
+        return {}
+
+    resumen = {}
+    mes = timezone.localtime(primera).date().replace(day=1)
+    while _inicio_del_dia(mes) < limite:
+        siguiente = _mes_siguiente(mes)
+        del_mes = antiguas.filter(
+            timestamp__gte=_inicio_del_dia(mes), timestamp__lt=min(_inicio_del_dia(siguiente), limite)
+        )
+        if not del_mes.exists():
+            # Mes sin actividad: no se crea un archivo vacío.
+            mes = siguiente
+            continue
+        filas = (
+            del_mes.order_by('timestamp', 'pk')
+            .values(
+                'pk', 'timestamp', 'actor_id', 'accion', 'object_id',
+                'actor__first_name', 'actor__last_name', 'actor__email', 'actor__is_staff',
+                'content_type__app_label', 'content_type__model',
+            )
+        )
+        ids = _archivar_mes(mes, filas.iterator(chunk_size=lote))
+        for i in range(0, len(ids), lote):
+            with transaction.atomic():
+                RegistroActividad.objects.filter(pk__in=ids[i:i + lote]).delete()
+        if ids:
+            resumen[mes] = len(ids)
+        mes = siguiente
+    return resumen
+
+
+def buscar(mes, texto='', tipo='', fecha=None, solo_staff=True):
+    """
+    Entradas archivadas de `mes` que cumplen los filtros, de la más reciente
+    a la más antigua, como en el panel. Devuelve (entradas, truncado): se
+    guardan como mucho `MAX_RESULTADOS` coincidencias.
+    """
+    ruta = ruta_de_mes(mes)
+    if not os.path.exists(ruta):
+        return [], False
+    texto = texto.lower()
+    entradas, truncado = deque(maxlen=MAX_RESULTADOS), False
+    for entrada in _leer(ruta):
+        if solo_staff and not entrada['actor_staff']:
+            continue
+        if tipo and (entrada['tipo'] or '').rpartition('.')[2] != tipo:
+            continue
+        entrada['timestamp'] = parse_datetime(entrada['timestamp'])
+        if fecha and timezone.localtime(entrada['timestamp']).date() != fecha:
+            continue
+        if texto and texto not in entrada['accion'].lower() and texto not in (entrada['actor'] or '').lower():
+            continue
+        # Si hay más, se conservan las más recientes: el archivo está en orden cronológico.
+        truncado = truncado or len(entradas) == MAX_RESULTADOS
+        entradas.append(entrada)
+    return list(reversed(entradas)), truncado
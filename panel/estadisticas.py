@@ -0,0 +1,212 @@
+# panel/estadisticas.py
+"""
+Mantenimiento y lectura de la tabla `EstadisticaDiaria`.
+
+Cada alta o baja de `Usuario` y `SolicitudAfiliacion` suma o resta uno en
+el día local de su fecha de alta, dentro de la misma transacción. Las
+reservas llegan por `reservas_modificadas`: se resta la versión anterior si
+estaba confirmada y se suma la nueva, con su importe cotizado por
+`reservas.tarifas`, en el día local en que empiezan (como los reportes).
+
+Dentro de un bloque `agrupar()` (las eliminaciones masivas del admin) los
+incrementos se acumulan y se aplican sumados al salir, con unas pocas
+consultas por día afectado en lugar de varias por fila.
+
+Los incrementos se hacen con `F()` para que dos procesos no se pisen. Si
+cambian las tarifas, una baja se descuenta con el precio nuevo, y la
+reconciliación nocturna (`reconciliar_estadisticas`) corrige esa deriva
+recalculando los días desde las tablas de origen.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from reservas.funciones_db import SegundosEpoca
+from reservas.models import Lugar, Reserva
+from reservas.tarifas import centavos_de_filas, cotizar, descuenta_socios
+from usuarios.models import PerfilSocio
+
+from .models import EstadisticaDiaria
+
+ESTADO_CONTABILIZADO = 'confirmada'
+CAMPOS = ('nuevos_usuarios', 'solicitudes_afiliacion', 'reservas_confirmadas', 'ingresos_centavos')
+
+_local = threading.local()
+
+
+def dia_local(instante):
+    return timezone.localtime(instante).date()
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def sumar(deltas):
+    """Aplica {fecha: {campo: delta}} sobre la tabla, o lo acumula si hay un `agrupar()` abierto."""
+    pendientes = getattr(_local, 'pendientes', None)
+    if pendientes is not None:
+        for fecha, por_campo in deltas.items():
+            for campo, delta in por_campo.items():
+                pendientes[fecha][campo] += delta
+        return
+    for fecha, por_campo in deltas.items():
+        por_campo = {campo: delta for campo, delta in por_campo.items() if delta}
+        if not por_campo:
+            continue
+        with transaction.atomic():
+            EstadisticaDiaria.objects.get_or_create(fecha=fecha)
+            EstadisticaDiaria.objects.filter(fecha=fecha).update(
+                **{campo: F(campo) + delta for campo, delta in por_campo.items()}
+            )
+
+
+@contextmanager
+def agrupar():
+    """
+    Acumula los `sumar` del bloque y los aplica sumados al salir, dentro de la
+    transacción que lo rodee. Si el bloque lanza una excepción no se aplica
+    nada: la transacción se revertirá.
+    """
+    if getattr(_local, 'pendientes', None) is not None:
+        # Ya hay un grupo abierto más arriba: él se encarga de aplicar.
+        yield
+        return
+    _local.pendientes = defaultdict(lambda: defaultdict(int))
+    try:
+        yield
+        pendientes = _local.pendientes
+    finally:
+        _local.pendientes = None
+    sumar(pendientes)
+
+
+def _centavos_de_reserva(instantanea, tipos, socios):
+    if instantanea['lugar_id'] not in tipos:
+        # Lugar ya borrado: no se puede cotizar; lo corrige la reconciliación.
+        return 0
+    costo = cotizar(tipos[instantanea['lugar_id']], instantanea['fecha_inicio'], instantanea['fecha_fin'],
+                    instantanea['usuario_id'] in socios)
+    return int(costo * 100)
+
+
+def aplicar_cambios(cambios):
+    """Suma o resta las reservas confirmadas de los cambios recibidos de `reservas_modificadas`."""
+    contadas = [
+        instantanea
+        for par in cambios
+        for instantanea in par
+        if instantanea is not None and instantanea['estado'] == ESTADO_CONTABILIZADO
+    ]
+    if not contadas:
+        return
+    tipos = dict(
+        Lugar.objects.filter(pk__in={instantanea['lugar_id'] for instantanea in contadas})
+        .values_list('pk', 'tipo_id')
+    )
+    socios = set()
+    if any(descuenta_socios(tipo_id) for tipo_id in set(tipos.values())):
+        socios = set(
+            PerfilSocio.objects.filter(
+                usuario_id__in={instantanea['usuario_id'] for instantanea in contadas}, is_active=True,
+            ).values_list('usuario_id', flat=True)
+        )
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for anterior, actual in cambios:
+        for instantanea, signo in ((anterior, -1), (actual, 1)):
+            if instantanea is None or instantanea['estado'] != ESTADO_CONTABILIZADO:
+                continue
+            por_campo = deltas[dia_local(instantanea['fecha_inicio'])]
+            por_campo['reservas_confirmadas'] += signo
+            por_campo['ingresos_centavos'] += signo * _centavos_de_reserva(instantanea, tipos, socios)
+    sumar(deltas)
+
+
+def _contar_por_dia(consulta, campo_fecha, desde, hasta):
+    if desde is not None:
+        consulta = consulta.filter(**{f'{campo_fecha}__gte': _inicio_del_dia(desde)})
+    if hasta is not None:
+        consulta = consulta.filter(**{f'{campo_fecha}__lt': _inicio_del_dia(hasta + timedelta(days=1))})
+    return consulta.values_list(TruncDate(campo_fecha)).annotate(total=Count('pk')).order_by()
+
+
+def calcular(desde=None, hasta=None):
+    """Totales por día recalculados desde las tablas de origen; `None` deja el extremo abierto."""
+    from afiliaciones.models import SolicitudAfiliacion
+    from usuarios.models import Usuario
+
+    totales = defaultdict(lambda: dict.fromkeys(CAMPOS, 0))
+    for fecha, total in _contar_por_dia(Usuario.objects.all(), 'date_joined', desde, hasta):
+        totales[fecha]['nuevos_usuarios'] = total
+    for fecha, total in _contar_por_dia(SolicitudAfiliacion.objects.all(), 'fecha_solicitud', desde, hasta):
+        totales[fecha]['solicitudes_afiliacion'] = total
+
+    reservas = Reserva.objects.filter(estado=ESTADO_CONTABILIZADO)
+    if desde is not None:
+        reservas = reservas.filter(fecha_inicio__gte=_inicio_del_dia(desde))
+    if hasta is not None:
+        reservas = reservas.filter(fecha_inicio__lt=_inicio_del_dia(hasta + timedelta(days=1)))
+    socios = set(PerfilSocio.objects.filter(is_active=True).values_list('usuario_id', flat=True))
+    filas = reservas.values(
+        'usuario_id',
+        tipo_id=F('lugar__tipo_id'),
+        fecha=TruncDate('fecha_inicio'),
+        inicio=SegundosEpoca('fecha_inicio'),
+        fin=SegundosEpoca('fecha_fin'),
+    ).order_by()
+    for fila, centavos in centavos_de_filas(filas.iterator(chunk_size=2000), socios):
+        totales[fila['fecha']]['reservas_confirmadas'] += 1
+        totales[fila['fecha']]['ingresos_centavos'] += centavos
+    return totales
+
+
+def reconciliar(desde=None, hasta=None):
+    """
+    Reescribe los días `desde`..`hasta` (ambos incluidos; `None` sin límite)
+    con los totales recalculados. Devuelve el número de días corregidos.
+    """
+    totales = calcular(desde, hasta)
+    with transaction.atomic():
+        existentes = EstadisticaDiaria.objects.all()
+        if desde is not None:
+            existentes = existentes.filter(fecha__gte=desde)
+        if hasta is not None:
+            existentes = existentes.filter(fecha__lte=hasta)
+        existentes = {fila.fecha: fila for fila in existentes}
+        nuevas, modificadas = [], []
+        for fecha, fila in existentes.items():
+            correctos = totales.get(fecha, dict.fromkeys(CAMPOS, 0))
+            if any(getattr(fila, campo) != valor for campo, valor in correctos.items()):
+                for campo, valor in correctos.items():
+                    setattr(fila, campo, valor)
+                modificadas.append(fila)
+        for fecha, correctos in totales.items():
+            if fecha not in existentes:
+                nuevas.append(EstadisticaDiaria(fecha=fecha, **correctos))
+        EstadisticaDiaria.objects.bulk_create(nuevas, batch_size=1000)
+        EstadisticaDiaria.objects.bulk_update(modificadas, CAMPOS, batch_size=1000)
+    return len(nuevas) + len(modificadas)
+
+
+def serie(desde, hasta, campos=CAMPOS):
+    """
+    Valores diarios de `desde` a `hasta` (ambos incluidos), leyendo solo
+    `EstadisticaDiaria`: {'fechas': [...], campo: [...]}, con ceros en los
+    días sin fila.
+    """
+    filas = {
+        fila['fecha']: fila
+        for fila in EstadisticaDiaria.objects.filter(fecha__gte=desde, fecha__lte=hasta).values('fecha', *campos)
+    }
+    fechas = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+    resultado = {'fechas': fechas}
+    for campo in campos:
+        resultado[campo] = [filas[fecha][campo] if fecha in filas else 0 for fecha in fechas]
+    return resultado
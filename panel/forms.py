@@ -7,6 +7,7 @@ from usuarios.models import Usuario, PerfilSocio
 from noticias.models import Noticia
 from servicios.models import Servicio
 from reservas.models import TipoLugar, Lugar, Reserva # <-- Nuevas importaciones
+from reservas.forms import ValidacionHorarioMixin
 
 
 class ConvenioForm(forms.ModelForm):
@@ -148,7 +149,7 @@ class LugarForm(forms.ModelForm):
             'activo': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
-class ReservaPanelForm(forms.ModelForm):
+class ReservaPanelForm(ValidacionHorarioMixin, forms.ModelForm):
     class Meta:
         model = Reserva
         # --- LÍNEA CORREGIDA ---
@@ -163,4 +164,21 @@ class ReservaPanelForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['fecha_inicio'].input_formats = ('%Y-%m-%dT%H:%M',)
-        self.fields['fecha_fin'].input_formats = ('%Y-%m-%dT%H:%M',)
\ No newline at end of file
+        self.fields['fecha_fin'].input_formats = ('%Y-%m-%dT%H:%M',)
+
+class ReservaFiltroForm(forms.Form):
+    """Filtros del listado de reservas del panel (todos opcionales)."""
+    estado = forms.ChoiceField(
+        choices=[('', 'Todos los estados')] + Reserva.ESTADOS, required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+    lugar = forms.ModelChoiceField(
+        queryset=Lugar.objects.order_by('nombre'), required=False, empty_label='Todos los lugares',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+    desde = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}),
+    )
+    hasta = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}),
+    )
@@ -0,0 +1,59 @@
+# panel/indicadores.py
+"""
+Indicadores del dashboard: totales de usuarios, socios activos, solicitudes
+de afiliación pendientes y altas de los últimos 7 días.
+
+Perfil de socio y solicitud son uno a uno con el usuario, así que los
+totales salen de una sola consulta sobre `Usuario` con agregación
+condicional (un COUNT con FILTER por indicador); las altas por día se leen
+de `EstadisticaDiaria`. El resultado se guarda en la caché y las señales de
+`Usuario`, `PerfilSocio` y `SolicitudAfiliacion` lo borran al confirmarse
+cada cambio (ver `panel/signals.py`).
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .estadisticas import serie
+
+DIAS_GRAFICO = 7
+
+
+def _clave(hoy):
+    # El gráfico depende del día: al cambiar de fecha la clave ya no coincide.
+    return f'panel:indicadores:{hoy.isoformat()}'
+
+
+def calcular(hoy):
+    from usuarios.models import Usuario
+
+    fila = Usuario.objects.aggregate(
+        total_usuarios=Count('pk'),
+        total_socios=Count('pk', filter=Q(perfil_socio__is_active=True)),
+        solicitudes_pendientes=Count('pk', filter=Q(solicitudafiliacion__estado='PENDIENTE')),
+    )
+    altas = serie(hoy - timedelta(days=DIAS_GRAFICO - 1), hoy, ['nuevos_usuarios'])
+    return {
+        'kpis': fila,
+        'chart_labels': [dia.strftime('%b %d') for dia in altas['fechas']],
+        'chart_data': altas['nuevos_usuarios'],
+    }
+
+
+def indicadores():
+    """Indicadores del día desde la caché, calculándolos si no están."""
+    hoy = timezone.localdate()
+    clave = _clave(hoy)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular(hoy)
+        cache.set(clave, datos, timeout=24 * 3600)
+    return datos
+
+
+def invalidar():
+    """Borra los indicadores del día cuando se confirma la transacción en curso."""
+    transaction.on_commit(lambda: cache.delete(_clave(timezone.localdate())))
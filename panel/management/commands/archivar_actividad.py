@@ -0,0 +1,31 @@
+# panel/management/commands/archivar_actividad.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from panel import archivo_actividad
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa las entradas del registro de actividad más antiguas que la retención configurada "
+        "a archivos mensuales gzip (JSONL) y las borra de la base de datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help='Días que se conservan en la base de datos '
+                                 f'(por defecto PANEL_ACTIVIDAD_RETENCION_DIAS = '
+                                 f'{getattr(settings, "PANEL_ACTIVIDAD_RETENCION_DIAS", 180)}).')
+        parser.add_argument('--lote', type=int, default=archivo_actividad.LOTE_BORRADO,
+                            help='Filas leídas y borradas por lote.')
+
+    def handle(self, *args, **options):
+        if options['dias'] is not None and options['dias'] < 0:
+            raise CommandError('--dias no puede ser negativo.')
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero.')
+        resumen = archivo_actividad.archivar(options['dias'], options['lote'])
+        for mes, total in resumen.items():
+            self.stdout.write(f'{mes:%Y-%m}: {total} entradas -> {archivo_actividad.ruta_de_mes(mes)}')
+        total = sum(resumen.values())
+        self.stdout.write(self.style.SUCCESS(f'Entradas archivadas: {total}.'))
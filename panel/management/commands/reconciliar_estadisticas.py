@@ -0,0 +1,42 @@
+# panel/management/commands/reconciliar_estadisticas.py
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from panel import estadisticas, indicadores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la tabla EstadisticaDiaria desde usuarios, solicitudes y reservas. "
+        "Pensado para ejecutarse cada noche; sin opciones revisa los últimos días y todos los futuros."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=35,
+                            help='Días hacia atrás desde hoy que se revisan (por defecto 35).')
+        parser.add_argument('--desde', help='Primer día a revisar (AAAA-MM-DD); tiene prioridad sobre --dias.')
+        parser.add_argument('--hasta', help='Último día a revisar (AAAA-MM-DD); por defecto sin límite.')
+        parser.add_argument('--todo', action='store_true', help='Reconstruir todo el historial.')
+
+    def _fecha(self, valor):
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            raise CommandError(f'Fecha no válida: {valor}')
+
+    def handle(self, *args, **options):
+        if options['todo']:
+            desde = None
+        elif options['desde']:
+            desde = self._fecha(options['desde'])
+        else:
+            desde = timezone.localdate() - timedelta(days=options['dias'])
+        hasta = self._fecha(options['hasta']) if options['hasta'] else None
+        if desde is not None and hasta is not None and hasta < desde:
+            raise CommandError('--hasta no puede ser anterior a --desde.')
+
+        dias = estadisticas.reconciliar(desde, hasta)
+        indicadores.invalidar()
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas reconciliadas: {dias} días corregidos.'))
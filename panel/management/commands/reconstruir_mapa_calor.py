@@ -0,0 +1,16 @@
+# panel/management/commands/reconstruir_mapa_calor.py
+from django.core.management.base import BaseCommand
+
+from panel import mapa_calor
+
+
+class Command(BaseCommand):
+    help = "Recalcula la tabla OcupacionSemanal del mapa de calor desde las reservas confirmadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lugar', type=int, action='append', dest='lugares',
+                            help='Limitar a este lugar (se puede repetir).')
+
+    def handle(self, *args, **options):
+        filas = mapa_calor.reconstruir(options['lugares'])
+        self.stdout.write(self.style.SUCCESS(f'Mapa de calor reconstruido: {filas} horas con reservas.'))
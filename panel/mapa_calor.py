@@ -0,0 +1,117 @@
+# panel/mapa_calor.py
+"""
+Mapa de calor de ocupación por día de la semana y hora para cada lugar.
+
+La tabla `OcupacionSemanal` acumula los minutos confirmados de cada lugar en
+cada una de las 168 horas de la semana. Se actualiza con la señal
+`reservas_modificadas`: al confirmar, cancelar o editar una reserva se restan
+los minutos de su versión anterior y se suman los de la nueva. Así el
+dashboard lee como mucho 168 filas por lugar, sin importar el historial.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from reservas.models import Lugar, Reserva
+
+from .models import OcupacionSemanal
+
+ESTADO_CONTABILIZADO = 'confirmada'
+
+
+def minutos_por_hora(inicio, fin):
+    """Devuelve {(día_semana, hora): minutos} que ocupa [inicio, fin) en hora local."""
+    minutos = defaultdict(int)
+    cursor = timezone.localtime(inicio)
+    fin = timezone.localtime(fin)
+    while cursor < fin:
+        siguiente = min(cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1), fin)
+        minutos[(cursor.weekday(), cursor.hour)] += int((siguiente - cursor).total_seconds() // 60)
+        cursor = siguiente
+    return minutos
+
+
+def _contabiliza(instantanea):
+    return instantanea is not None and instantanea['estado'] == ESTADO_CONTABILIZADO
+
+
+def aplicar_cambios(cambios):
+    """Suma o resta los minutos de los cambios recibidos de `reservas_modificadas`."""
+    from reservas.services import bloquear_lugar
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for anterior, actual in cambios:
+        if _contabiliza(anterior):
+            for clave, minutos in minutos_por_hora(anterior['fecha_inicio'], anterior['fecha_fin']).items():
+                deltas[anterior['lugar_id']][clave] -= minutos
+        if _contabiliza(actual):
+            for clave, minutos in minutos_por_hora(actual['fecha_inicio'], actual['fecha_fin']).items():
+                deltas[actual['lugar_id']][clave] += minutos
+
+    for lugar_id, por_hora in deltas.items():
+        por_hora = {clave: delta for clave, delta in por_hora.items() if delta}
+        if not por_hora:
+            continue
+        with transaction.atomic():
+            bloquear_lugar(lugar_id)
+            existentes = {
+                (fila.dia_semana, fila.hora): fila
+                for fila in OcupacionSemanal.objects.filter(lugar_id=lugar_id)
+            }
+            nuevas, modificadas = [], []
+            for (dia_semana, hora), delta in por_hora.items():
+                fila = existentes.get((dia_semana, hora))
+                if fila is None:
+                    nuevas.append(OcupacionSemanal(
+                        lugar_id=lugar_id, dia_semana=dia_semana, hora=hora, minutos=max(delta, 0)
+                    ))
+                else:
+                    fila.minutos = max(fila.minutos + delta, 0)
+                    modificadas.append(fila)
+            OcupacionSemanal.objects.bulk_create(nuevas)
+            OcupacionSemanal.objects.bulk_update(modificadas, ['minutos'])
+
+
+def reconstruir(lugar_ids=None):
+    """Recalcula el mapa (de todos los lugares o de los indicados) desde `Reserva`."""
+    consulta = Reserva.objects.filter(estado=ESTADO_CONTABILIZADO)
+    if lugar_ids is not None:
+        consulta = consulta.filter(lugar_id__in=lugar_ids)
+    acumulado = defaultdict(lambda: defaultdict(int))
+    for lugar_id, inicio, fin in consulta.values_list('lugar_id', 'fecha_inicio', 'fecha_fin').iterator():
+        for clave, minutos in minutos_por_hora(inicio, fin).items():
+            acumulado[lugar_id][clave] += minutos
+
+    with transaction.atomic():
+        anteriores = OcupacionSemanal.objects.all()
+        if lugar_ids is not None:
+            anteriores = anteriores.filter(lugar_id__in=lugar_ids)
+        anteriores.delete()
+        OcupacionSemanal.objects.bulk_create(
+            [
+                OcupacionSemanal(lugar_id=lugar_id, dia_semana=dia_semana, hora=hora, minutos=minutos)
+                for lugar_id, por_hora in acumulado.items()
+                for (dia_semana, hora), minutos in por_hora.items()
+            ],
+            batch_size=5000,
+        )
+    return sum(len(por_hora) for por_hora in acumulado.values())
+
+
+def mapas_por_lugar():
+    """
+    Devuelve [{'id', 'nombre', 'horas': [[...24 valores] x 7 días]}] con las
+    horas reservadas de cada lugar activo, leyendo solo `OcupacionSemanal`.
+    """
+    mapas = {
+        lugar_id: {'id': lugar_id, 'nombre': nombre, 'horas': [[0] * 24 for _ in range(7)]}
+        for lugar_id, nombre in Lugar.objects.filter(activo=True).order_by('nombre').values_list('id', 'nombre')
+    }
+    filas = OcupacionSemanal.objects.filter(lugar_id__in=list(mapas), minutos__gt=0).values_list(
+        'lugar_id', 'dia_semana', 'hora', 'minutos'
+    )
+    for lugar_id, dia_semana, hora, minutos in filas:
+        mapas[lugar_id]['horas'][dia_semana][hora] = round(minutos / 60, 1)
+    return list(mapas.values())
@@ -0,0 +1,13 @@
+# panel/middleware.py
+from .actividad import agrupar
+
+
+class RegistroActividadMiddleware:
+    """Guarda con un solo INSERT, al terminar la petición, las actividades que esta registró."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with agrupar():
+            return self.get_response(request)
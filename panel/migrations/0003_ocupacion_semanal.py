@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0013_indices_listado_panel'),
+        ('panel', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionSemanal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(help_text='0 = lunes, 6 = domingo')),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('minutos', models.PositiveIntegerField(default=0)),
+                ('lugar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion_semanal', to='reservas.lugar')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ocupacionsemanal',
+            constraint=models.UniqueConstraint(fields=('lugar', 'dia_semana', 'hora'), name='ocupacion_semanal_unica'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0003_ocupacion_semanal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('nuevos_usuarios', models.IntegerField(default=0)),
+                ('solicitudes_afiliacion', models.IntegerField(default=0)),
+                ('reservas_confirmadas', models.IntegerField(default=0)),
+                ('ingresos_centavos', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('fecha',),
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0004_estadistica_diaria'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registroactividad',
+            index=models.Index(fields=['timestamp'], name='actividad_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def _minutos_por_hora(inicio, fin):
+    """{(día_semana, hora): minutos} que ocupa [inicio, fin) en hora local."""
+    minutos = defaultdict(int)
+    cursor = timezone.localtime(inicio)
+    fin = timezone.localtime(fin)
+    while cursor < fin:
+        siguiente = min(cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1), fin)
+        minutos[(cursor.weekday(), cursor.hour)] += int((siguiente - cursor).total_seconds() // 60)
+        cursor = siguiente
+    return minutos
+
+
+def rellenar(apps, schema_editor):
+    # OcupacionSemanal solo se mantiene con los cambios posteriores a su
+    # creación: aquí se suman las reservas confirmadas que ya existían.
+    Reserva = apps.get_model('reservas', 'Reserva')
+    OcupacionSemanal = apps.get_model('panel', 'OcupacionSemanal')
+
+    acumulado = defaultdict(lambda: defaultdict(int))
+    filas = Reserva.objects.filter(estado='confirmada').values_list('lugar_id', 'fecha_inicio', 'fecha_fin')
+    for lugar_id, inicio, fin in filas.iterator():
+        for clave, minutos in _minutos_por_hora(inicio, fin).items():
+            acumulado[lugar_id][clave] += minutos
+
+    OcupacionSemanal.objects.all().delete()
+    OcupacionSemanal.objects.bulk_create(
+        [
+            OcupacionSemanal(lugar_id=lugar_id, dia_semana=dia_semana, hora=hora, minutos=minutos)
+            for lugar_id, por_hora in acumulado.items()
+            for (dia_semana, hora), minutos in por_hora.items()
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0005_indice_actividad_timestamp'),
+        ('reservas', '0018_rellenar_ocupacion_diaria'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
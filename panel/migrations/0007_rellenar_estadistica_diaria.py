@@ -0,0 +1,57 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+CAMPOS = ('nuevos_usuarios', 'solicitudes_afiliacion', 'reservas_confirmadas', 'ingresos_centavos')
+
+
+def rellenar(apps, schema_editor):
+    # EstadisticaDiaria solo suma las altas y reservas posteriores a su
+    # creación: aquí se vuelca el historial. Los ingresos se calculan con el
+    # precio base del tipo de lugar (segundos enteros, redondeo a centavos
+    # mitad hacia arriba); los ajustes de las reglas de tarifa los aplica la
+    # siguiente reconciliación (`reconciliar_estadisticas`).
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    SolicitudAfiliacion = apps.get_model('afiliaciones', 'SolicitudAfiliacion')
+    Reserva = apps.get_model('reservas', 'Reserva')
+    EstadisticaDiaria = apps.get_model('panel', 'EstadisticaDiaria')
+
+    totales = defaultdict(lambda: dict.fromkeys(CAMPOS, 0))
+    for modelo, campo_fecha, campo in (
+        (Usuario, 'date_joined', 'nuevos_usuarios'),
+        (SolicitudAfiliacion, 'fecha_solicitud', 'solicitudes_afiliacion'),
+    ):
+        por_dia = modelo.objects.values_list(TruncDate(campo_fecha)).annotate(total=Count('pk')).order_by()
+        for fecha, total in por_dia:
+            totales[fecha][campo] = total
+
+    filas = Reserva.objects.filter(estado='confirmada').values_list(
+        'fecha_inicio', 'fecha_fin', 'lugar__tipo__precio_por_hora'
+    )
+    for inicio, fin, precio in filas.iterator():
+        segundos = int(fin.timestamp()) - int(inicio.timestamp())
+        dia = totales[timezone.localtime(inicio).date()]
+        dia['reservas_confirmadas'] += 1
+        dia['ingresos_centavos'] += (segundos * int(precio * 100) + 1800) // 3600
+
+    EstadisticaDiaria.objects.all().delete()
+    EstadisticaDiaria.objects.bulk_create(
+        [EstadisticaDiaria(fecha=fecha, **valores) for fecha, valores in totales.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0006_rellenar_ocupacion_semanal'),
+        ('usuarios', '0003_clave_calendario'),
+        ('afiliaciones', '0006_rename_direccion_solicitudafiliacion_direccion_comercial_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 # panel/models.py
+from decimal import Decimal
+
 from django.db import models
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -13,4 +15,51 @@ class RegistroActividad(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ('-timestamp',)
\ No newline at end of file
+        ordering = ('-timestamp',)
+        indexes = [
+            # Listado del panel y archivo de entradas antiguas (`panel/archivo_actividad.py`).
+            models.Index(fields=['timestamp'], name='actividad_timestamp_idx'),
+        ]
+
+class OcupacionSemanal(models.Model):
+    """
+    Minutos de reservas confirmadas de un lugar en cada hora de la semana
+    (hora local), acumulados sobre todo el historial. Alimenta el mapa de
+    calor del dashboard; se mantiene en `panel/mapa_calor.py`.
+    """
+    lugar = models.ForeignKey('reservas.Lugar', on_delete=models.CASCADE, related_name='ocupacion_semanal')
+    dia_semana = models.PositiveSmallIntegerField(help_text='0 = lunes, 6 = domingo')
+    hora = models.PositiveSmallIntegerField()
+    minutos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lugar', 'dia_semana', 'hora'], name='ocupacion_semanal_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.lugar} - día {self.dia_semana}, {self.hora:02d}h: {self.minutos} min"
+
+
+class EstadisticaDiaria(models.Model):
+    """
+    Totales de un día (hora local) para las series del dashboard: altas de
+    usuarios y de solicitudes de afiliación, y reservas confirmadas e
+    ingresos según el día en que empiezan. Se mantiene con señales y se
+    reconcilia cada noche; ver `panel/estadisticas.py`.
+    """
+    fecha = models.DateField(unique=True)
+    nuevos_usuarios = models.IntegerField(default=0)
+    solicitudes_afiliacion = models.IntegerField(default=0)
+    reservas_confirmadas = models.IntegerField(default=0)
+    ingresos_centavos = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ('fecha',)
+
+    def __str__(self):
+        return f"Estadísticas del {self.fecha:%d/%m/%Y}"
+
+    @property
+    def ingresos(self):
+        return Decimal(self.ingresos_centavos).scaleb(-2)
@@ -0,0 +1,163 @@
+# panel/reportes.py
+"""
+Reportes de horas reservadas, ingresos y ocupación calculados en la base de
+datos con una sola consulta agrupada por lugar y mes.
+
+Los importes siguen exactamente a `Reserva.costo_total`: por cada reserva se
+multiplican sus segundos enteros por el precio por hora en centavos, se
+redondea a centavos (mitad hacia arriba) y después se suma. Cada reserva
+cuenta en el mes, en hora local, en que empieza.
+
+Si hay reglas de tarifa activas los importes ya no se pueden calcular en SQL:
+se leen las reservas del periodo como segundos enteros y se cotizan por lotes
+con `reservas.tarifas`. Número de reservas y horas siguen saliendo de la
+consulta agrupada.
+"""
+import calendar
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import BigIntegerField, Count, DateField, F, Q, Sum, Value
+from django.db.models.functions import Cast, Round, TruncMonth
+from django.utils import timezone
+
+from reservas.funciones_db import DivisionEntera, SegundosEpoca
+from reservas.models import Lugar, Reserva
+from reservas.tarifas import centavos_de_filas, tarifario_actual
+from usuarios.models import PerfilSocio
+
+# Horas por día en que un lugar puede reservarse; base de la tasa de ocupación.
+HORAS_HABILES_POR_DIA = getattr(settings, 'RESERVAS_HORAS_HABILES_POR_DIA', 12)
+ESTADOS_FACTURABLES = ('confirmada',)
+MAX_MESES_REPORTE = 36
+
+
+def parsear_mes(valor):
+    """Convierte 'AAAA-MM' en la fecha del día 1 de ese mes; lanza ValueError si no es válido."""
+    anio, mes = (int(parte) for parte in valor.split('-'))
+    return date(anio, mes, 1)
+
+
+def _mes_siguiente(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def meses_entre(desde, hasta):
+    """Días 1 de cada mes entre `desde` y `hasta`, ambos incluidos."""
+    meses = []
+    mes = desde
+    while mes <= hasta:
+        meses.append(mes)
+        mes = _mes_siguiente(mes)
+    return meses
+
+
+def _segundos():
+    return SegundosEpoca('fecha_fin') - SegundosEpoca('fecha_inicio')
+
+
+def _centavos():
+    precio_centavos = Cast(Round(F('lugar__tipo__precio_por_hora') * 100), BigIntegerField())
+    return DivisionEntera(_segundos() * precio_centavos + Value(1800), Value(3600))
+
+
+def _centavos_con_reglas(consulta):
+    """Centavos por (lugar, mes) cotizando cada reserva con las reglas de tarifa vigentes."""
+    socios = set(PerfilSocio.objects.filter(is_active=True).values_list('usuario_id', flat=True))
+    filas = consulta.values(
+        'lugar_id', 'usuario_id',
+        tipo_id=F('lugar__tipo_id'),
+        mes=TruncMonth('fecha_inicio', output_field=DateField()),
+        inicio=SegundosEpoca('fecha_inicio'),
+        fin=SegundosEpoca('fecha_fin'),
+    ).order_by()
+    centavos = {}
+    for fila, costo in centavos_de_filas(filas.iterator(chunk_size=2000), socios):
+        clave = (fila['lugar_id'], fila['mes'])
+        centavos[clave] = centavos.get(clave, 0) + costo
+    return centavos
+
+
+def _acumular(destino, clave, fila):
+    datos = destino.setdefault(clave, {'reservas': 0, 'segundos': 0, 'centavos': 0})
+    datos['reservas'] += fila['reservas']
+    datos['segundos'] += fila['segundos']
+    datos['centavos'] += fila['centavos']
+
+
+def _fila(datos, horas_habiles, **extra):
+    segundos = datos['segundos'] if datos else 0
+    ocupacion = Decimal(0)
+    if horas_habiles:
+        ocupacion = Decimal(segundos) * 100 / (Decimal(horas_habiles) * 3600)
+    return {
+        **extra,
+        'reservas': datos['reservas'] if datos else 0,
+        'horas': (Decimal(segundos) / 3600).quantize(Decimal('0.01')),
+        'ingresos': (Decimal(datos['centavos'] if datos else 0) / 100).quantize(Decimal('0.01')),
+        'ocupacion': ocupacion.quantize(Decimal('0.1')),
+    }
+
+
+def resumen_reservas(desde, hasta, estados=ESTADOS_FACTURABLES):
+    """
+    Resumen de los meses `desde`..`hasta` (días 1, ambos incluidos) por
+    lugar, por tipo de lugar y por mes, más el total. Cada fila trae número
+    de reservas, horas, ingresos y ocupación en % de las horas hábiles.
+    Se incluyen los lugares activos aunque no tengan reservas.
+    """
+    meses = meses_entre(desde, hasta)
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(_mes_siguiente(hasta), time.min))
+    consulta = Reserva.objects.filter(estado__in=estados, fecha_inicio__gte=inicio, fecha_inicio__lt=fin)
+    agrupada = consulta.values('lugar_id', mes=TruncMonth('fecha_inicio', output_field=DateField()))
+    if tarifario_actual().hay_reglas:
+        filas = list(agrupada.annotate(reservas=Count('pk'), segundos=Sum(_segundos())).order_by())
+        centavos = _centavos_con_reglas(consulta)
+        for fila in filas:
+            fila['centavos'] = centavos.get((fila['lugar_id'], fila['mes']), 0)
+    else:
+        filas = list(
+            agrupada.annotate(reservas=Count('pk'), segundos=Sum(_segundos()), centavos=Sum(_centavos())).order_by()
+        )
+    lugares = list(
+        Lugar.objects.select_related('tipo')
+        .filter(Q(activo=True) | Q(pk__in={fila['lugar_id'] for fila in filas}))
+        .order_by('tipo__nombre', 'nombre')
+    )
+
+    por_lugar, por_tipo, por_mes, total = {}, {}, {}, {}
+    tipo_de = {lugar.pk: lugar.tipo_id for lugar in lugares}
+    for fila in filas:
+        _acumular(por_lugar, fila['lugar_id'], fila)
+        _acumular(por_tipo, tipo_de[fila['lugar_id']], fila)
+        _acumular(por_mes, fila['mes'], fila)
+        _acumular(total, None, fila)
+
+    horas_mes = {
+        mes: calendar.monthrange(mes.year, mes.month)[1] * HORAS_HABILES_POR_DIA for mes in meses
+    }
+    horas_periodo = sum(horas_mes.values())
+    lugares_por_tipo = {}
+    for lugar in lugares:
+        lugares_por_tipo.setdefault(lugar.tipo_id, []).append(lugar)
+
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'horas_habiles_por_dia': HORAS_HABILES_POR_DIA,
+        'lugares': [
+            _fila(por_lugar.get(lugar.pk), horas_periodo, id=lugar.pk, nombre=lugar.nombre, tipo=lugar.tipo.nombre)
+            for lugar in lugares
+        ],
+        'tipos': [
+            _fila(por_tipo.get(tipo_id), horas_periodo * len(grupo), id=tipo_id, nombre=grupo[0].tipo.nombre)
+            for tipo_id, grupo in lugares_por_tipo.items()
+        ],
+        'meses': [
+            _fila(por_mes.get(mes), horas_mes[mes] * len(lugares), mes=mes.strftime('%Y-%m'))
+            for mes in meses
+        ],
+        'total': _fila(total.get(None), horas_periodo * len(lugares)),
+    }
@@ -0,0 +1,47 @@
+# panel/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from afiliaciones.models import SolicitudAfiliacion
+from reservas.signals import reservas_modificadas
+from usuarios.models import PerfilSocio, Usuario
+
+from . import estadisticas, indicadores, mapa_calor
+
+
+@receiver(reservas_modificadas)
+def actualizar_mapa_calor(sender, cambios, **kwargs):
+    mapa_calor.aplicar_cambios(cambios)
+
+
+@receiver(reservas_modificadas)
+def actualizar_estadisticas_reservas(sender, cambios, **kwargs):
+    estadisticas.aplicar_cambios(cambios)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+@receiver(post_save, sender=SolicitudAfiliacion)
+@receiver(post_delete, sender=SolicitudAfiliacion)
+def actualizar_estadisticas_altas(sender, instance, created=False, **kwargs):
+    if sender is Usuario:
+        campo, fecha = 'nuevos_usuarios', instance.date_joined
+    else:
+        campo, fecha = 'solicitudes_afiliacion', instance.fecha_solicitud
+    if kwargs['signal'] is post_delete:
+        estadisticas.sumar({estadisticas.dia_local(fecha): {campo: -1}})
+    elif created:
+        estadisticas.sumar({estadisticas.dia_local(fecha): {campo: 1}})
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+@receiver(post_save, sender=PerfilSocio)
+@receiver(post_delete, sender=PerfilSocio)
+@receiver(post_save, sender=SolicitudAfiliacion)
+@receiver(post_delete, sender=SolicitudAfiliacion)
+def invalidar_indicadores(sender, update_fields=None, **kwargs):
+    # Cada inicio de sesión guarda `last_login`, que no cambia ningún indicador.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    indicadores.invalidar()
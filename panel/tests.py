@@ -1,3 +1,184 @@
-from django.test import TestCase
+# panel/tests.py
+import shutil
+import tempfile
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin import ModelAdmin
+from django.contrib.admin.sites import site
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from reservas import tarifas
+from reservas.management.commands._datos_sinteticos import FECHA_BASE, GeneradorReservas, crear_catalogo
+from reservas.models import Lugar, ReglaTarifa, Reserva, TipoLugar
+from usuarios.models import PerfilSocio, Usuario
+
+from . import archivo_actividad, estadisticas
+from .models import EstadisticaDiaria, RegistroActividad
+from .reportes import resumen_reservas
+
+# Precios y duraciones elegidos para provocar redondeos (tercios de hora, centavos impares...).
+PRECIOS = [Decimal('25.00'), Decimal('12.33'), Decimal('7.99'), Decimal('0.01'), Decimal('149.95')]
+DURACIONES_MINUTOS = [1, 7, 20, 40, 61, 100, 135, 1441]
+
+
+class ResumenReservasTests(TestCase):
+    """Los totales de `resumen_reservas` coinciden con sumar `Reserva.costo_total` en Python."""
+
+    @classmethod
+    def setUpTestData(cls):
+        lugares, usuarios = crear_catalogo(num_lugares=len(PRECIOS) * 2, num_usuarios=20)
+        tipos = [TipoLugar.objects.first()] + [
+            TipoLugar.objects.create(nombre=f'Tipo {precio}', precio_por_hora=precio) for precio in PRECIOS[1:]
+        ]
+        for i, lugar in enumerate(lugares):
+            lugar.tipo = tipos[i % len(tipos)]
+        Lugar.objects.bulk_update(lugares, ['tipo'])
+
+        generador = GeneradorReservas(lugares, usuarios, semilla=7)
+        generador.generar(3000)
+        # Duraciones irregulares al final del rango generado, todas confirmadas.
+        inicio = max(generador.cursor.values()) + timedelta(days=1)
+        Reserva.objects.bulk_create([
+            Reserva(
+                usuario=usuarios[0], lugar=lugar, estado='confirmada',
+                fecha_inicio=inicio + timedelta(days=i), fecha_fin=inicio + timedelta(days=i, minutes=minutos),
+            )
+            for i, minutos in enumerate(DURACIONES_MINUTOS)
+            for lugar in lugares
+        ])
+        # Una reserva en el mes anterior a FECHA_BASE, que además es de otro año.
+        Reserva.objects.create(
+            usuario=usuarios[0], lugar=lugares[1], estado='confirmada',
+            fecha_inicio=FECHA_BASE - timedelta(days=1), fecha_fin=FECHA_BASE - timedelta(hours=3),
+        )
+
+    def setUp(self):
+        # Las tablas de tarifas viven en memoria: se reconstruyen con los datos de cada prueba.
+        tarifas.invalidar()
+        self.addCleanup(tarifas.invalidar)
+
+    def crear_reglas(self):
+        tipo = TipoLugar.objects.order_by('pk').first()
+        ReglaTarifa.objects.bulk_create([
+            ReglaTarifa(nombre='Horas pico', clase='franja', porcentaje=Decimal('20'), dias_semana='01234',
+                        hora_desde=time(17, 0), hora_hasta=time(20, 30)),
+            ReglaTarifa(nombre='Fin de semana', clase='franja', porcentaje=Decimal('15.5'), dias_semana='56'),
+            ReglaTarifa(nombre='Mañana temprano', clase='franja', tipo=tipo, porcentaje=Decimal('-33.33'),
+                        hora_hasta=time(8, 45)),
+            ReglaTarifa(nombre='Socios', clase='socio', porcentaje=Decimal('-10')),
+            ReglaTarifa(nombre='Media jornada', clase='duracion', porcentaje=Decimal('-5'), horas_minimas=Decimal('4')),
+            ReglaTarifa(nombre='Jornada', clase='duracion', porcentaje=Decimal('-12.5'), horas_minimas=Decimal('8')),
+        ])
+        usuarios = Reserva.objects.values_list('usuario_id', flat=True).distinct().order_by('usuario_id')
+        PerfilSocio.objects.bulk_create([
+            PerfilSocio(
+                usuario_id=usuario_id, is_active=True, razon_social=f'Socio {usuario_id}',
+                ruc=f'{usuario_id:013d}', direccion='Loja', tipo_plan='NATURAL',
+            )
+            for usuario_id in list(usuarios)[::2]
+        ])
+        # bulk_create no envía señales: se publica a mano la nueva versión de las tarifas.
+        tarifas.invalidar()
+
+    def comprobar_totales(self):
+        reservas = list(
+            Reserva.objects.select_related('lugar__tipo', 'usuario__perfil_socio').filter(estado='confirmada')
+        )
+        meses = sorted({timezone.localtime(r.fecha_inicio).date().replace(day=1) for r in reservas})
+        resumen = resumen_reservas(meses[0], meses[-1])
+
+        esperado = {grupo: defaultdict(lambda: (0, 0, Decimal(0))) for grupo in ('lugares', 'tipos', 'meses')}
+        for reserva in reservas:
+            claves = {
+                'lugares': reserva.lugar_id,
+                'tipos': reserva.lugar.tipo_id,
+                'meses': timezone.localtime(reserva.fecha_inicio).strftime('%Y-%m'),
+            }
+            for grupo, clave in claves.items():
+                cantidad, segundos, ingresos = esperado[grupo][clave]
+                esperado[grupo][clave] = (
+                    cantidad + 1, segundos + reserva.duracion_segundos, ingresos + reserva.costo_total
+                )
+
+        for grupo, campo in (('lugares', 'id'), ('tipos', 'id'), ('meses', 'mes')):
+            for fila in resumen[grupo]:
+                with self.subTest(grupo=grupo, clave=fila[campo]):
+                    cantidad, segundos, ingresos = esperado[grupo][fila[campo]]
+                    horas = (Decimal(segundos) / 3600).quantize(Decimal('0.01'))
+                    self.assertEqual((fila['reservas'], fila['horas'], fila['ingresos']), (cantidad, horas, ingresos))
+        self.assertEqual(resumen['total']['ingresos'], sum((r.costo_total for r in reservas), Decimal(0)))
+
+    def test_totales_sin_reglas(self):
+        self.assertFalse(tarifas.tarifario_actual().hay_reglas)
+        self.comprobar_totales()
+
+    def test_totales_con_reglas(self):
+        self.crear_reglas()
+        self.assertTrue(tarifas.tarifario_actual().hay_reglas)
+        self.comprobar_totales()
+
+
+class ArchivoActividadTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(PANEL_ACTIVIDAD_ARCHIVO_DIR=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_meses_sin_actividad_no_crean_archivo(self):
+        for mes in (1, 3):
+            actividad = RegistroActividad.objects.create(accion=f'Acción {mes}')
+            RegistroActividad.objects.filter(pk=actividad.pk).update(
+                timestamp=timezone.make_aware(datetime(2020, mes, 15, 12, 0))
+            )
+
+        resumen = archivo_actividad.archivar(dias=30)
+
+        self.assertEqual(resumen, {date(2020, 1, 1): 1, date(2020, 3, 1): 1})
+        self.assertEqual(archivo_actividad.meses_archivados(), [date(2020, 3, 1), date(2020, 1, 1)])
+        self.assertFalse(RegistroActividad.objects.exists())
+
+
+class EliminacionMasivaEstadisticasTests(TestCase):
+
+    def test_agrupar_aplica_una_vez_al_salir(self):
+        hoy = timezone.localdate()
+        with transaction.atomic(), estadisticas.agrupar():
+            with self.assertNumQueries(0):
+                for _ in range(50):
+                    estadisticas.sumar({hoy: {'nuevos_usuarios': 1}})
+        self.assertEqual(EstadisticaDiaria.objects.get(fecha=hoy).nuevos_usuarios, 50)
+
+    def eliminar_socios(self, cantidad):
+        """Crea `cantidad` socios y los borra con la acción masiva del admin; devuelve los lotes."""
+        hoy = timezone.localdate()
+        admin = Usuario.objects.create_superuser('admin@example.com', 'clave')
+        Usuario.objects.bulk_create([Usuario(email=f'socio{i}@example.com') for i in range(cantidad)])
+        estadisticas.sumar({hoy: {'nuevos_usuarios': cantidad}})
+        solicitud = RequestFactory().post('/')
+        solicitud.user = admin
+
+        with mock.patch.object(
+            ModelAdmin, 'delete_queryset', autospec=True, side_effect=ModelAdmin.delete_queryset
+        ) as borrar:
+            site._registry[Usuario].delete_queryset(solicitud, Usuario.objects.exclude(pk=admin.pk))
+
+        self.assertEqual(Usuario.objects.count(), 1)
+        self.assertEqual(RegistroActividad.objects.count(), cantidad)
+        self.assertEqual(EstadisticaDiaria.objects.get(fecha=hoy).nuevos_usuarios, 1)
+        return borrar.call_count
+
+    def test_eliminacion_pequena_en_una_transaccion(self):
+        with mock.patch('panel.admin.LOTE_ELIMINACION', 30):
+            self.assertEqual(self.eliminar_socios(30), 1)
+
+    def test_eliminacion_grande_por_lotes(self):
+        with mock.patch('panel.admin.LOTE_ELIMINACION', 10):
+            self.assertEqual(self.eliminar_socios(25), 3)
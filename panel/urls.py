@@ -7,6 +7,7 @@ app_name = 'panel'
 urlpatterns = [
     # 1. Dashboard Principal
     path('', views.DashboardView.as_view(), name='dashboard'),
+    path('estadisticas.json', views.estadisticas_json, name='estadisticas_json'),
 
     # 2. Gestión de Afiliaciones
     path('solicitudes/', views.SolicitudesAfiliacionView.as_view(), name='solicitudes_afiliacion'),
@@ -41,6 +42,11 @@ urlpatterns = [
     path('actividad/', views.RegistroActividadView.as_view(), name='registro_actividad'),
 
     path('reservas/', views.ReservaPanelListView.as_view(), name='reserva_panel_list'),
+    path('reservas/linea-tiempo/', views.LineaTiempoView.as_view(), name='linea_tiempo'),
+    path('reservas/linea-tiempo/datos/', views.linea_tiempo_json, name='linea_tiempo_json'),
+    path('reservas/reportes/', views.ReporteReservasView.as_view(), name='reporte_reservas'),
+    path('reservas/reportes/datos/', views.reporte_reservas_json, name='reporte_reservas_json'),
+    path('reservas/acciones/', views.acciones_masivas_reservas, name='reserva_acciones_masivas'),
     path('reservas/<int:pk>/editar/', views.ReservaPanelUpdateView.as_view(), name='reserva_update'),
     path('reservas/<int:pk>/eliminar/', views.ReservaPanelDeleteView.as_view(), name='reserva_delete'),
     path('reservas/<int:pk>/aprobar/', views.aprobar_reserva, name='aprobar_reserva'),
@@ -1,10 +1,11 @@
 # panel/utils.py
-from django.contrib.contenttypes.models import ContentType
-from .models import RegistroActividad
+from .actividad import nueva_actividad, registrar
 
 def registrar_actividad(actor, accion, content_object=None):
     """
     Registra una actividad en el sistema solo si el usuario es administrador.
+    No se inserta en el momento: se guarda junto con las demás actividades
+    de la petición cuando se confirma la transacción (ver `panel.actividad`).
     
     Args:
         actor: Usuario que realiza la acción
@@ -14,22 +15,31 @@ def registrar_actividad(actor, accion, content_object=None):
     # Solo registrar actividades de usuarios administradores (staff)
     if not actor or not actor.is_staff:
         return None
-    
-    actividad = RegistroActividad(
-        actor=actor,
-        accion=accion
-    )
-    
-    if content_object:
-        actividad.content_type = ContentType.objects.get_for_model(content_object)
-        actividad.object_id = content_object.pk
-    
-    try:
-        actividad.save()
-        return actividad
-    except Exception as e:
-        # En caso de error, podríamos loggear aquí
-        return None
+
+    actividad = nueva_actividad(actor, accion, content_object)
+    registrar([actividad])
+    return actividad
+
+def registrar_actividades(actor, modelo, acciones):
+    """
+    Registra varias actividades sobre objetos de un mismo modelo; se guardan
+    con las demás de la petición. Igual que `registrar_actividad`, solo para
+    usuarios administradores.
+
+    Args:
+        actor: Usuario que realiza las acciones
+        modelo: Modelo de los objetos relacionados
+        acciones: Lista de tuplas (pk del objeto, descripción de la acción)
+    """
+    if not actor or not actor.is_staff or not acciones:
+        return []
+
+    actividades = [
+        nueva_actividad(actor, accion, modelo=modelo, object_id=object_id)
+        for object_id, accion in acciones
+    ]
+    registrar(actividades)
+    return actividades
 
 # Funciones específicas para diferentes tipos de actividades
 def registrar_login(usuario):
@@ -2,9 +2,11 @@
 
 # Imports de la librería estándar de Python
 import csv
-from datetime import timedelta
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 
 # Imports de Django
+from django.core.serializers.json import DjangoJSONEncoder
 from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from django.views.generic import (
@@ -16,12 +18,13 @@ from django.views.generic import (
     DeleteView,
 )
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.shortcuts import get_object_or_404, redirect
+from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.db import models
 from django.db.models import Count, Q
-from django.db.models.functions import TruncDate, ExtractHour
 
 # Imports de Modelos de otras apps
 # --- CORRECCIÓN: Se elimina la importación de 'Rol' ---
@@ -41,8 +44,15 @@ from .forms import (
     ServicioForm,
 )
 from .mixins import StaffRequiredMixin
+from .archivo_actividad import buscar as buscar_en_archivo, meses_archivados
+from .estadisticas import serie
+from .indicadores import indicadores
+from .mapa_calor import mapas_por_lugar
+from .linea_tiempo import dias_de_semana, inicio_de_semana, lugares_de_linea, reservas_de_semana
+from .reportes import MAX_MESES_REPORTE, meses_entre, parsear_mes, resumen_reservas
 from .utils import (
     registrar_actividad,
+    registrar_actividades,
     registrar_aprobacion_solicitud,
     registrar_rechazo_solicitud,
     registrar_creacion,
@@ -57,8 +67,18 @@ from usuarios.models import Usuario, PerfilSocio
 from afiliaciones.models import SolicitudAfiliacion
 from .models import RegistroActividad
 
+from reservas.ical import token_de_usuario
 from reservas.models import TipoLugar, Lugar, Reserva
-from .forms import TipoLugarForm, LugarForm, ReservaPanelForm
+from reservas.services import (
+    RESULTADO_CONFLICTO,
+    RESULTADO_HECHO,
+    RESULTADO_NO_ENCONTRADA,
+    RESULTADO_NO_PENDIENTE,
+    ConflictoReserva,
+    cambiar_estado_pendientes,
+    guardar_reserva,
+)
+from .forms import TipoLugarForm, LugarForm, ReservaPanelForm, ReservaFiltroForm
 
 
 # ==============================================================================
@@ -71,43 +91,8 @@ class DashboardView(LoginRequiredMixin, StaffRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         context["title"] = "Dashboard Principal"
 
-        # --- KPIs Clave ---
-        try:
-            total_usuarios = Usuario.objects.count()
-        except:
-            total_usuarios = 0
-            
-        try:
-            total_socios = PerfilSocio.objects.filter(is_active=True).count()
-        except:
-            total_socios = 0
-            
-        try:
-            solicitudes_pendientes = SolicitudAfiliacion.objects.filter(
-                estado="PENDIENTE"
-            ).count()
-        except:
-            solicitudes_pendientes = 0
-            
-        context["kpis"] = {
-            "total_usuarios": total_usuarios,
-            "total_socios": total_socios,
-            "solicitudes_pendientes": solicitudes_pendientes,
-        }
-
-        # --- Datos para Gráfico: Nuevos usuarios en los últimos 7 días ---
-        seven_days_ago = timezone.now() - timedelta(days=7)
-        nuevos_usuarios_data = (
-            Usuario.objects.filter(date_joined__gte=seven_days_ago)
-            .values("date_joined__date")
-            .annotate(count=Count("id"))
-            .order_by("date_joined__date")
-        )
-        context["chart_labels"] = [
-            entry["date_joined__date"].strftime("%b %d")
-            for entry in nuevos_usuarios_data
-        ]
-        context["chart_data"] = [entry["count"] for entry in nuevos_usuarios_data]
+        # --- KPIs y gráfico de nuevos usuarios (una consulta, en caché) ---
+        context.update(indicadores())
 
         # --- Actividad Reciente del Administrador ---
         context["actividad_reciente"] = RegistroActividad.objects.select_related(
@@ -116,9 +101,37 @@ class DashboardView(LoginRequiredMixin, StaffRequiredMixin, TemplateView):
             :5
         ]  # Mostramos solo los 5 más recientes
 
+        # --- Mapa de calor de reservas por día y hora (tabla precalculada) ---
+        context["mapa_calor"] = mapas_por_lugar()
+
         return context
 
 
+MAX_DIAS_ESTADISTICAS = 731
+
+
+def estadisticas_json(request):
+    """
+    Series diarias para los gráficos del dashboard (`?dias=N`, por defecto
+    30), leídas de la tabla `EstadisticaDiaria`.
+    """
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({"mensaje": "No autorizado"}, status=403)
+    try:
+        dias = min(max(int(request.GET.get("dias", 30)), 1), MAX_DIAS_ESTADISTICAS)
+    except ValueError:
+        dias = 30
+    hasta = timezone.localdate()
+    datos = serie(hasta - timedelta(days=dias - 1), hasta)
+    return JsonResponse({
+        "fechas": [fecha.isoformat() for fecha in datos["fechas"]],
+        "nuevos_usuarios": datos["nuevos_usuarios"],
+        "solicitudes_afiliacion": datos["solicitudes_afiliacion"],
+        "reservas_confirmadas": datos["reservas_confirmadas"],
+        "ingresos": [str(Decimal(centavos).scaleb(-2)) for centavos in datos["ingresos_centavos"]],
+    })
+
+
 #
 # ==============================================================================
 # VISTAS PARA AFILIACIONES
@@ -465,7 +478,31 @@ class RegistroActividadView(LoginRequiredMixin, StaffRequiredMixin, ListView):
     context_object_name = "actividades"
     paginate_by = 50
 
+    def mes_archivo(self):
+        """Mes archivado pedido con `?archivo=AAAA-MM`, si existe su archivo."""
+        try:
+            mes = parsear_mes(self.request.GET.get("archivo", ""))
+        except ValueError:
+            return None
+        return mes if mes in meses_archivados() else None
+
     def get_queryset(self):
+        mes = self.mes_archivo()
+        if mes:
+            # Mes ya archivado: se busca descomprimiendo su archivo al vuelo.
+            fecha = None
+            try:
+                fecha = datetime.strptime(self.request.GET.get("fecha", ""), "%Y-%m-%d").date()
+            except ValueError:
+                pass
+            entradas, self.archivo_truncado = buscar_en_archivo(
+                mes,
+                texto=self.request.GET.get("q", ""),
+                tipo=self.request.GET.get("tipo", ""),
+                fecha=fecha,
+            )
+            return entradas
+
         # Solo mostrar actividades de usuarios administradores (staff)
         queryset = (
             RegistroActividad.objects.select_related("actor", "content_type")
@@ -492,8 +529,6 @@ class RegistroActividadView(LoginRequiredMixin, StaffRequiredMixin, ListView):
         fecha = self.request.GET.get("fecha")
         if fecha:
             try:
-                from datetime import datetime
-
                 fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
                 queryset = queryset.filter(timestamp__date=fecha_obj)
             except ValueError:
@@ -506,6 +541,12 @@ class RegistroActividadView(LoginRequiredMixin, StaffRequiredMixin, ListView):
         context["current_query"] = self.request.GET.get("q", "")
         context["current_tipo"] = self.request.GET.get("tipo", "")
         context["current_fecha"] = self.request.GET.get("fecha", "")
+        context["meses_archivados"] = meses_archivados()
+        context["mes_archivo"] = self.mes_archivo()
+        context["archivo_truncado"] = getattr(self, "archivo_truncado", False)
+        parametros = self.request.GET.copy()
+        parametros.pop("page", None)
+        context["parametros_pagina"] = f"&{parametros.urlencode()}" if parametros else ""
 
         # Estadísticas adicionales (solo de administradores)
         from django.utils import timezone
@@ -595,6 +636,11 @@ class LugarListView(StaffRequiredMixin, ListView):
     template_name = "panel/lugar_list.html"
     context_object_name = "lugares"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["token_calendario"] = token_de_usuario(self.request.user)
+        return context
+
 
 class LugarCreateView(StaffRequiredMixin, CreateView):
     model = Lugar
@@ -612,10 +658,90 @@ class LugarUpdateView(StaffRequiredMixin, UpdateView):
 
 # --- Gestión de Reservas ---
 class ReservaPanelListView(StaffRequiredMixin, ListView):
+    """
+    Listado de reservas con filtros y paginación por clave (fecha_inicio, id),
+    de la más reciente a la más antigua.
+
+    En lugar de OFFSET y COUNT, cada página pide las reservas que van antes
+    (`?antes=`) o después (`?despues=`) de la última mostrada, así que la
+    página cuesta lo mismo sin importar cuántas reservas haya en la tabla.
+    """
     model = Reserva
     template_name = "panel/reserva_list.html"
     context_object_name = "reservas"
-    paginate_by = 15
+    tamanio_pagina = 50
+
+    @staticmethod
+    def codificar_cursor(reserva):
+        return f"{reserva.fecha_inicio.isoformat()}_{reserva.pk}"
+
+    @staticmethod
+    def decodificar_cursor(valor):
+        fecha, _, pk = (valor or "").rpartition("_")
+        try:
+            fecha = datetime.fromisoformat(fecha)
+        except ValueError:
+            return None
+        if not pk.isdigit() or timezone.is_naive(fecha):
+            return None
+        return fecha, int(pk)
+
+    def get_queryset(self):
+        self.filtros = ReservaFiltroForm(self.request.GET)
+        consulta = Reserva.objects.select_related("usuario", "lugar")
+        if self.filtros.is_valid():
+            datos = self.filtros.cleaned_data
+            if datos["estado"]:
+                consulta = consulta.filter(estado=datos["estado"])
+            if datos["lugar"]:
+                consulta = consulta.filter(lugar=datos["lugar"])
+            if datos["desde"]:
+                consulta = consulta.filter(
+                    fecha_inicio__gte=timezone.make_aware(datetime.combine(datos["desde"], time.min))
+                )
+            if datos["hasta"]:
+                consulta = consulta.filter(
+                    fecha_inicio__lt=timezone.make_aware(datetime.combine(datos["hasta"] + timedelta(days=1), time.min))
+                )
+
+        antes = self.decodificar_cursor(self.request.GET.get("antes"))
+        despues = self.decodificar_cursor(self.request.GET.get("despues"))
+        if despues:
+            # Página anterior: se recorre hacia adelante y se invierte el resultado.
+            fecha, pk = despues
+            consulta = consulta.filter(
+                Q(fecha_inicio__gt=fecha) | Q(fecha_inicio=fecha, pk__gt=pk)
+            ).order_by("fecha_inicio", "pk")
+        else:
+            if antes:
+                fecha, pk = antes
+                consulta = consulta.filter(Q(fecha_inicio__lt=fecha) | Q(fecha_inicio=fecha, pk__lt=pk))
+            consulta = consulta.order_by("-fecha_inicio", "-pk")
+
+        # Se pide una fila de más para saber si hay otra página sin contar.
+        reservas = list(consulta[: self.tamanio_pagina + 1])
+        hay_mas = len(reservas) > self.tamanio_pagina
+        reservas = reservas[: self.tamanio_pagina]
+        if despues:
+            reservas.reverse()
+            self.hay_anterior, self.hay_siguiente = hay_mas, True
+        else:
+            self.hay_anterior, self.hay_siguiente = bool(antes), hay_mas
+        return reservas
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        reservas = context["reservas"]
+        parametros = self.request.GET.copy()
+        parametros.pop("antes", None)
+        parametros.pop("despues", None)
+        context["filtros"] = self.filtros
+        context["parametros_filtro"] = parametros.urlencode()
+        if reservas and self.hay_siguiente:
+            context["cursor_siguiente"] = self.codificar_cursor(reservas[-1])
+        if reservas and self.hay_anterior:
+            context["cursor_anterior"] = self.codificar_cursor(reservas[0])
+        return context
 
 
 class ReservaPanelUpdateView(StaffRequiredMixin, UpdateView):
@@ -629,9 +755,13 @@ class ReservaPanelUpdateView(StaffRequiredMixin, UpdateView):
         if "estado" in form.changed_data and form.cleaned_data["estado"] == "aprobada":
             reserva.aprobada_por = self.request.user
             reserva.fecha_aprobacion = timezone.now()
-        reserva.save()
+        try:
+            self.object = guardar_reserva(reserva)
+        except ConflictoReserva as error:
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
         messages.success(self.request, "Reserva actualizada exitosamente.")
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
 
 
 class ReservaPanelDeleteView(LoginRequiredMixin, StaffRequiredMixin, DeleteView):
@@ -699,3 +829,150 @@ def rechazar_reserva(request, pk):
         messages.warning(request, "Solo se pueden rechazar reservas que estén en estado 'Pendiente'.")
     
     return redirect('panel:reserva_panel_list')
+
+
+MAX_RESERVAS_ACCION_MASIVA = 500
+ACCIONES_MASIVAS_RESERVA = {
+    # acción: (estado destino, verbo para el registro, participio para los mensajes)
+    'aprobar': ('confirmada', 'Aprobó', 'aprobadas'),
+    'rechazar': ('rechazada', 'Rechazó', 'rechazadas'),
+}
+
+
+@require_POST
+def acciones_masivas_reservas(request):
+    """
+    Aprueba o rechaza de una vez las reservas marcadas en el listado del panel.
+    Informa cuáles no pudieron procesarse (solapamiento o ya no pendientes).
+    """
+    if not request.user.is_staff:
+        return redirect('panel:reserva_panel_list')
+    # Se vuelve a la misma página del listado, con sus filtros.
+    siguiente = request.POST.get('siguiente', '')
+    if not url_has_allowed_host_and_scheme(siguiente, allowed_hosts={request.get_host()}):
+        siguiente = reverse('panel:reserva_panel_list')
+
+    accion = ACCIONES_MASIVAS_RESERVA.get(request.POST.get('accion'))
+    pks = [int(pk) for pk in request.POST.getlist('reservas') if pk.isdigit()]
+    if accion is None or not pks:
+        messages.warning(request, "Seleccione al menos una reserva y una acción.")
+        return redirect(siguiente)
+    if len(pks) > MAX_RESERVAS_ACCION_MASIVA:
+        messages.warning(request, f"Puede procesar como máximo {MAX_RESERVAS_ACCION_MASIVA} reservas a la vez.")
+        return redirect(siguiente)
+
+    estado, verbo, participio = accion
+    resultados, filas = cambiar_estado_pendientes(pks, estado)
+
+    def describir(pk):
+        fila = filas.get(pk)
+        if fila is None:
+            return f"#{pk}"
+        inicio = timezone.localtime(fila['fecha_inicio']).strftime('%d/%m/%y %H:%M')
+        return f"#{pk} ({fila['lugar__nombre']}, {inicio})"
+
+    hechas = [pk for pk, resultado in resultados.items() if resultado == RESULTADO_HECHO]
+    registrar_actividades(request.user, Reserva, [
+        (pk, f"{verbo} la reserva #{pk} - {filas[pk]['lugar__nombre']}") for pk in hechas
+    ])
+    if hechas:
+        messages.success(request, f"{len(hechas)} reservas {participio} exitosamente.")
+
+    avisos = {
+        RESULTADO_CONFLICTO: "No se pudieron aprobar por solapamiento con otra reserva confirmada",
+        RESULTADO_NO_PENDIENTE: "Se omitieron por no estar en estado 'Pendiente'",
+        RESULTADO_NO_ENCONTRADA: "No se encontraron",
+    }
+    for resultado, aviso in avisos.items():
+        afectadas = [describir(pk) for pk, valor in resultados.items() if valor == resultado]
+        if afectadas:
+            messages.warning(request, f"{aviso}: {', '.join(afectadas)}.")
+
+    return redirect(siguiente)
+
+
+# ==============================================================================
+# LÍNEA DE TIEMPO SEMANAL
+# ==============================================================================
+def _semana_pedida(parametros):
+    """Lunes de la semana de `?semana=AAAA-MM-DD` (cualquier día); por defecto, la actual."""
+    try:
+        fecha = datetime.strptime(parametros.get("semana", ""), "%Y-%m-%d").date()
+    except ValueError:
+        fecha = timezone.localdate()
+    return inicio_de_semana(fecha)
+
+
+class LineaTiempoView(LoginRequiredMixin, StaffRequiredMixin, TemplateView):
+    """Todos los lugares a la vez: una fila por lugar y la semana como eje de tiempo."""
+    template_name = "panel/linea_tiempo.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        lunes = _semana_pedida(self.request.GET)
+        lugares = lugares_de_linea()
+        filas = reservas_de_semana(lunes, [lugar.pk for lugar in lugares])
+        for lugar in lugares:
+            lugar.linea = filas[lugar.pk]
+        context["title"] = "Línea de Tiempo"
+        context["lugares"] = lugares
+        context["lunes"] = lunes
+        context["dias"] = dias_de_semana(lunes)
+        return context
+
+
+def linea_tiempo_json(request):
+    """
+    Solo las reservas de otra semana, ya repartidas en carriles, para cambiar
+    de semana sin recargar la página: las filas de lugares no se vuelven a enviar.
+    """
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({"mensaje": "No autorizado"}, status=403)
+    lunes = _semana_pedida(request.GET)
+    lugar_ids = list(Lugar.objects.filter(activo=True).values_list("pk", flat=True))
+    return JsonResponse({
+        "semana": lunes.isoformat(),
+        "dias": [dia["fecha"].strftime("%d/%m") for dia in dias_de_semana(lunes)],
+        "lugares": reservas_de_semana(lunes, lugar_ids),
+    })
+
+
+# ==============================================================================
+# REPORTES DE RESERVAS
+# ==============================================================================
+def _periodo_reporte(parametros):
+    """Lee `desde` y `hasta` (AAAA-MM); por defecto, de enero al mes actual."""
+    hoy = timezone.localdate()
+    desde = parsear_mes(parametros.get("desde") or f"{hoy.year}-01")
+    hasta = parsear_mes(parametros.get("hasta") or f"{hoy.year}-{hoy.month}")
+    if hasta < desde or len(meses_entre(desde, hasta)) > MAX_MESES_REPORTE:
+        raise ValueError
+    return desde, hasta
+
+
+class ReporteReservasView(LoginRequiredMixin, StaffRequiredMixin, TemplateView):
+    template_name = "panel/reporte_reservas.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            desde, hasta = _periodo_reporte(self.request.GET)
+        except ValueError:
+            messages.warning(self.request, f"Periodo inválido. Elija hasta {MAX_MESES_REPORTE} meses.")
+            desde, hasta = _periodo_reporte({})
+        context["title"] = "Reporte de Reservas"
+        context["reporte"] = resumen_reservas(desde, hasta)
+        return context
+
+
+def reporte_reservas_json(request):
+    """El mismo reporte en JSON; los importes y porcentajes se devuelven como texto decimal."""
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({"mensaje": "No autorizado"}, status=403)
+    try:
+        desde, hasta = _periodo_reporte(request.GET)
+    except ValueError:
+        return JsonResponse({"mensaje": f"Periodo inválido (máximo {MAX_MESES_REPORTE} meses)"}, status=400)
+    reporte = resumen_reservas(desde, hasta)
+    reporte["desde"], reporte["hasta"] = desde.strftime("%Y-%m"), hasta.strftime("%Y-%m")
+    return JsonResponse(reporte, encoder=DjangoJSONEncoder)
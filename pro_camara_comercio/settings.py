@@ -51,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware', # Middleware de Allauth
+    'panel.middleware.RegistroActividadMiddleware',
 ]
 
 ROOT_URLCONF = 'pro_camara_comercio.urls'
@@ -78,9 +79,65 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Segundos que una escritura espera al bloqueo de SQLite antes de fallar
+        # (las reservas se serializan por lugar, ver reservas/services.py).
+        'OPTIONS': {'timeout': 20},
+        # Las pruebas usan un archivo y no la base en memoria compartida, cuyo
+        # bloqueo por tabla no respeta `timeout` y rompe las pruebas con hilos.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# --- CACHÉ ---
+# Las retenciones de horarios y las versiones del índice de disponibilidad se
+# guardan en la caché. Con varios procesos (p. ej. varios workers de gunicorn)
+# la caché debe ser compartida. La recomendada es Redis (DJANGO_REDIS_URL,
+# requiere el paquete `redis`), cuyo `incr` es atómico. Con DJANGO_CACHE_DIR
+# se usa una caché en disco común; funciona, pero su `incr` no es atómico y el
+# índice de disponibilidad recarga desde la base de datos cada lugar que
+# cambia (ver reservas/disponibilidad.py).
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+        }
+    }
+elif os.environ.get('DJANGO_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['DJANGO_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Segundos que se mantiene retenido un horario mientras se completa una reserva.
+RESERVAS_RETENCION_SEGUNDOS = 10 * 60
+
+# Horas que una reserva puede seguir pendiente antes de que `expirar_reservas` la expire.
+RESERVAS_PENDIENTE_MAX_HORAS = 72
+
+# Horas reservables por día de cada lugar; base de la tasa de ocupación de los reportes.
+RESERVAS_HORAS_HABILES_POR_DIA = 12
+
+# Escribir el registro de actividad del panel desde un hilo en segundo plano
+# en lugar de al final de cada petición (ver panel/actividad.py).
+PANEL_REGISTRO_EN_SEGUNDO_PLANO = False
+
+# Días que el registro de actividad se mantiene en la base de datos; lo más
+# antiguo se pasa a archivos mensuales comprimidos (ver panel/archivo_actividad.py).
+# En producción conviene apuntar DJANGO_ACTIVIDAD_ARCHIVO_DIR a un directorio
+# con copia de seguridad fuera del código; el de por defecto está en .gitignore.
+PANEL_ACTIVIDAD_RETENCION_DIAS = 180
+PANEL_ACTIVIDAD_ARCHIVO_DIR = os.environ.get('DJANGO_ACTIVIDAD_ARCHIVO_DIR', BASE_DIR / 'archivo_actividad')
+
 # --- CONFIGURACIÓN DE AUTENTICACIÓN Y DJANGO-ALLAUTH ---
 
 # Modelo de usuario personalizado
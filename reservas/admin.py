@@ -2,7 +2,7 @@
 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import TipoLugar, Lugar, Reserva
+from .models import TipoLugar, Lugar, Reserva, ReglaTarifa
 
 # Se registra TipoLugar para que sea visible en el admin
 @admin.register(TipoLugar)
@@ -11,6 +11,12 @@ class TipoLugarAdmin(admin.ModelAdmin):
     list_filter = ('activo',)
     search_fields = ('nombre',)
 
+@admin.register(ReglaTarifa)
+class ReglaTarifaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'clase', 'tipo', 'porcentaje', 'dias_semana', 'hora_desde', 'hora_hasta', 'horas_minimas', 'activo')
+    list_filter = ('clase', 'tipo', 'activo')
+    search_fields = ('nombre',)
+
 @admin.register(Lugar)
 class LugarAdmin(admin.ModelAdmin):
     # CORREGIDO: Se usan campos que sí existen en el modelo Lugar.
@@ -0,0 +1,66 @@
+# reservas/busqueda.py
+"""
+Búsqueda de lugares libres por criterios: el socio indica el horario, el
+número de personas, el tipo y un rango de precios, y recibe los lugares que
+cumplen y están libres, sin revisar cada sala por separado.
+
+La disponibilidad se resuelve en la misma consulta con un anti-join
+(NOT EXISTS) contra `Reserva`, que usa el índice `reserva_lugar_rango_idx`.
+Las retenciones de otros socios viven en la caché y se descartan después con
+una sola lectura.
+"""
+from django.db.models import Exists, OuterRef
+
+from .models import Lugar, Reserva
+from .retenciones import retenciones_de_lugares
+from .tarifas import cotizar
+
+ORDEN_PRECIO = 'precio'
+ORDEN_AJUSTE = 'ajuste'
+ORDENES = [
+    (ORDEN_PRECIO, 'Más económico'),
+    (ORDEN_AJUSTE, 'Capacidad más ajustada'),
+]
+MAX_RESULTADOS = 50
+
+
+def lugares_libres(inicio, fin, personas=None, tipo_id=None, precio_min=None, precio_max=None,
+                   orden=ORDEN_PRECIO, usuario_id=None, socio=False, limite=MAX_RESULTADOS):
+    """
+    Lugares activos libres en [inicio, fin) que cumplen los criterios,
+    ordenados por precio o por capacidad más cercana a `personas`. Cada lugar
+    trae `costo`, el precio del horario completo según `reservas.tarifas`.
+    Las retenciones de `usuario_id` no cuentan como ocupación.
+    """
+    ocupado = Reserva.objects.filter(
+        lugar_id=OuterRef('pk'), fecha_fin__gt=inicio, fecha_inicio__lt=fin,
+    ).exclude(estado__in=Reserva.ESTADOS_LIBERADOS)
+    consulta = Lugar.objects.filter(activo=True, tipo__activo=True).filter(~Exists(ocupado))
+    if personas:
+        consulta = consulta.filter(tipo__capacidad_maxima__gte=personas)
+    if tipo_id:
+        consulta = consulta.filter(tipo_id=tipo_id)
+    if precio_min is not None:
+        consulta = consulta.filter(tipo__precio_por_hora__gte=precio_min)
+    if precio_max is not None:
+        consulta = consulta.filter(tipo__precio_por_hora__lte=precio_max)
+
+    if orden == ORDEN_AJUSTE:
+        # Con la capacidad mínima ya filtrada, la sala más pequeña es la que mejor se ajusta.
+        consulta = consulta.order_by('tipo__capacidad_maxima', 'tipo__precio_por_hora', 'nombre', 'pk')
+    else:
+        consulta = consulta.order_by('tipo__precio_por_hora', 'tipo__capacidad_maxima', 'nombre', 'pk')
+    consulta = consulta.select_related('tipo')
+
+    # Se piden filas de más para que descartar las retenidas no deje la página corta.
+    candidatos = list(consulta[:limite * 2])
+    retenidos = retenciones_de_lugares([lugar.pk for lugar in candidatos], excluir_usuario=usuario_id)
+    resultado = []
+    for lugar in candidatos:
+        if any(r_inicio < fin and r_fin > inicio for r_inicio, r_fin in retenidos[lugar.pk]):
+            continue
+        lugar.costo = cotizar(lugar.tipo_id, inicio, fin, socio=socio)
+        resultado.append(lugar)
+        if len(resultado) == limite:
+            break
+    return resultado
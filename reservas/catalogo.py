@@ -0,0 +1,74 @@
+# reservas/catalogo.py
+"""
+Instantánea del catálogo de lugares reservables (lugares cuyo tipo está
+activo) para el formulario de reserva.
+
+Se construye con una sola consulta y se guarda en memoria junto con su JSON
+ya serializado, así que mostrar el formulario o servir `/reservas/catalogo.json`
+no consulta la base de datos. Igual que el índice de disponibilidad, cada
+cambio de `Lugar` o `TipoLugar` publica una versión nueva en la caché
+compartida y los procesos reconstruyen su copia en la siguiente lectura.
+"""
+import json
+import threading
+
+from .versiones import publicar_version, version_publicada
+
+CLAVE_VERSION = 'reservas:catalogo:version'
+
+
+class Catalogo:
+    __slots__ = ('version', 'lugares', 'opciones', 'json')
+
+    def __init__(self, version, filas):
+        self.version = version
+        self.lugares = {
+            fila['pk']: {
+                'nombre': fila['nombre'],
+                'tipo': fila['tipo__nombre'],
+                'tipo_id': fila['tipo_id'],
+                'capacidad': fila['tipo__capacidad_maxima'],
+                'precio_por_hora': str(fila['tipo__precio_por_hora']),
+            }
+            for fila in filas
+        }
+        # Mismo texto que `str(lugar)`, que es lo que mostraría el ModelChoiceField.
+        self.opciones = [(pk, datos['nombre']) for pk, datos in self.lugares.items()]
+        self.json = json.dumps(
+            {'version': version, 'lugares': self.lugares}, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+
+    @property
+    def etag(self):
+        return f'"{self.version}"'
+
+
+_actual = None
+_lock = threading.Lock()
+
+
+def catalogo_actual():
+    """Devuelve la instantánea vigente, reconstruyéndola si cambió su versión."""
+    global _actual
+    version = version_publicada(CLAVE_VERSION)
+    catalogo = _actual
+    if catalogo is not None and catalogo.version == version:
+        return catalogo
+    with _lock:
+        if _actual is None or _actual.version != version:
+            from .models import Lugar
+
+            filas = (
+                Lugar.objects.filter(tipo__activo=True)
+                .order_by('pk')
+                .values(
+                    'pk', 'nombre', 'tipo_id', 'tipo__nombre', 'tipo__capacidad_maxima', 'tipo__precio_por_hora',
+                )
+            )
+            _actual = Catalogo(version, filas)
+        return _actual
+
+
+def invalidar():
+    """Publica una versión nueva; se llama desde las señales de `Lugar` y `TipoLugar`."""
+    publicar_version(CLAVE_VERSION)
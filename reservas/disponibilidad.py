@@ -0,0 +1,447 @@
+# reservas/disponibilidad.py
+"""
+Índice en memoria de las reservas activas de cada lugar.
+
+Cada lugar guarda sus intervalos ordenados por fecha de inicio junto con el
+máximo acumulado de las fechas de fin. Con eso, saber si un rango
+[inicio, fin) choca con alguna reserva es una búsqueda binaria más una
+lectura: existe conflicto si alguna reserva que empieza antes de `fin`
+termina después de `inicio`.
+
+El índice se carga de forma perezosa (una consulta por lugar) y se mantiene
+sincronizado con las señales de `Reserva` (ver `reservas/signals.py`). Para
+despliegues con varios procesos, cada cambio publica una versión nueva por
+lugar en la caché compartida; si la versión no coincide con la cargada, el
+lugar se reconstruye desde la base de datos en la siguiente consulta.
+
+Con un backend cuyo `cache.incr` es atómico (Redis, Memcached y la caché
+local) la versión es un contador y el proceso que hizo el cambio conserva
+su copia cuando su incremento es justo el siguiente a la versión que tenía.
+En los demás (p. ej. FileBasedCache, cuyo `incr` lee y escribe en dos pasos)
+dos procesos podrían obtener el mismo número: ahí cada cambio publica un
+valor aleatorio y el proceso descarta su copia, que se recarga de la base.
+"""
+import secrets
+import threading
+from bisect import bisect_left
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .funciones_db import SegundosEpoca
+from .retenciones import retenciones_de_lugares, retenciones_del_lugar
+
+
+def parsear_fecha(valor):
+    """Convierte un texto ISO ('2025-08-01T10:00') en un datetime con zona horaria."""
+    if not valor:
+        return None
+    try:
+        fecha = parse_datetime(valor)
+    except ValueError:
+        return None
+    if fecha is not None and timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+class _IntervalosLugar:
+    """Intervalos (inicio, fin) de un lugar, ordenados por inicio."""
+
+    __slots__ = ('claves', 'fines', 'inicio_de', 'max_fin', 'sucio', 'version')
+
+    def __init__(self, filas, version):
+        filas = sorted(filas)
+        self.claves = [(inicio, pk) for inicio, pk, _ in filas]
+        self.fines = [fin for _, _, fin in filas]
+        self.inicio_de = {pk: inicio for inicio, pk, _ in filas}
+        self.max_fin = []
+        self.sucio = True
+        self.version = version
+
+    def agregar(self, pk, inicio, fin):
+        clave = (inicio, pk)
+        posicion = bisect_left(self.claves, clave)
+        self.claves.insert(posicion, clave)
+        self.fines.insert(posicion, fin)
+        self.inicio_de[pk] = inicio
+        self.sucio = True
+
+    def quitar(self, pk):
+        inicio = self.inicio_de.pop(pk, None)
+        if inicio is None:
+            return
+        posicion = bisect_left(self.claves, (inicio, pk))
+        del self.claves[posicion]
+        del self.fines[posicion]
+        self.sucio = True
+
+    def _recalcular(self):
+        acumulado = []
+        maximo = None
+        for fin in self.fines:
+            if maximo is None or fin > maximo:
+                maximo = fin
+            acumulado.append(maximo)
+        self.max_fin = acumulado
+        self.sucio = False
+
+    def hay_conflicto(self, inicio, fin):
+        if self.sucio:
+            self._recalcular()
+        # Reservas que empiezan antes de `fin`: posiciones [0, limite).
+        limite = bisect_left(self.claves, (fin,))
+        return limite > 0 and self.max_fin[limite - 1] > inicio
+
+    def conflictos(self, ventanas):
+        """`hay_conflicto` para una lista de ventanas (inicio, fin)."""
+        if self.sucio:
+            self._recalcular()
+        claves, max_fin = self.claves, self.max_fin
+        resultado = []
+        for inicio, fin in ventanas:
+            limite = bisect_left(claves, (fin,))
+            resultado.append(limite > 0 and max_fin[limite - 1] > inicio)
+        return resultado
+
+    def __len__(self):
+        return len(self.claves)
+
+
+class IndiceDisponibilidad:
+    """
+    Índice de disponibilidad por lugar. Una única instancia por proceso
+    (`indice_disponibilidad`) es compartida por todas las vistas.
+    """
+
+    PREFIJO_VERSION = 'reservas:indice:version'
+
+    def __init__(self):
+        self._lugares = {}
+        self._lugar_de_reserva = {}
+        self._lock = threading.RLock()
+
+    # --- Versionado compartido entre procesos ---
+    def _clave_version(self, lugar_id):
+        return f'{self.PREFIJO_VERSION}:{lugar_id}'
+
+    def _version_actual(self, lugar_id):
+        clave = self._clave_version(lugar_id)
+        version = cache.get(clave)
+        if version is None:
+            cache.add(clave, self._version_inicial(), timeout=None)
+            version = cache.get(clave)
+        return version
+
+    @staticmethod
+    def _version_inicial():
+        # Contador que arranca en un valor aleatorio: si la clave se expulsa
+        # de la caché, la nueva serie no vuelve a pasar por versiones antiguas.
+        return secrets.randbits(48)
+
+    @staticmethod
+    def _incr_atomico():
+        return isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, RedisCache, BaseMemcachedCache))
+
+    def _publicar_version(self, lugar_id):
+        """
+        Publica una versión nueva y la devuelve: el siguiente número del
+        contador si `incr` es atómico; si no, un valor aleatorio con `set`,
+        que nunca repite una versión que otro proceso pudiera tener cargada.
+        """
+        clave = self._clave_version(lugar_id)
+        if not self._incr_atomico():
+            version = self._version_inicial()
+            cache.set(clave, version, timeout=None)
+            return version
+        try:
+            return cache.incr(clave)
+        except ValueError:
+            # La clave no existe (caché vacía o expulsada).
+            cache.add(clave, self._version_inicial(), timeout=None)
+            return cache.incr(clave)
+
+    # --- Carga ---
+    def _cargar(self, lugar_id, version):
+        from .models import Lugar, Reserva
+
+        if not Lugar.objects.filter(pk=lugar_id).exists():
+            self._lugares.pop(lugar_id, None)
+            return None
+        filas = (
+            Reserva.objects.filter(lugar_id=lugar_id)
+            .exclude(estado__in=Reserva.ESTADOS_LIBERADOS)
+            .values_list('fecha_inicio', 'pk', 'fecha_fin')
+        )
+        intervalos = _IntervalosLugar(filas, version)
+        for pk in intervalos.inicio_de:
+            self._lugar_de_reserva[pk] = lugar_id
+        self._lugares[lugar_id] = intervalos
+        return intervalos
+
+    def _obtener(self, lugar_id):
+        version = self._version_actual(lugar_id)
+        intervalos = self._lugares.get(lugar_id)
+        if intervalos is not None and intervalos.version == version:
+            return intervalos
+        with self._lock:
+            intervalos = self._lugares.get(lugar_id)
+            if intervalos is not None and intervalos.version == version:
+                return intervalos
+            if intervalos is not None:
+                for pk in intervalos.inicio_de:
+                    self._lugar_de_reserva.pop(pk, None)
+            return self._cargar(lugar_id, version)
+
+    # --- Consultas ---
+    def existe_lugar(self, lugar_id):
+        return self._obtener(lugar_id) is not None
+
+    def hay_conflicto(self, lugar_id, inicio, fin):
+        """
+        Indica si [inicio, fin) se solapa con alguna reserva activa del lugar.
+        Lanza `KeyError` si el lugar no existe.
+        """
+        intervalos = self._obtener(lugar_id)
+        if intervalos is None:
+            raise KeyError(lugar_id)
+        with self._lock:
+            return intervalos.hay_conflicto(inicio, fin)
+
+    def conflictos(self, lugar_id, ventanas):
+        """
+        Como `hay_conflicto` para varias ventanas del mismo lugar, con un solo
+        bloqueo. Devuelve None si el lugar no existe.
+        """
+        intervalos = self._obtener(lugar_id)
+        if intervalos is None:
+            return None
+        with self._lock:
+            return intervalos.conflictos(ventanas)
+
+    # --- Mantenimiento (llamado desde las señales) ---
+    def registrar(self, pk, lugar_id, inicio, fin, activa, lugar_anterior=None):
+        """Inserta, mueve o elimina una reserva tras guardarla."""
+        with self._lock:
+            lugares_afectados = {lugar_id}
+            if lugar_anterior is not None:
+                lugares_afectados.add(lugar_anterior)
+            lugar_cargado = self._lugar_de_reserva.pop(pk, None)
+            if lugar_cargado is not None:
+                lugares_afectados.add(lugar_cargado)
+                anterior = self._lugares.get(lugar_cargado)
+                if anterior is not None:
+                    anterior.quitar(pk)
+            intervalos = self._lugares.get(lugar_id)
+            if activa and intervalos is not None:
+                intervalos.agregar(pk, inicio, fin)
+                self._lugar_de_reserva[pk] = lugar_id
+            self._publicar(lugares_afectados)
+
+    def quitar(self, pk, lugar_id):
+        """Elimina una reserva borrada de la base de datos."""
+        with self._lock:
+            lugares_afectados = {lugar_id}
+            lugar_anterior = self._lugar_de_reserva.pop(pk, None)
+            if lugar_anterior is not None:
+                lugares_afectados.add(lugar_anterior)
+                intervalos = self._lugares.get(lugar_anterior)
+                if intervalos is not None:
+                    intervalos.quitar(pk)
+            self._publicar(lugares_afectados)
+
+    def invalidar(self, *lugar_ids):
+        """Descarta los lugares indicados; se recargarán en la siguiente consulta."""
+        with self._lock:
+            for lugar_id in lugar_ids:
+                intervalos = self._lugares.pop(lugar_id, None)
+                if intervalos is not None:
+                    for pk in intervalos.inicio_de:
+                        self._lugar_de_reserva.pop(pk, None)
+                self._publicar_version(lugar_id)
+
+    def limpiar(self):
+        """Vacía el índice local (no toca las versiones compartidas)."""
+        with self._lock:
+            self._lugares.clear()
+            self._lugar_de_reserva.clear()
+
+    def _publicar(self, lugar_ids):
+        for lugar_id in lugar_ids:
+            intervalos = self._lugares.get(lugar_id)
+            version = self._publicar_version(lugar_id)
+            # La copia local sigue siendo fiable solo si este incremento atómico
+            # es el siguiente a su versión; si otro proceso publicó entremedias,
+            # su cambio no está aplicado aquí y se descarta.
+            vigente = (
+                intervalos is not None and intervalos.version is not None
+                and self._incr_atomico() and version == intervalos.version + 1
+            )
+            if vigente:
+                intervalos.version = version
+            elif intervalos is not None:
+                self._lugares.pop(lugar_id)
+                for pk in intervalos.inicio_de:
+                    self._lugar_de_reserva.pop(pk, None)
+
+
+indice_disponibilidad = IndiceDisponibilidad()
+
+
+# ==============================================================================
+# BÚSQUEDA DE HUECOS LIBRES
+# ==============================================================================
+def fusionar_intervalos(intervalos):
+    """
+    Une los intervalos que se solapan o se tocan. Espera los intervalos
+    ordenados por inicio y devuelve una lista de tuplas (inicio, fin).
+    """
+    fusionados = []
+    for inicio, fin in intervalos:
+        if fusionados and inicio <= fusionados[-1][1]:
+            if fin > fusionados[-1][1]:
+                fusionados[-1] = (fusionados[-1][0], fin)
+        else:
+            fusionados.append((inicio, fin))
+    return fusionados
+
+
+def calcular_huecos(ocupados, desde, hasta, duracion_minima):
+    """
+    Recorre los intervalos ocupados (ordenados por inicio) y devuelve los
+    huecos dentro de [desde, hasta) que duran al menos `duracion_minima`.
+    """
+    huecos = []
+    cursor = desde
+    for inicio, fin in fusionar_intervalos(ocupados):
+        if inicio >= hasta:
+            break
+        if inicio - cursor >= duracion_minima:
+            huecos.append((cursor, inicio))
+        if fin > cursor:
+            cursor = fin
+        if cursor >= hasta:
+            break
+    if hasta - cursor >= duracion_minima:
+        huecos.append((cursor, hasta))
+    return huecos
+
+
+def huecos_de_lugar(lugar_id, desde, hasta, duracion_minima, usuario_id=None):
+    """
+    Huecos libres de un lugar cargando sus reservas del rango en una sola
+    consulta. Los horarios retenidos por otros usuarios cuentan como ocupados.
+    """
+    from .models import Reserva
+
+    ocupados = list(
+        Reserva.objects.filter(lugar_id=lugar_id, fecha_inicio__lt=hasta, fecha_fin__gt=desde)
+        .exclude(estado__in=Reserva.ESTADOS_LIBERADOS)
+        .order_by('fecha_inicio')
+        .values_list('fecha_inicio', 'fecha_fin')
+    )
+    retenidos = retenciones_del_lugar(lugar_id, excluir_usuario=usuario_id)
+    if retenidos:
+        ocupados = sorted(ocupados + retenidos)
+    return calcular_huecos(ocupados, desde, hasta, duracion_minima)
+
+
+# ==============================================================================
+# MATRIZ DE DISPONIBILIDAD (VARIOS LUGARES x VARIAS VENTANAS)
+# ==============================================================================
+def matriz_disponibilidad(lugar_ids, ventanas, usuario_id=None):
+    """
+    Calcula qué lugares están libres en cada ventana (inicio, fin).
+
+    Las reservas se consultan en el índice en memoria (una búsqueda binaria
+    por lugar y ventana, sin ir a la base de datos una vez cargado el lugar).
+    Los horarios retenidos por usuarios distintos de `usuario_id` cuentan
+    como ocupados; son pocos y se comparan directamente. Devuelve un
+    diccionario {lugar_id: [bool, ...]} con un valor por ventana, en el orden
+    recibido.
+    """
+    if not lugar_ids or not ventanas:
+        return {lugar_id: [True] * len(ventanas) for lugar_id in lugar_ids}
+
+    # El índice guarda las fechas en UTC, como las devuelve la base de datos;
+    # con la misma zona horaria la comparación no llama a `utcoffset()`.
+    ventanas = [(inicio.astimezone(dt_timezone.utc), fin.astimezone(dt_timezone.utc)) for inicio, fin in ventanas]
+    retenciones = retenciones_de_lugares(lugar_ids, excluir_usuario=usuario_id)
+    matriz = {}
+    for lugar_id in lugar_ids:
+        conflictos = indice_disponibilidad.conflictos(lugar_id, ventanas)
+        if conflictos is None:
+            # Lugar inexistente: no tiene reservas.
+            conflictos = [False] * len(ventanas)
+        fila = [not conflicto for conflicto in conflictos]
+        for ret_inicio, ret_fin in retenciones.get(lugar_id, ()):
+            for posicion, (inicio, fin) in enumerate(ventanas):
+                if fila[posicion] and ret_inicio < fin and ret_fin > inicio:
+                    fila[posicion] = False
+        matriz[lugar_id] = fila
+    return matriz
+
+
+def matriz_disponibilidad_bd(lugar_ids, ventanas, usuario_id=None):
+    """
+    Como `matriz_disponibilidad`, pero leyendo de la base de datos en lugar
+    del índice en memoria. Es la que se usa con el bloqueo del lugar tomado,
+    donde el resultado tiene que reflejar lo ya confirmado por otros procesos.
+
+    Trae todas las reservas relevantes en una sola consulta por rango y, para
+    cada lugar, recorre a la vez sus intervalos fusionados y las ventanas
+    ordenadas por inicio. Los horarios retenidos por usuarios distintos de
+    `usuario_id` cuentan como ocupados. Devuelve un diccionario
+    {lugar_id: [bool, ...]} con un valor por ventana, en el orden recibido.
+    """
+    from .models import Reserva
+
+    if not lugar_ids or not ventanas:
+        return {lugar_id: [True] * len(ventanas) for lugar_id in lugar_ids}
+
+    # Todo se compara en segundos desde la época para no convertir datetimes.
+    ventanas = [(int(inicio.timestamp()), int(fin.timestamp())) for inicio, fin in ventanas]
+    desde = min(inicio for inicio, _ in ventanas)
+    hasta = max(fin for _, fin in ventanas)
+    filas = (
+        Reserva.objects.filter(
+            lugar_id__in=lugar_ids,
+            fecha_inicio__lt=datetime.fromtimestamp(hasta, tz=dt_timezone.utc),
+            fecha_fin__gt=datetime.fromtimestamp(desde, tz=dt_timezone.utc),
+        )
+        .exclude(estado__in=Reserva.ESTADOS_LIBERADOS)
+        .order_by('lugar_id', 'fecha_inicio')
+        .values_list('lugar_id', SegundosEpoca('fecha_inicio'), SegundosEpoca('fecha_fin'))
+    )
+    ocupados = {lugar_id: [] for lugar_id in lugar_ids}
+    for lugar_id, inicio, fin in filas:
+        ocupados[lugar_id].append((inicio, fin))
+    for lugar_id, retenidos in retenciones_de_lugares(lugar_ids, excluir_usuario=usuario_id).items():
+        if retenidos:
+            ocupados[lugar_id].extend(
+                (int(inicio.timestamp()), int(fin.timestamp())) for inicio, fin in retenidos
+            )
+            ocupados[lugar_id].sort()
+
+    orden = sorted(range(len(ventanas)), key=lambda i: ventanas[i][0])
+    ventanas_ordenadas = [ventanas[i] for i in orden]
+    matriz = {}
+    for lugar_id in lugar_ids:
+        intervalos = fusionar_intervalos(ocupados[lugar_id])
+        total = len(intervalos)
+        fila = [True] * len(ventanas)
+        j = 0
+        for posicion, (inicio, fin) in zip(orden, ventanas_ordenadas):
+            # Los intervalos fusionados son disjuntos: los que terminan antes
+            # de esta ventana también terminan antes de las siguientes.
+            while j < total and intervalos[j][1] <= inicio:
+                j += 1
+            if j < total and intervalos[j][0] < fin:
+                fila[posicion] = False
+        matriz[lugar_id] = fila
+    return matriz
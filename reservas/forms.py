@@ -1,7 +1,37 @@
 # reservas/forms.py
 
+from datetime import timedelta
+
 from django import forms
-from .models import Lugar, TipoLugar, Reserva
+
+from .models import Lugar, TipoLugar, Reserva, SerieReserva
+from .busqueda import ORDENES, ORDEN_PRECIO
+from .services import MENSAJE_CONFLICTO, MAX_OCURRENCIAS_SERIE, hay_solapamiento
+
+
+class ValidacionHorarioMixin:
+    """
+    Valida que la reserva termine después de empezar y que no se solape con
+    otra reserva activa del mismo lugar. La comprobación definitiva se repite
+    al guardar con `reservas.services.guardar_reserva`.
+    """
+
+    def clean(self):
+        cleaned_data = super().clean()
+        lugar = cleaned_data.get("lugar")
+        fecha_inicio = cleaned_data.get("fecha_inicio")
+        fecha_fin = cleaned_data.get("fecha_fin")
+        estado = cleaned_data.get("estado", self.instance.estado)
+
+        if fecha_inicio and fecha_fin and fecha_fin <= fecha_inicio:
+            self.add_error("fecha_fin", "La fecha de fin debe ser posterior a la fecha de inicio.")
+        elif (
+            lugar and fecha_inicio and fecha_fin
+            and estado not in Reserva.ESTADOS_LIBERADOS
+            and hay_solapamiento(lugar.pk, fecha_inicio, fecha_fin, self.instance.pk)
+        ):
+            raise forms.ValidationError(MENSAJE_CONFLICTO)
+        return cleaned_data
 
 
 class TipoLugarForm(forms.ModelForm):
@@ -16,7 +46,7 @@ class LugarForm(forms.ModelForm):
         fields = ["nombre", "tipo", "descripcion", "imagen"]
 
 
-class ReservaForm(forms.ModelForm):
+class ReservaForm(ValidacionHorarioMixin, forms.ModelForm):
     class Meta:
         model = Reserva
         fields = ["lugar", "fecha_inicio", "fecha_fin", "proposito", "notas_adicionales"]
@@ -45,7 +75,7 @@ class ReservaForm(forms.ModelForm):
         self.fields["fecha_fin"].input_formats = ("%Y-%m-%dT%H:%M",)
 
 
-class ReservaPanelForm(forms.ModelForm):
+class ReservaPanelForm(ValidacionHorarioMixin, forms.ModelForm):
     class Meta:
         model = Reserva
         fields = [
@@ -77,4 +107,107 @@ class ReservaPanelForm(forms.ModelForm):
         self.fields['proposito'].help_text = 'Por favor, indique el propósito de la reserva'
         self.fields['proposito'].widget.attrs.update({
             'placeholder': 'Ej: Reunión de equipo, Capacitación, etc.'
-        })
\ No newline at end of file
+        })
+
+
+class SerieReservaForm(forms.ModelForm):
+    """Reserva repetida: la primera ocurrencia más la regla de repetición."""
+
+    # Separación mínima entre ocurrencias para cada frecuencia (mes más corto: 28 días).
+    PERIODO_MINIMO = {
+        "diaria": timedelta(days=1),
+        "semanal": timedelta(weeks=1),
+        "mensual": timedelta(days=28),
+    }
+
+    fecha_inicio = forms.DateTimeField(
+        label="Inicio de la primera reserva",
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}, format="%Y-%m-%dT%H:%M"),
+        input_formats=("%Y-%m-%dT%H:%M",),
+    )
+    fecha_fin = forms.DateTimeField(
+        label="Fin de la primera reserva",
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}, format="%Y-%m-%dT%H:%M"),
+        input_formats=("%Y-%m-%dT%H:%M",),
+    )
+    proposito = forms.CharField(
+        label="Propósito", max_length=255,
+        widget=forms.TextInput(attrs={"placeholder": "Ej: Reunión semanal de directorio"}),
+    )
+    notas_adicionales = forms.CharField(label="Notas adicionales", required=False, widget=forms.Textarea)
+
+    class Meta:
+        model = SerieReserva
+        fields = ["lugar", "frecuencia", "intervalo", "repetir_hasta"]
+        widgets = {
+            "repetir_hasta": forms.DateInput(attrs={"type": "date"}, format="%Y-%m-%d"),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["lugar"].queryset = Lugar.objects.filter(tipo__activo=True)
+        self.fields["intervalo"].min_value = 1
+
+    def clean(self):
+        cleaned_data = super().clean()
+        fecha_inicio = cleaned_data.get("fecha_inicio")
+        fecha_fin = cleaned_data.get("fecha_fin")
+        frecuencia = cleaned_data.get("frecuencia")
+        intervalo = cleaned_data.get("intervalo") or 1
+        repetir_hasta = cleaned_data.get("repetir_hasta")
+
+        if fecha_inicio and fecha_fin:
+            if fecha_fin <= fecha_inicio:
+                self.add_error("fecha_fin", "La fecha de fin debe ser posterior a la fecha de inicio.")
+            elif frecuencia and fecha_fin - fecha_inicio > self.PERIODO_MINIMO[frecuencia] * intervalo:
+                self.add_error("fecha_fin", "Cada reserva debe terminar antes de que empiece la siguiente.")
+        if fecha_inicio and repetir_hasta and repetir_hasta < fecha_inicio.date():
+            self.add_error("repetir_hasta", "La serie debe terminar después de la primera reserva.")
+        if frecuencia and fecha_inicio and repetir_hasta:
+            dias = (repetir_hasta - fecha_inicio.date()).days
+            if dias // (self.PERIODO_MINIMO[frecuencia].days * intervalo) >= MAX_OCURRENCIAS_SERIE:
+                self.add_error("repetir_hasta", f"Una serie no puede superar {MAX_OCURRENCIAS_SERIE} reservas.")
+        return cleaned_data
+
+
+class BusquedaLugaresForm(forms.Form):
+    """Criterios de la búsqueda de lugares libres (se envía por GET)."""
+
+    MAX_DURACION = timedelta(days=1)
+
+    fecha_inicio = forms.DateTimeField(
+        label="Desde",
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}, format="%Y-%m-%dT%H:%M"),
+        input_formats=("%Y-%m-%dT%H:%M",),
+    )
+    fecha_fin = forms.DateTimeField(
+        label="Hasta",
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}, format="%Y-%m-%dT%H:%M"),
+        input_formats=("%Y-%m-%dT%H:%M",),
+    )
+    personas = forms.IntegerField(label="Personas", min_value=1, required=False)
+    tipo = forms.ModelChoiceField(
+        label="Tipo de lugar", queryset=TipoLugar.objects.filter(activo=True).order_by("nombre"),
+        required=False, empty_label="Cualquiera",
+    )
+    precio_min = forms.DecimalField(label="Precio mínimo por hora", min_value=0, decimal_places=2, required=False)
+    precio_max = forms.DecimalField(label="Precio máximo por hora", min_value=0, decimal_places=2, required=False)
+    orden = forms.ChoiceField(label="Ordenar por", choices=ORDENES, initial=ORDEN_PRECIO, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        fecha_inicio = cleaned_data.get("fecha_inicio")
+        fecha_fin = cleaned_data.get("fecha_fin")
+        precio_min = cleaned_data.get("precio_min")
+        precio_max = cleaned_data.get("precio_max")
+
+        if fecha_inicio and fecha_fin:
+            if fecha_fin <= fecha_inicio:
+                self.add_error("fecha_fin", "La fecha de fin debe ser posterior a la fecha de inicio.")
+            elif fecha_fin - fecha_inicio > self.MAX_DURACION:
+                self.add_error("fecha_fin", "El horario buscado no puede superar un día.")
+        if precio_min is not None and precio_max is not None and precio_min > precio_max:
+            self.add_error("precio_max", "El precio máximo debe ser mayor o igual al mínimo.")
+        if not cleaned_data.get("orden"):
+            cleaned_data["orden"] = ORDEN_PRECIO
+        return cleaned_data
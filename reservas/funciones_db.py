@@ -0,0 +1,51 @@
+# reservas/funciones_db.py
+"""
+Funciones de base de datos propias de la app de reservas.
+"""
+from django.db.models import BigIntegerField, Func
+
+
+class SegundosEpoca(Func):
+    """
+    Segundos desde 1970-01-01 UTC de un campo DateTime.
+
+    Devolver enteros en lugar de datetimes evita la conversión fila a fila que
+    hace el ORM, lo que importa cuando se leen miles de intervalos a la vez.
+    """
+
+    output_field = BigIntegerField()
+
+    @property
+    def convert_value(self):
+        # Los motores soportados ya devuelven enteros; se evita el conversor por fila.
+        return self._convert_value_noop
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)",
+            **extra_context,
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(EXTRACT(EPOCH FROM %(expressions)s) AS BIGINT)',
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)', **extra_context)
+
+
+class DivisionEntera(Func):
+    """Cociente entero (truncado) de dos expresiones enteras."""
+
+    arg_joiner = ' / '
+    arity = 2
+    output_field = BigIntegerField()
+    template = '(%(expressions)s)'
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        # En MySQL '/' siempre devuelve un decimal.
+        return self.as_sql(compiler, connection, arg_joiner=' DIV ', **extra_context)
@@ -0,0 +1,153 @@
+# reservas/ical.py
+"""
+Calendarios iCalendar (.ics) con las reservas de un socio o de un lugar.
+
+Se consultan sin sesión, con un token firmado en la URL que identifica al
+usuario y lleva su `clave_calendario`: al regenerar la clave dejan de valer
+todos los enlaces anteriores del usuario. Los eventos se generan recorriendo
+la consulta por bloques, así que la memoria no crece con el número de
+reservas. Las reservas canceladas, rechazadas o expiradas se publican con
+STATUS:CANCELLED para que los clientes las retiren de su calendario.
+"""
+import hashlib
+import secrets
+import time
+
+from django.core import signing
+from django.db.models import Count, Max
+
+from . import catalogo
+from .funciones_db import SegundosEpoca
+from .versiones import version_publicada
+
+SAL_TOKEN = 'reservas.ical'
+# Cambiarla invalida los ETag emitidos cuando cambia el contenido de los eventos.
+VERSION_FORMATO = '1'
+TAMANIO_BLOQUE = 2000
+EVENTOS_POR_FRAGMENTO = 200
+
+ESTADOS_ICAL = {'pendiente': 'TENTATIVE', 'confirmada': 'CONFIRMED'}
+
+
+def _firmante():
+    return signing.Signer(salt=SAL_TOKEN, sep='.')
+
+
+def token_de_usuario(usuario):
+    # Sin clave (usuarios anteriores a la clave) el token es solo el pk firmado.
+    valor = f'{usuario.pk}-{usuario.clave_calendario}' if usuario.clave_calendario else str(usuario.pk)
+    return _firmante().sign(valor)
+
+
+def usuario_del_token(token):
+    """
+    Devuelve un filtro {'pk', 'clave_calendario'} de `Usuario` para el token,
+    o None si la firma no es válida.
+    """
+    try:
+        valor = _firmante().unsign(token)
+    except signing.BadSignature:
+        return None
+    pk, _, clave = valor.partition('-')
+    return {'pk': int(pk), 'clave_calendario': clave} if pk.isdigit() else None
+
+
+def regenerar_clave(usuario):
+    """Da al usuario una clave de calendario nueva, lo que invalida sus enlaces anteriores."""
+    usuario.clave_calendario = secrets.token_urlsafe(24)
+    usuario.save(update_fields=['clave_calendario'])
+
+
+def version_de(consulta, con_usuarios=False):
+    """
+    Devuelve (etag, ultima_modificacion) de una consulta de reservas con una
+    sola agregación. Se incluye el número de filas para que el ETag cambie
+    también cuando se borra una reserva, y la versión del catálogo de lugares
+    porque los eventos llevan el nombre del lugar.
+
+    Con `con_usuarios` (calendarios cuyos eventos llevan el nombre del socio)
+    se añaden los nombres de los socios de la consulta, que no tienen fecha de
+    modificación: una consulta más, sobre los socios distintos.
+    """
+    datos = consulta.aggregate(total=Count('pk'), ultima=Max('fecha_actualizacion'))
+    ultima = datos['ultima']
+    lugares = version_publicada(catalogo.CLAVE_VERSION)
+    huella = f"{VERSION_FORMATO}:{datos['total']}:{ultima.isoformat() if ultima else ''}:{lugares}"
+    if con_usuarios:
+        nombres = (
+            consulta.order_by('usuario_id')
+            .values_list('usuario_id', 'usuario__first_name', 'usuario__last_name')
+            .distinct()
+        )
+        huella += ''.join(f'\n{pk}\t{nombre}\t{apellido}' for pk, nombre, apellido in nombres)
+    return f'"{hashlib.md5(huella.encode()).hexdigest()}"', ultima
+
+
+def _texto(valor):
+    """Escapa un valor TEXT según RFC 5545."""
+    return (
+        (valor or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fecha(segundos):
+    return time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(segundos))
+
+
+def _linea(texto):
+    """Pliega la línea en tramos de 75 octetos (RFC 5545) y la termina en CRLF."""
+    if len(texto.encode('utf-8')) <= 75:
+        return texto + '\r\n'
+    tramos, actual, tamanio = [], '', 0
+    for caracter in texto:
+        largo = len(caracter.encode('utf-8'))
+        # Las líneas de continuación empiezan con un espacio, que también cuenta.
+        if tamanio + largo > (74 if tramos else 75):
+            tramos.append(actual)
+            actual, tamanio = '', 0
+        actual += caracter
+        tamanio += largo
+    tramos.append(actual)
+    return '\r\n '.join(tramos) + '\r\n'
+
+
+def generar_calendario(consulta, nombre, dominio, resumen):
+    """
+    Genera el calendario por fragmentos de texto. `consulta` debe ser un
+    queryset de `Reserva`; `resumen(fila)` recibe el diccionario de valores
+    de cada reserva (incluye `lugar__nombre`, `usuario__first_name`,
+    `usuario__last_name` y `proposito`) y devuelve el título del evento.
+    """
+    yield (
+        _linea('BEGIN:VCALENDAR')
+        + _linea('VERSION:2.0')
+        + _linea('PRODID:-//Camara de Comercio de Loja//Reservas//ES')
+        + _linea('CALSCALE:GREGORIAN')
+        + _linea(f'X-WR-CALNAME:{_texto(nombre)}')
+    )
+    # Las fechas se leen como segundos enteros para evitar la conversión a
+    # datetime fila a fila, que domina el tiempo con cientos de miles de filas.
+    filas = consulta.order_by('fecha_inicio', 'pk').values(
+        'pk', 'estado', 'proposito', 'lugar__nombre', 'usuario__first_name', 'usuario__last_name',
+        inicio=SegundosEpoca('fecha_inicio'),
+        fin=SegundosEpoca('fecha_fin'),
+        actualizacion=SegundosEpoca('fecha_actualizacion'),
+    )
+    eventos = []
+    for fila in filas.iterator(chunk_size=TAMANIO_BLOQUE):
+        eventos.append(
+            'BEGIN:VEVENT\r\n'
+            + _linea(f"UID:reserva-{fila['pk']}@{dominio}")
+            + f"DTSTAMP:{_fecha(fila['actualizacion'])}\r\n"
+            + f"DTSTART:{_fecha(fila['inicio'])}\r\n"
+            + f"DTEND:{_fecha(fila['fin'])}\r\n"
+            + _linea(f"SUMMARY:{_texto(resumen(fila))}")
+            + _linea(f"LOCATION:{_texto(fila['lugar__nombre'])}")
+            + f"STATUS:{ESTADOS_ICAL.get(fila['estado'], 'CANCELLED')}\r\n"
+            + 'END:VEVENT\r\n'
+        )
+        if len(eventos) >= EVENTOS_POR_FRAGMENTO:
+            yield ''.join(eventos)
+            eventos = []
+    yield ''.join(eventos) + _linea('END:VCALENDAR')
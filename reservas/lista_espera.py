@@ -0,0 +1,126 @@
+# reservas/lista_espera.py
+"""
+Lista de espera de horarios ocupados.
+
+Cuando una reserva activa se cancela, se rechaza, expira, se borra o se mueve,
+se buscan con una sola consulta (índice `espera_lugar_rango_idx`) las
+solicitudes en espera que se solapan con el horario liberado y se intentan
+convertir en reservas pendientes por orden de llegada. La primera que cabe
+ocupa el horario; las siguientes que chocan con ella siguen esperando.
+"""
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .disponibilidad import fusionar_intervalos
+from .models import Reserva, SolicitudEspera
+
+# Solicitudes en espera que puede tener a la vez un mismo socio.
+MAX_SOLICITUDES_POR_USUARIO = 10
+
+
+def _activa(datos):
+    return datos is not None and datos['estado'] not in Reserva.ESTADOS_LIBERADOS
+
+
+def intervalos_liberados(cambios):
+    """
+    Horarios que dejan de estar ocupados según los cambios de
+    `reservas_modificadas`, fusionados por lugar: {lugar_id: [(inicio, fin), ...]}.
+    """
+    por_lugar = {}
+    for anterior, actual in cambios:
+        if not _activa(anterior):
+            continue
+        if _activa(actual) and all(
+            actual[campo] == anterior[campo] for campo in ('lugar_id', 'fecha_inicio', 'fecha_fin')
+        ):
+            continue
+        por_lugar.setdefault(anterior['lugar_id'], []).append((anterior['fecha_inicio'], anterior['fecha_fin']))
+    return {lugar_id: fusionar_intervalos(sorted(intervalos)) for lugar_id, intervalos in por_lugar.items()}
+
+
+def candidatas(liberados, ahora=None):
+    """Solicitudes en espera que se solapan con `liberados`, de la más antigua a la más reciente."""
+    condicion = Q()
+    for lugar_id, intervalos in liberados.items():
+        for inicio, fin in intervalos:
+            condicion |= Q(lugar_id=lugar_id, fecha_inicio__lt=fin, fecha_fin__gt=inicio)
+    if not condicion:
+        return SolicitudEspera.objects.none()
+    return (
+        SolicitudEspera.objects.filter(condicion, estado='esperando', fecha_inicio__gt=ahora or timezone.now())
+        .select_related('usuario', 'lugar')
+        .order_by('fecha_creacion', 'pk')
+    )
+
+
+def _promover(solicitud):
+    """Crea la reserva pendiente de la solicitud; devuelve None si el horario sigue ocupado."""
+    from .services import ConflictoReserva, guardar_reserva
+
+    try:
+        with transaction.atomic():
+            reserva = guardar_reserva(Reserva(
+                usuario_id=solicitud.usuario_id,
+                lugar_id=solicitud.lugar_id,
+                fecha_inicio=solicitud.fecha_inicio,
+                fecha_fin=solicitud.fecha_fin,
+                proposito=solicitud.proposito,
+                estado='pendiente',
+            ))
+            tomada = SolicitudEspera.objects.filter(pk=solicitud.pk, estado='esperando').update(
+                estado='promovida', reserva=reserva
+            )
+            if not tomada:
+                # Otro proceso la promovió o el socio la canceló mientras tanto.
+                transaction.set_rollback(True)
+                return None
+    except ConflictoReserva:
+        return None
+    return reserva
+
+
+def _avisar(solicitud, reserva):
+    if not solicitud.usuario.email:
+        return
+    inicio = timezone.localtime(reserva.fecha_inicio)
+    send_mail(
+        f"Se liberó el horario que esperaba en {solicitud.lugar.nombre}",
+        (
+            f"Se ha creado una reserva pendiente de aprobación en {solicitud.lugar.nombre} "
+            f"para el {inicio:%d/%m/%Y} a las {inicio:%H:%M}.\n"
+            "Puede consultarla o cancelarla desde 'Mis reservas'."
+        ),
+        None,
+        [solicitud.usuario.email],
+        fail_silently=True,
+    )
+
+
+def promover_liberados(cambios):
+    """Convierte en reservas las solicitudes que caben en los horarios liberados por `cambios`."""
+    liberados = intervalos_liberados(cambios)
+    if not liberados:
+        return []
+    promovidas = []
+    for solicitud in candidatas(liberados):
+        reserva = _promover(solicitud)
+        if reserva is not None:
+            promovidas.append(solicitud)
+            _avisar(solicitud, reserva)
+    return promovidas
+
+
+def posicion(solicitud):
+    """Puesto de la solicitud entre las que esperan un horario que se solapa con el suyo."""
+    return SolicitudEspera.objects.filter(
+        lugar_id=solicitud.lugar_id,
+        estado='esperando',
+        fecha_inicio__lt=solicitud.fecha_fin,
+        fecha_fin__gt=solicitud.fecha_inicio,
+    ).filter(
+        Q(fecha_creacion__lt=solicitud.fecha_creacion)
+        | Q(fecha_creacion=solicitud.fecha_creacion, pk__lt=solicitud.pk)
+    ).count() + 1
@@ -0,0 +1,103 @@
+# reservas/management/commands/_datos_sinteticos.py
+"""
+Utilidades compartidas por los comandos de rendimiento: una base de datos de
+prueba desechable y un generador de reservas sintéticas.
+"""
+import os
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+from reservas.models import Lugar, Reserva, TipoLugar
+from usuarios.models import Usuario
+
+FECHA_BASE = timezone.make_aware(datetime(2024, 1, 1, 8, 0))
+
+
+@contextmanager
+def base_de_datos_temporal(en_archivo=False):
+    """
+    Crea una base de datos de prueba vacía y la destruye al salir.
+
+    Con `en_archivo=True` y SQLite se usa un archivo temporal en lugar de la
+    base en memoria compartida, cuyo bloqueo por tabla no respeta el tiempo de
+    espera y haría fallar las pruebas con varios hilos escribiendo.
+    """
+    nombre_original = connection.settings_dict['NAME']
+    nombre_prueba = connection.settings_dict['TEST'].get('NAME')
+    directorio = None
+    if en_archivo and connection.vendor == 'sqlite':
+        directorio = tempfile.mkdtemp()
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directorio, 'prueba.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        connection.settings_dict['TEST']['NAME'] = nombre_prueba
+        if directorio:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+def crear_catalogo(num_lugares, num_usuarios=1):
+    """Crea un tipo de lugar, `num_lugares` lugares y `num_usuarios` usuarios de pruebas."""
+    tipo = TipoLugar.objects.create(
+        nombre='Sala de pruebas', capacidad_maxima=10, precio_por_hora=Decimal('25.00')
+    )
+    Lugar.objects.bulk_create(
+        [Lugar(nombre=f'Sala {i + 1}', tipo=tipo) for i in range(num_lugares)]
+    )
+    Usuario.objects.bulk_create([
+        Usuario(email=f'benchmark{i + 1}@example.com', first_name='Bench', last_name=f'Mark {i + 1}')
+        for i in range(num_usuarios)
+    ])
+    return list(Lugar.objects.order_by('pk')), list(Usuario.objects.order_by('pk'))
+
+
+class GeneradorReservas:
+    """
+    Genera reservas consecutivas por lugar (1 a 3 horas, con huecos de hasta
+    2 horas y un 10% canceladas). Cada llamada a `generar` continúa donde se
+    quedó la anterior, así se pueden construir tamaños crecientes sin empezar
+    de cero.
+    """
+
+    def __init__(self, lugares, usuarios, semilla=42):
+        self.lugares = lugares
+        self.usuarios = usuarios
+        self.aleatorio = random.Random(semilla)
+        self.cursor = {lugar.pk: FECHA_BASE for lugar in lugares}
+
+    def generar(self, cantidad, lote=50000):
+        pendientes = []
+        for i in range(cantidad):
+            lugar = self.lugares[i % len(self.lugares)]
+            inicio = self.cursor[lugar.pk] + timedelta(minutes=15 * self.aleatorio.randint(0, 8))
+            fin = inicio + timedelta(minutes=30 * self.aleatorio.randint(2, 6))
+            self.cursor[lugar.pk] = fin
+            estado = 'cancelada' if self.aleatorio.random() < 0.1 else self.aleatorio.choice(
+                ('pendiente', 'confirmada')
+            )
+            pendientes.append(Reserva(
+                usuario=self.aleatorio.choice(self.usuarios), lugar=lugar,
+                fecha_inicio=inicio, fecha_fin=fin, estado=estado, proposito='Reserva sintética',
+            ))
+            if len(pendientes) >= lote:
+                Reserva.objects.bulk_create(pendientes)
+                pendientes = []
+        if pendientes:
+            Reserva.objects.bulk_create(pendientes)
+
+    def ventana_aleatoria(self):
+        """Devuelve (lugar_id, inicio, fin) dentro del rango ya generado."""
+        lugar = self.aleatorio.choice(self.lugares)
+        limite = (self.cursor[lugar.pk] - FECHA_BASE).total_seconds()
+        inicio = FECHA_BASE + timedelta(seconds=self.aleatorio.uniform(0, limite))
+        inicio = inicio.replace(second=0, microsecond=0)
+        return lugar.pk, inicio, inicio + timedelta(minutes=30 * self.aleatorio.randint(1, 6))
@@ -0,0 +1,72 @@
+# reservas/management/commands/benchmark_disponibilidad.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from reservas.disponibilidad import indice_disponibilidad
+from reservas.models import Reserva
+
+from ._datos_sinteticos import GeneradorReservas, base_de_datos_temporal, crear_catalogo
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la consulta ORM de verificar_disponibilidad con el índice en memoria "
+        "sobre una base de datos temporal con 10k, 100k y 1M reservas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--lugares', type=int, default=10)
+        parser.add_argument('--consultas', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        tamanos = sorted(options['tamanos'])
+        with base_de_datos_temporal():
+            lugares, usuarios = crear_catalogo(options['lugares'])
+            generador = GeneradorReservas(lugares, usuarios)
+            generadas = 0
+
+            self.stdout.write(
+                f"{'reservas':>10} | {'carga índice':>12} | {'ORM (µs)':>10} | {'índice (µs)':>11} | {'mejora':>7}"
+            )
+            for tamano in tamanos:
+                generador.generar(tamano - generadas)
+                generadas = tamano
+                ventanas = [generador.ventana_aleatoria() for _ in range(options['consultas'])]
+
+                indice_disponibilidad.limpiar()
+                inicio = time.perf_counter()
+                for lugar in lugares:
+                    indice_disponibilidad.existe_lugar(lugar.pk)
+                carga = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                esperados = [
+                    Reserva.objects.filter(
+                        lugar_id=lugar_id, fecha_inicio__lt=fin, fecha_fin__gt=ini,
+                    ).exclude(estado='cancelada').exists()
+                    for lugar_id, ini, fin in ventanas
+                ]
+                tiempo_orm = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                obtenidos = [
+                    indice_disponibilidad.hay_conflicto(lugar_id, ini, fin)
+                    for lugar_id, ini, fin in ventanas
+                ]
+                tiempo_indice = time.perf_counter() - inicio
+
+                if esperados != obtenidos:
+                    diferencias = sum(a != b for a, b in zip(esperados, obtenidos))
+                    self.stderr.write(self.style.ERROR(
+                        f"El índice difiere del ORM en {diferencias} de {len(ventanas)} consultas."
+                    ))
+
+                por_consulta_orm = tiempo_orm / len(ventanas) * 1e6
+                por_consulta_indice = tiempo_indice / len(ventanas) * 1e6
+                self.stdout.write(
+                    f"{tamano:>10,} | {carga:>10.2f} s | {por_consulta_orm:>10.1f} | "
+                    f"{por_consulta_indice:>11.1f} | {por_consulta_orm / por_consulta_indice:>6.0f}x"
+                )
+            indice_disponibilidad.limpiar()
@@ -0,0 +1,62 @@
+# reservas/management/commands/benchmark_matriz_disponibilidad.py
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservas.disponibilidad import indice_disponibilidad, matriz_disponibilidad, matriz_disponibilidad_bd
+
+from ._datos_sinteticos import GeneradorReservas, base_de_datos_temporal, crear_catalogo
+
+OBJETIVO_MS = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide matriz_disponibilidad (índice en memoria) frente a la versión que lee de la base de "
+        f"datos, con 50 lugares x 200 ventanas sobre 200k reservas. Objetivo: menos de {OBJETIVO_MS} ms."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservas', type=int, default=200_000)
+        parser.add_argument('--lugares', type=int, default=50)
+        parser.add_argument('--ventanas', type=int, default=200)
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            lugares, usuarios = crear_catalogo(options['lugares'])
+            generador = GeneradorReservas(lugares, usuarios)
+            generador.generar(options['reservas'])
+            lugar_ids = [lugar.pk for lugar in lugares]
+
+            def ventanas():
+                return [generador.ventana_aleatoria()[1:] for _ in range(options['ventanas'])]
+
+            indice_disponibilidad.limpiar()
+            inicio = time.perf_counter()
+            matriz_disponibilidad(lugar_ids, ventanas())
+            carga = time.perf_counter() - inicio
+
+            tiempos_bd, tiempos_indice = [], []
+            for _ in range(options['repeticiones']):
+                consulta = ventanas()
+                inicio = time.perf_counter()
+                esperada = matriz_disponibilidad_bd(lugar_ids, consulta)
+                tiempos_bd.append(time.perf_counter() - inicio)
+                inicio = time.perf_counter()
+                obtenida = matriz_disponibilidad(lugar_ids, consulta)
+                tiempos_indice.append(time.perf_counter() - inicio)
+                if esperada != obtenida:
+                    raise CommandError('La matriz del índice difiere de la calculada en la base de datos.')
+            indice_disponibilidad.limpiar()
+
+        mediana_bd = statistics.median(tiempos_bd) * 1000
+        mediana_indice = statistics.median(tiempos_indice) * 1000
+        self.stdout.write(f"Carga inicial del índice (primera consulta): {carga * 1000:.0f} ms")
+        self.stdout.write(f"Base de datos: mediana {mediana_bd:.1f} ms")
+        self.stdout.write(f"Índice en memoria: mediana {mediana_indice:.1f} ms")
+        if mediana_indice < OBJETIVO_MS:
+            self.stdout.write(self.style.SUCCESS(f"Dentro del objetivo de {OBJETIVO_MS} ms."))
+        else:
+            self.stdout.write(self.style.WARNING(f"Por encima del objetivo de {OBJETIVO_MS} ms."))
@@ -0,0 +1,110 @@
+# reservas/management/commands/contencion_reservas.py
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from reservas.models import Reserva
+from reservas.services import ConflictoReserva, guardar_reserva, hay_solapamiento
+
+from ._datos_sinteticos import FECHA_BASE, base_de_datos_temporal, crear_catalogo
+
+
+def contar_dobles_reservas(lugar_id):
+    """Número de reservas activas que se solapan con alguna anterior del mismo lugar."""
+    intervalos = (
+        Reserva.objects.filter(lugar_id=lugar_id)
+        .exclude(estado__in=Reserva.ESTADOS_LIBERADOS)
+        .order_by('fecha_inicio')
+        .values_list('fecha_inicio', 'fecha_fin')
+    )
+    dobles = 0
+    fin_maximo = None
+    for inicio, fin in intervalos:
+        if fin_maximo is not None and inicio < fin_maximo:
+            dobles += 1
+        fin_maximo = fin if fin_maximo is None else max(fin_maximo, fin)
+    return dobles
+
+
+def guardar_sin_bloqueo(reserva):
+    """El flujo anterior: comprobar y guardar sin transacción ni bloqueo."""
+    if hay_solapamiento(reserva.lugar_id, reserva.fecha_inicio, reserva.fecha_fin):
+        raise ConflictoReserva()
+    reserva.save()
+    return reserva
+
+
+class Command(BaseCommand):
+    help = (
+        "Lanza muchos hilos que intentan reservar los mismos horarios de un lugar a la vez "
+        "y comprueba que no se producen reservas dobles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=50)
+        parser.add_argument('--horarios', type=int, default=20, help='Horarios disputados por todos los hilos.')
+        parser.add_argument(
+            '--sin-bloqueo', action='store_true',
+            help='Usa el flujo sin bloqueo para comparar (se esperan reservas dobles).',
+        )
+
+    def handle(self, *args, **options):
+        guardar = guardar_sin_bloqueo if options['sin_bloqueo'] else guardar_reserva
+        with base_de_datos_temporal(en_archivo=True):
+            lugares, usuarios = crear_catalogo(num_lugares=1, num_usuarios=options['hilos'])
+            lugar = lugares[0]
+            horarios = [
+                (FECHA_BASE + timedelta(hours=i), FECHA_BASE + timedelta(hours=i + 1))
+                for i in range(options['horarios'])
+            ]
+            resultados = {'aceptadas': 0, 'rechazadas': 0, 'errores': 0}
+            candado = threading.Lock()
+            barrera = threading.Barrier(options['hilos'])
+
+            def socio(usuario, semilla):
+                propios = horarios[:]
+                random.Random(semilla).shuffle(propios)
+                barrera.wait()
+                try:
+                    for inicio, fin in propios:
+                        reserva = Reserva(usuario=usuario, lugar=lugar, fecha_inicio=inicio, fecha_fin=fin)
+                        try:
+                            guardar(reserva)
+                            clave = 'aceptadas'
+                        except ConflictoReserva:
+                            clave = 'rechazadas'
+                        except OperationalError:
+                            clave = 'errores'
+                        with candado:
+                            resultados[clave] += 1
+                finally:
+                    connection.close()
+
+            hilos = [
+                threading.Thread(target=socio, args=(usuario, i)) for i, usuario in enumerate(usuarios)
+            ]
+            inicio = time.perf_counter()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            duracion = time.perf_counter() - inicio
+
+            intentos = sum(resultados.values())
+            dobles = contar_dobles_reservas(lugar.pk)
+            self.stdout.write(f"Hilos: {options['hilos']}, horarios disputados: {options['horarios']}")
+            self.stdout.write(
+                f"Intentos: {intentos} en {duracion:.2f} s ({intentos / duracion:.0f} intentos/s)"
+            )
+            self.stdout.write(
+                f"Aceptadas: {resultados['aceptadas']}, rechazadas por conflicto: "
+                f"{resultados['rechazadas']}, errores de bloqueo: {resultados['errores']}"
+            )
+            self.stdout.write(f"Reservas dobles: {dobles}")
+
+        if dobles and not options['sin_bloqueo']:
+            raise CommandError(f'Se detectaron {dobles} reservas dobles.')
@@ -0,0 +1,46 @@
+# reservas/management/commands/expirar_reservas.py
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from panel.models import RegistroActividad
+from reservas.services import expirar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Expira las reservas pendientes que nadie revisó a tiempo: las creadas hace más "
+        "de --horas o cuyo inicio ya pasó. Pensado para cron o como proceso en bucle (--cada)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horas', type=int, default=getattr(settings, 'RESERVAS_PENDIENTE_MAX_HORAS', 72),
+            help='Antigüedad máxima de una reserva pendiente, en horas.',
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Filas actualizadas por transacción.')
+        parser.add_argument(
+            '--cada', type=int, default=0,
+            help='Repetir cada N segundos en lugar de ejecutarse una sola vez.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.expirar(options['horas'], options['lote'])
+            if not options['cada']:
+                break
+            time.sleep(options['cada'])
+
+    def expirar(self, horas, lote):
+        ahora = timezone.now()
+        total = expirar_pendientes(ahora - timedelta(hours=horas), ahora=ahora, lote=lote)
+        if total:
+            # Un único registro resumen en lugar de uno por reserva.
+            RegistroActividad.objects.create(
+                actor=None,
+                accion=f"Expiraron {total} reservas pendientes sin revisar (más de {horas} h o con inicio vencido)",
+            )
+        self.stdout.write(self.style.SUCCESS(f'Reservas expiradas: {total}.'))
@@ -0,0 +1,99 @@
+# reservas/management/commands/explicar_consultas_reservas.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from reservas.models import Reserva
+from reservas.services import consulta_solapamiento
+
+from ._datos_sinteticos import GeneradorReservas, base_de_datos_temporal, crear_catalogo
+
+
+def consulta_mis_reservas(usuario_id):
+    """La consulta de la primera página de MisReservasView."""
+    return Reserva.objects.filter(usuario_id=usuario_id).order_by('-fecha_inicio')[:10]
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica con EXPLAIN que las consultas de disponibilidad y de 'Mis reservas' usan "
+        "los índices de Reserva. Con --filas mide además los tiempos con y sin índices "
+        "sobre una base de datos temporal."
+    )
+
+    # Índice que debe aparecer en el plan de cada consulta.
+    INDICES_ESPERADOS = {
+        'solapamiento': 'reserva_lugar_rango_idx',
+        'mis_reservas': 'reserva_usuario_inicio_idx',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filas', type=int, default=0,
+            help='Reservas a generar para medir tiempos (p. ej. 1000000). Por defecto solo EXPLAIN.',
+        )
+        parser.add_argument('--consultas', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            lugares, usuarios = crear_catalogo(num_lugares=10, num_usuarios=200)
+            generador = GeneradorReservas(lugares, usuarios)
+            generador.generar(options['filas'] or 1000)
+            if connection.vendor in ('sqlite', 'postgresql'):
+                # Estadísticas actualizadas para que el planificador elija como en producción.
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            self._verificar_planes(lugares[0].pk, usuarios[0].pk)
+            if options['filas']:
+                self._medir(generador, usuarios, options['consultas'])
+
+    def _consultas_de_ejemplo(self, lugar_id, usuario_id):
+        inicio = Reserva.objects.order_by('fecha_inicio').values_list('fecha_inicio', flat=True).first()
+        return {
+            'solapamiento': consulta_solapamiento(lugar_id, inicio, inicio + timedelta(hours=2)),
+            'mis_reservas': consulta_mis_reservas(usuario_id),
+        }
+
+    def _verificar_planes(self, lugar_id, usuario_id):
+        fallos = []
+        for nombre, consulta in self._consultas_de_ejemplo(lugar_id, usuario_id).items():
+            plan = consulta.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{nombre}:'))
+            self.stdout.write(plan)
+            if self.INDICES_ESPERADOS[nombre] not in plan:
+                fallos.append(f"{nombre} no usa {self.INDICES_ESPERADOS[nombre]}")
+        if fallos:
+            raise CommandError('; '.join(fallos))
+        self.stdout.write(self.style.SUCCESS('Todas las consultas usan sus índices.'))
+
+    def _medir(self, generador, usuarios, total):
+        ventanas = [generador.ventana_aleatoria() for _ in range(total)]
+        usuario_ids = [generador.aleatorio.choice(usuarios).pk for _ in range(total)]
+
+        def cronometrar():
+            inicio = time.perf_counter()
+            for lugar_id, ini, fin in ventanas:
+                consulta_solapamiento(lugar_id, ini, fin).exists()
+            solapamiento = (time.perf_counter() - inicio) / total * 1000
+            inicio = time.perf_counter()
+            for usuario_id in usuario_ids:
+                list(consulta_mis_reservas(usuario_id))
+            mis_reservas = (time.perf_counter() - inicio) / total * 1000
+            return solapamiento, mis_reservas
+
+        indices = list(Reserva._meta.indexes)
+        con_indices = cronometrar()
+        with connection.schema_editor() as editor:
+            for indice in indices:
+                editor.remove_index(Reserva, indice)
+        sin_indices = cronometrar()
+        with connection.schema_editor() as editor:
+            for indice in indices:
+                editor.add_index(Reserva, indice)
+
+        self.stdout.write(f"\n{'consulta':<14} | {'sin índices (ms)':>16} | {'con índices (ms)':>16}")
+        for nombre, antes, despues in zip(('solapamiento', 'mis_reservas'), sin_indices, con_indices):
+            self.stdout.write(f'{nombre:<14} | {antes:>16.3f} | {despues:>16.3f}')
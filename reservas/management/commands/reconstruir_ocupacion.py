@@ -0,0 +1,16 @@
+# reservas/management/commands/reconstruir_ocupacion.py
+from django.core.management.base import BaseCommand
+
+from reservas import ocupacion
+
+
+class Command(BaseCommand):
+    help = "Recalcula la tabla OcupacionDiaria desde las reservas (carga inicial o reparación)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lugar', type=int, action='append', dest='lugares',
+                            help='Limitar a este lugar (se puede repetir).')
+
+    def handle(self, *args, **options):
+        dias = ocupacion.reconstruir(options['lugares'])
+        self.stdout.write(self.style.SUCCESS(f'Ocupación reconstruida: {dias} días con reservas.'))
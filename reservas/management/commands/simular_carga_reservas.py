@@ -0,0 +1,182 @@
+# reservas/management/commands/simular_carga_reservas.py
+import math
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from reservas.models import Reserva
+
+from ._datos_sinteticos import base_de_datos_temporal, crear_catalogo
+from .contencion_reservas import contar_dobles_reservas
+
+ENDPOINTS = ('lugares', 'verificar', 'reservar')
+PERCENTILES = (50, 95, 99)
+
+
+def percentil(valores, p):
+    """Percentil `p` (método del rango más cercano) de una lista ordenada."""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula socios que navegan la lista de lugares, consultan la disponibilidad y compiten "
+        "por reservar los mismos horarios a través de las vistas (cliente de pruebas de Django, "
+        "un hilo por socio). Informa del rendimiento y latencia por endpoint, de las reservas "
+        "aceptadas y rechazadas y de las reservas dobles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socios', type=int, default=20, help='Socios simultáneos (un hilo cada uno).')
+        parser.add_argument('--iteraciones', type=int, default=30, help='Intentos de reserva de cada socio.')
+        parser.add_argument('--lugares', type=int, default=5)
+        parser.add_argument('--horarios', type=int, default=40, help='Horarios de una hora que se disputan.')
+        parser.add_argument(
+            '--prob-navegar', type=float, default=0.3,
+            help='Probabilidad de que un socio cargue la lista de lugares antes de cada intento.',
+        )
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['socios'] < 1 or options['iteraciones'] < 1 or options['horarios'] < 1:
+            raise CommandError('--socios, --iteraciones y --horarios deben ser mayores que cero.')
+
+        # El cliente de pruebas usa el host 'testserver'; los avisos por correo
+        # de la lista de espera se quedan en memoria.
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        ), base_de_datos_temporal(en_archivo=True):
+            lugares, usuarios = crear_catalogo(options['lugares'], options['socios'])
+            resultados = self._simular(lugares, usuarios, options)
+            dobles = sum(contar_dobles_reservas(lugar.pk) for lugar in lugares)
+            guardadas = Reserva.objects.count()
+
+        self._informar(resultados, options)
+        self.stdout.write(f"Reservas guardadas: {guardadas}, reservas dobles: {dobles}")
+        if guardadas != resultados['aceptadas']:
+            raise CommandError(
+                f"Se guardaron {guardadas} reservas pero las vistas aceptaron {resultados['aceptadas']}."
+            )
+        if dobles:
+            raise CommandError(f'Se detectaron {dobles} reservas dobles.')
+
+    def _simular(self, lugares, usuarios, options):
+        # Horarios en el futuro; los primeros son los más solicitados (pesos 1/n).
+        base = timezone.localtime().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=7)
+        horarios = [
+            (lugares[i % len(lugares)].pk, base + timedelta(days=i // 10, hours=i % 10))
+            for i in range(options['horarios'])
+        ]
+        pesos = [1 / (i + 1) for i in range(len(horarios))]
+
+        url_lugares = reverse('reservas:lugares_list')
+        url_verificar = reverse('reservas:verificar_disponibilidad')
+        url_reservar = reverse('reservas:nueva_reserva')
+        formato = '%Y-%m-%dT%H:%M'
+
+        latencias = {endpoint: [] for endpoint in ENDPOINTS}
+        resultados = {'aceptadas': 0, 'rechazadas': 0, 'ocupadas': 0, 'errores': 0}
+        candado = threading.Lock()
+        barrera = threading.Barrier(len(usuarios))
+
+        def socio(usuario, semilla):
+            aleatorio = random.Random(semilla)
+            propias = {endpoint: [] for endpoint in ENDPOINTS}
+            contadores = dict.fromkeys(resultados, 0)
+            cliente = Client()
+            cliente.force_login(usuario)
+
+            def medir(endpoint, peticion):
+                inicio = time.perf_counter()
+                try:
+                    return peticion()
+                except OperationalError:
+                    contadores['errores'] += 1
+                    return None
+                finally:
+                    propias[endpoint].append(time.perf_counter() - inicio)
+
+            barrera.wait()
+            try:
+                for _ in range(options['iteraciones']):
+                    if aleatorio.random() < options['prob_navegar']:
+                        medir('lugares', lambda: cliente.get(url_lugares))
+                    lugar_id, inicio = aleatorio.choices(horarios, pesos)[0]
+                    datos = {
+                        'lugar_id': lugar_id,
+                        'fecha_inicio': inicio.strftime(formato),
+                        'fecha_fin': (inicio + timedelta(hours=1)).strftime(formato),
+                    }
+                    respuesta = medir('verificar', lambda: cliente.get(url_verificar, datos))
+                    if respuesta is None:
+                        continue
+                    if not respuesta.json().get('disponible'):
+                        contadores['ocupadas'] += 1
+                        continue
+                    respuesta = medir('reservar', lambda: cliente.post(url_reservar, {
+                        'lugar': lugar_id,
+                        'fecha_inicio': datos['fecha_inicio'],
+                        'fecha_fin': datos['fecha_fin'],
+                        'proposito': 'Simulación de carga',
+                    }))
+                    if respuesta is None:
+                        continue
+                    # Éxito: redirección a "Mis reservas"; conflicto: el formulario con errores.
+                    contadores['aceptadas' if respuesta.status_code == 302 else 'rechazadas'] += 1
+            finally:
+                connection.close()
+                with candado:
+                    for endpoint, valores in propias.items():
+                        latencias[endpoint].extend(valores)
+                    for clave, valor in contadores.items():
+                        resultados[clave] += valor
+
+        hilos = [threading.Thread(target=socio, args=(usuario, options['semilla'] + i)) for i, usuario in enumerate(usuarios)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        resultados['duracion'] = time.perf_counter() - inicio
+        resultados['latencias'] = {endpoint: sorted(valores) for endpoint, valores in latencias.items()}
+        return resultados
+
+    def _informar(self, resultados, options):
+        latencias = resultados['latencias']
+        peticiones = sum(len(valores) for valores in latencias.values())
+        duracion = resultados['duracion']
+        self.stdout.write(
+            f"Socios: {options['socios']}, iteraciones: {options['iteraciones']}, "
+            f"horarios disputados: {options['horarios']} en {options['lugares']} lugares"
+        )
+        self.stdout.write(
+            f"Peticiones: {peticiones} en {duracion:.2f} s ({peticiones / duracion:.0f} peticiones/s)"
+        )
+        self.stdout.write(
+            f"{'endpoint':>10} | {'peticiones':>10} | "
+            + ' | '.join(f"{f'p{p} (ms)':>9}" for p in PERCENTILES)
+            + f" | {'máx (ms)':>9}"
+        )
+        for endpoint in ENDPOINTS:
+            valores = latencias[endpoint]
+            self.stdout.write(
+                f"{endpoint:>10} | {len(valores):>10} | "
+                + ' | '.join(f"{percentil(valores, p) * 1000:>9.1f}" for p in PERCENTILES)
+                + f" | {(valores[-1] if valores else 0) * 1000:>9.1f}"
+            )
+        self.stdout.write(
+            f"Reservas aceptadas: {resultados['aceptadas']}, rechazadas por conflicto: "
+            f"{resultados['rechazadas']}, horarios vistos ocupados: {resultados['ocupadas']}, "
+            f"errores de bloqueo: {resultados['errores']}"
+        )
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0008_alter_reserva_proposito'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['lugar', 'fecha_fin', 'fecha_inicio', 'estado'], name='reserva_lugar_rango_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['usuario', '-fecha_inicio'], name='reserva_usuario_inicio_idx'),
+        ),
+    ]
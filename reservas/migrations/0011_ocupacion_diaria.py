@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0010_serie_reserva'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('franjas', models.BinaryField(max_length=12)),
+                ('lugar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupaciones', to='reservas.lugar')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ocupaciondiaria',
+            constraint=models.UniqueConstraint(fields=('lugar', 'fecha'), name='ocupacion_lugar_fecha_unica'),
+        ),
+    ]
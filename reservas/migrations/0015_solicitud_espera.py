@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservas', '0014_reserva_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolicitudEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio', models.DateTimeField()),
+                ('fecha_fin', models.DateTimeField()),
+                ('proposito', models.CharField(blank=True, max_length=255, verbose_name='Propósito')),
+                ('estado', models.CharField(choices=[('esperando', 'En espera'), ('promovida', 'Promovida a reserva'), ('cancelada', 'Cancelada')], default='esperando', max_length=20)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('lugar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='solicitudes_espera', to='reservas.lugar')),
+                ('reserva', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='solicitud_espera', to='reservas.reserva')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='solicitudes_espera', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('fecha_creacion', 'pk'),
+                'indexes': [models.Index(fields=['lugar', 'estado', 'fecha_fin', 'fecha_inicio'], name='espera_lugar_rango_idx')],
+            },
+        ),
+    ]
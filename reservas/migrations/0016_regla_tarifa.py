@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:32
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0015_solicitud_espera'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReglaTarifa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('clase', models.CharField(choices=[('franja', 'Franja horaria'), ('socio', 'Descuento para socios'), ('duracion', 'Reserva larga')], max_length=10)),
+                ('porcentaje', models.DecimalField(decimal_places=2, help_text='Positivo para un recargo, negativo para un descuento.', max_digits=5, validators=[django.core.validators.MinValueValidator(-100)])),
+                ('dias_semana', models.CharField(blank=True, help_text="Franja: días en que se aplica (0 lunes ... 6 domingo), p. ej. '56' para el fin de semana. Vacío: todos.", max_length=7)),
+                ('hora_desde', models.TimeField(blank=True, help_text='Franja: vacío equivale a las 00:00.', null=True)),
+                ('hora_hasta', models.TimeField(blank=True, help_text='Franja: vacío equivale al final del día.', null=True)),
+                ('horas_minimas', models.DecimalField(blank=True, decimal_places=2, help_text='Reserva larga: duración mínima en horas.', max_digits=5, null=True)),
+                ('activo', models.BooleanField(default=True)),
+                ('tipo', models.ForeignKey(blank=True, help_text='Vacío: se aplica a todos los tipos de lugar.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_tarifa', to='reservas.tipolugar')),
+            ],
+            options={
+                'verbose_name': 'regla de tarifa',
+                'verbose_name_plural': 'reglas de tarifa',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:58
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0016_regla_tarifa'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reserva',
+            name='reserva_lugar_inicio_idx',
+        ),
+    ]
@@ -0,0 +1,66 @@
+import math
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+# Copia del formato de `OcupacionDiaria` en esta migración: un bit por franja
+# de 15 minutos del día local, 96 bits guardados en 12 bytes little-endian.
+SEGUNDOS_POR_FRANJA = 15 * 60
+FRANJAS_POR_DIA = 96
+BYTES_POR_DIA = FRANJAS_POR_DIA // 8
+ESTADOS_LIBERADOS = ('cancelada', 'rechazada', 'expirada')
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _mascaras_por_dia(inicio, fin):
+    mascaras = {}
+    dia = timezone.localtime(inicio).date()
+    while _inicio_del_dia(dia) < fin:
+        comienzo = _inicio_del_dia(dia)
+        desde = max(inicio, comienzo)
+        hasta = min(fin, _inicio_del_dia(dia + timedelta(days=1)))
+        if hasta > desde:
+            primera = int((desde - comienzo).total_seconds() // SEGUNDOS_POR_FRANJA)
+            ultima = min(math.ceil((hasta - comienzo).total_seconds() / SEGUNDOS_POR_FRANJA), FRANJAS_POR_DIA)
+            mascaras[dia] = ((1 << (ultima - primera)) - 1) << primera
+        dia += timedelta(days=1)
+    return mascaras
+
+
+def rellenar(apps, schema_editor):
+    # OcupacionDiaria solo se mantiene con los cambios posteriores a su
+    # creación: aquí se vuelcan las reservas activas que ya existían.
+    Reserva = apps.get_model('reservas', 'Reserva')
+    OcupacionDiaria = apps.get_model('reservas', 'OcupacionDiaria')
+
+    mascaras = defaultdict(lambda: defaultdict(int))
+    filas = Reserva.objects.exclude(estado__in=ESTADOS_LIBERADOS).values_list('lugar_id', 'fecha_inicio', 'fecha_fin')
+    for lugar_id, inicio, fin in filas.iterator():
+        for dia, mascara in _mascaras_por_dia(inicio, fin).items():
+            mascaras[lugar_id][dia] |= mascara
+
+    OcupacionDiaria.objects.all().delete()
+    OcupacionDiaria.objects.bulk_create(
+        [
+            OcupacionDiaria(lugar_id=lugar_id, fecha=dia, franjas=mascara.to_bytes(BYTES_POR_DIA, 'little'))
+            for lugar_id, dias in mascaras.items()
+            for dia, mascara in dias.items()
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0017_quitar_indice_lugar_inicio'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
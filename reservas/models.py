@@ -2,6 +2,8 @@
 
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.urls import reverse
 
 class TipoLugar(models.Model):
@@ -13,6 +15,71 @@ class TipoLugar(models.Model):
     def __str__(self):
         return self.nombre
 
+class ReglaTarifa(models.Model):
+    """
+    Ajuste porcentual del precio por hora de un tipo de lugar (o de todos).
+    Las reglas se compilan en tablas por tipo de lugar en `reservas.tarifas`:
+
+    - franja: recargo o descuento en unas horas de ciertos días (horas pico,
+      fines de semana). Si varias franjas coinciden, sus porcentajes se suman.
+    - socio: descuento sobre el total para socios con la afiliación activa.
+    - duracion: descuento sobre el total desde cierto número de horas; si hay
+      varias, se aplica la de más horas que se cumpla.
+    """
+    CLASES = [
+        ('franja', 'Franja horaria'),
+        ('socio', 'Descuento para socios'),
+        ('duracion', 'Reserva larga'),
+    ]
+    # Las franjas se evalúan por cuartos de hora.
+    MINUTOS_FRANJA = 15
+
+    nombre = models.CharField(max_length=100)
+    clase = models.CharField(max_length=10, choices=CLASES)
+    tipo = models.ForeignKey(
+        TipoLugar, on_delete=models.CASCADE, null=True, blank=True, related_name='reglas_tarifa',
+        help_text="Vacío: se aplica a todos los tipos de lugar.",
+    )
+    porcentaje = models.DecimalField(
+        max_digits=5, decimal_places=2, validators=[MinValueValidator(-100)],
+        help_text="Positivo para un recargo, negativo para un descuento.",
+    )
+    dias_semana = models.CharField(
+        max_length=7, blank=True,
+        help_text="Franja: días en que se aplica (0 lunes ... 6 domingo), p. ej. '56' para el fin de semana. Vacío: todos.",
+    )
+    hora_desde = models.TimeField(null=True, blank=True, help_text="Franja: vacío equivale a las 00:00.")
+    hora_hasta = models.TimeField(null=True, blank=True, help_text="Franja: vacío equivale al final del día.")
+    horas_minimas = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True, blank=True,
+        help_text="Reserva larga: duración mínima en horas.",
+    )
+    activo = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "regla de tarifa"
+        verbose_name_plural = "reglas de tarifa"
+
+    def __str__(self):
+        return f"{self.nombre} ({self.porcentaje:+}%)"
+
+    def clean(self):
+        errores = {}
+        if self.clase == 'franja':
+            if any(dia not in '0123456' for dia in self.dias_semana) or len(set(self.dias_semana)) != len(self.dias_semana):
+                errores['dias_semana'] = "Indique cada día una sola vez con un dígito del 0 (lunes) al 6 (domingo)."
+            for campo in ('hora_desde', 'hora_hasta'):
+                hora = getattr(self, campo)
+                if hora and (hora.minute % self.MINUTOS_FRANJA or hora.second or hora.microsecond):
+                    errores[campo] = f"La hora debe ser múltiplo de {self.MINUTOS_FRANJA} minutos."
+            if self.hora_desde and self.hora_hasta and self.hora_hasta <= self.hora_desde:
+                errores['hora_hasta'] = "La hora final debe ser posterior a la inicial."
+        elif self.clase == 'duracion' and not self.horas_minimas:
+            errores['horas_minimas'] = "Indique desde cuántas horas se aplica el descuento."
+        if errores:
+            raise ValidationError(errores)
+
+
 class Lugar(models.Model):
     nombre = models.CharField(max_length=200)
     tipo = models.ForeignKey(TipoLugar, on_delete=models.PROTECT, related_name='lugares')
@@ -24,13 +91,35 @@ class Lugar(models.Model):
     def __str__(self):
         return self.nombre
 
+class SerieReserva(models.Model):
+    """Regla de repetición de una reserva (por ejemplo, todos los martes hasta fin de mes)."""
+    FRECUENCIAS = [
+        ('diaria', 'Diaria'),
+        ('semanal', 'Semanal'),
+        ('mensual', 'Mensual'),
+    ]
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    lugar = models.ForeignKey(Lugar, on_delete=models.CASCADE)
+    frecuencia = models.CharField(max_length=10, choices=FRECUENCIAS)
+    intervalo = models.PositiveSmallIntegerField(default=1, help_text="Cada cuántos días, semanas o meses se repite.")
+    repetir_hasta = models.DateField()
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Serie {self.get_frecuencia_display().lower()} en {self.lugar.nombre} hasta {self.repetir_hasta}"
+
 class Reserva(models.Model):
     ESTADOS = [
         ('pendiente', 'Pendiente'),
         ('confirmada', 'Confirmada'),
         ('cancelada', 'Cancelada'),
+        ('rechazada', 'Rechazada'),
+        ('expirada', 'Expirada'),
     ]
-    
+    # Estados que no ocupan el lugar en las comprobaciones de disponibilidad.
+    ESTADOS_LIBERADOS = ('cancelada', 'rechazada', 'expirada')
+
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     lugar = models.ForeignKey(Lugar, on_delete=models.CASCADE)
     fecha_inicio = models.DateTimeField()
@@ -39,6 +128,49 @@ class Reserva(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
     notas_adicionales = models.TextField(blank=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Los UPDATE masivos deben fijarla a mano (`update()` no aplica auto_now).
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    serie = models.ForeignKey(
+        SerieReserva, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservas'
+    )
+
+    class Meta:
+        indexes = [
+            # Comprobaciones de solapamiento (fecha_inicio < X AND fecha_fin > Y).
+            # Se recorre por fecha_fin para que consultar el futuro solo lea las
+            # reservas que aún no terminan; 'estado' permite resolverla sin leer la tabla.
+            models.Index(
+                fields=['lugar', 'fecha_fin', 'fecha_inicio', 'estado'],
+                name='reserva_lugar_rango_idx',
+            ),
+            # "Mis reservas": filtro por usuario y orden por fecha de inicio descendente.
+            models.Index(fields=['usuario', '-fecha_inicio'], name='reserva_usuario_inicio_idx'),
+            # Listado del panel: paginación por (fecha_inicio, id), sin filtro o
+            # filtrando por estado. Filtrando por lugar se recorre
+            # reserva_inicio_id_idx: un índice (lugar, fecha_inicio) le quitaría
+            # a reserva_lugar_rango_idx las comprobaciones de solapamiento.
+            models.Index(fields=['fecha_inicio', 'id'], name='reserva_inicio_id_idx'),
+            models.Index(fields=['estado', 'fecha_inicio', 'id'], name='reserva_estado_inicio_idx'),
+            # ETag y Last-Modified de los calendarios .ics sin leer la tabla.
+            models.Index(fields=['lugar', 'fecha_actualizacion'], name='reserva_lugar_actualiz_idx'),
+            models.Index(fields=['usuario', 'fecha_actualizacion'], name='reserva_usuario_actualiz_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Se recuerdan los valores leídos para que las señales sepan qué cambió al guardar.
+        instancia._valores_originales = instancia.instantanea()
+        return instancia
+
+    def instantanea(self):
+        """Valores de los que dependen las estructuras derivadas (índice de disponibilidad, etc.)."""
+        datos = {
+            campo: self.__dict__.get(campo)
+            for campo in ('lugar_id', 'usuario_id', 'fecha_inicio', 'fecha_fin', 'estado')
+        }
+        datos['pk'] = self.pk
+        return datos
 
     def __str__(self):
         return f"Reserva de {self.usuario.get_full_name()} en {self.lugar.nombre}"
@@ -51,14 +183,84 @@ class Reserva(models.Model):
         duracion = self.fecha_fin - self.fecha_inicio
         return duracion.total_seconds() / 3600  # Convertir segundos a horas
 
+    @property
+    def duracion_segundos(self):
+        """Duración en segundos enteros, tal como la calculan los reportes en la base de datos."""
+        if not self.fecha_inicio or not self.fecha_fin:
+            return 0
+        return int(self.fecha_fin.timestamp()) - int(self.fecha_inicio.timestamp())
+
     @property
     def costo_total(self):
-        """Calcula el costo total de la reserva basado en la duración y el precio por hora del lugar."""
+        """Costo de la reserva según la tarifa de su tipo de lugar (ver `reservas.tarifas`)."""
         if not hasattr(self, 'lugar') or not self.lugar or not hasattr(self.lugar, 'tipo') or not self.lugar.tipo:
             return 0
-        from decimal import Decimal
-        duration_decimal = Decimal(str(self.duracion_horas))  # Convert float to Decimal safely
-        return (duration_decimal * self.lugar.tipo.precio_por_hora).quantize(Decimal('0.00'))
+        if not self.fecha_inicio or not self.fecha_fin:
+            return 0
+        from .tarifas import cotizar, descuenta_socios
+
+        tipo_id = self.lugar.tipo_id
+        # El perfil de socio solo se consulta si alguna regla depende de él.
+        socio = descuenta_socios(tipo_id) and self.usuario.es_socio
+        return cotizar(tipo_id, self.fecha_inicio, self.fecha_fin, socio=socio)
 
     def get_absolute_url(self):
-        return reverse('reservas:reserva_detail', kwargs={'pk': self.pk})
\ No newline at end of file
+        return reverse('reservas:reserva_detail', kwargs={'pk': self.pk})
+
+
+class OcupacionDiaria(models.Model):
+    """
+    Ocupación precalculada de un lugar en un día (hora local): un bit por cada
+    franja de 15 minutos, de modo que un mes entero se lee sin recorrer Reserva.
+    Los días sin reservas activas no tienen fila.
+    """
+    MINUTOS_POR_FRANJA = 15
+    FRANJAS_POR_DIA = 24 * 60 // MINUTOS_POR_FRANJA
+
+    lugar = models.ForeignKey(Lugar, on_delete=models.CASCADE, related_name='ocupaciones')
+    fecha = models.DateField()
+    franjas = models.BinaryField(max_length=FRANJAS_POR_DIA // 8)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lugar', 'fecha'], name='ocupacion_lugar_fecha_unica'),
+        ]
+
+    def __str__(self):
+        return f"Ocupación de {self.lugar} el {self.fecha}"
+
+
+class SolicitudEspera(models.Model):
+    """
+    Petición de un socio para un horario ocupado. Cuando ese horario se libera
+    (cancelación, rechazo, expiración...), las solicitudes que ahora caben se
+    convierten en reservas pendientes por orden de llegada (ver `lista_espera.py`).
+    """
+    ESTADOS = [
+        ('esperando', 'En espera'),
+        ('promovida', 'Promovida a reserva'),
+        ('cancelada', 'Cancelada'),
+    ]
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='solicitudes_espera')
+    lugar = models.ForeignKey(Lugar, on_delete=models.CASCADE, related_name='solicitudes_espera')
+    fecha_inicio = models.DateTimeField()
+    fecha_fin = models.DateTimeField()
+    proposito = models.CharField('Propósito', max_length=255, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='esperando')
+    reserva = models.OneToOneField(
+        Reserva, on_delete=models.SET_NULL, null=True, blank=True, related_name='solicitud_espera'
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('fecha_creacion', 'pk')
+        indexes = [
+            # Solicitudes en espera que se solapan con el horario liberado de un lugar.
+            models.Index(
+                fields=['lugar', 'estado', 'fecha_fin', 'fecha_inicio'], name='espera_lugar_rango_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Espera de {self.usuario} en {self.lugar.nombre} ({self.fecha_inicio:%d/%m/%Y %H:%M})"
@@ -0,0 +1,184 @@
+# reservas/ocupacion.py
+"""
+Mantenimiento y lectura de la tabla `OcupacionDiaria`.
+
+Cada fila guarda, para un lugar y un día en hora local, una máscara de bits en
+la que el bit `i` (empezando por el menos significativo) indica que la franja
+de 15 minutos número `i` está ocupada, aunque sea parcialmente.
+
+Las altas se aplican con un OR sobre la máscara existente. Las bajas y los
+cambios de horario no se pueden deshacer con bits (otra reserva podría ocupar
+la misma franja), así que los días afectados se recalculan desde `Reserva`.
+Ambas operaciones toman el bloqueo del lugar para no pisarse entre procesos.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OcupacionDiaria, Reserva
+
+SEGUNDOS_POR_FRANJA = OcupacionDiaria.MINUTOS_POR_FRANJA * 60
+BYTES_POR_DIA = OcupacionDiaria.FRANJAS_POR_DIA // 8
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def mascaras_por_dia(inicio, fin):
+    """Devuelve {fecha_local: máscara} con las franjas que cubre [inicio, fin)."""
+    mascaras = {}
+    dia = timezone.localtime(inicio).date()
+    while True:
+        comienzo = _inicio_del_dia(dia)
+        siguiente = _inicio_del_dia(dia + timedelta(days=1))
+        if comienzo >= fin:
+            break
+        desde = max(inicio, comienzo)
+        hasta = min(fin, siguiente)
+        if hasta > desde:
+            primera = int((desde - comienzo).total_seconds() // SEGUNDOS_POR_FRANJA)
+            ultima = min(
+                math.ceil((hasta - comienzo).total_seconds() / SEGUNDOS_POR_FRANJA),
+                OcupacionDiaria.FRANJAS_POR_DIA,
+            )
+            mascaras[dia] = ((1 << (ultima - primera)) - 1) << primera
+        dia += timedelta(days=1)
+    return mascaras
+
+
+def _a_bytes(mascara):
+    return mascara.to_bytes(BYTES_POR_DIA, 'little')
+
+
+def _desde_bytes(datos):
+    return int.from_bytes(bytes(datos), 'little')
+
+
+def _guardar_mascaras(lugar_id, mascaras):
+    """Escribe las máscaras indicadas; las que quedan a cero se eliminan."""
+    vacias = [dia for dia, mascara in mascaras.items() if not mascara]
+    if vacias:
+        OcupacionDiaria.objects.filter(lugar_id=lugar_id, fecha__in=vacias).delete()
+    existentes = {
+        fila.fecha: fila
+        for fila in OcupacionDiaria.objects.filter(lugar_id=lugar_id, fecha__in=list(mascaras))
+    }
+    nuevas, modificadas = [], []
+    for dia, mascara in mascaras.items():
+        if not mascara:
+            continue
+        fila = existentes.get(dia)
+        if fila is None:
+            nuevas.append(OcupacionDiaria(lugar_id=lugar_id, fecha=dia, franjas=_a_bytes(mascara)))
+        elif _desde_bytes(fila.franjas) != mascara:
+            fila.franjas = _a_bytes(mascara)
+            modificadas.append(fila)
+    OcupacionDiaria.objects.bulk_create(nuevas)
+    OcupacionDiaria.objects.bulk_update(modificadas, ['franjas'])
+
+
+def calcular_mascaras(lugar_id, dias):
+    """Calcula desde `Reserva` las máscaras de los días indicados con una sola consulta."""
+    mascaras = dict.fromkeys(dias, 0)
+    if not mascaras:
+        return mascaras
+    desde = _inicio_del_dia(min(mascaras))
+    hasta = _inicio_del_dia(max(mascaras) + timedelta(days=1))
+    intervalos = (
+        Reserva.objects.filter(lugar_id=lugar_id, fecha_inicio__lt=hasta, fecha_fin__gt=desde)
+        .exclude(estado__in=Reserva.ESTADOS_LIBERADOS)
+        .values_list('fecha_inicio', 'fecha_fin')
+    )
+    for inicio, fin in intervalos:
+        for dia, mascara in mascaras_por_dia(inicio, fin).items():
+            if dia in mascaras:
+                mascaras[dia] |= mascara
+    return mascaras
+
+
+def aplicar_cambios(cambios):
+    """
+    Actualiza la ocupación a partir de los cambios de `reservas_modificadas`:
+    suma con OR las franjas de las reservas activas nuevas y recalcula los
+    días de las que dejaron de ocuparlos.
+    """
+    from .services import bloquear_lugar
+
+    sumar = defaultdict(lambda: defaultdict(int))
+    recalcular = defaultdict(set)
+    for anterior, actual in cambios:
+        activa_antes = anterior is not None and anterior['estado'] not in Reserva.ESTADOS_LIBERADOS
+        activa_ahora = actual is not None and actual['estado'] not in Reserva.ESTADOS_LIBERADOS
+        if activa_antes and (
+            not activa_ahora
+            or (anterior['lugar_id'], anterior['fecha_inicio'], anterior['fecha_fin'])
+            != (actual['lugar_id'], actual['fecha_inicio'], actual['fecha_fin'])
+        ):
+            recalcular[anterior['lugar_id']].update(
+                mascaras_por_dia(anterior['fecha_inicio'], anterior['fecha_fin'])
+            )
+        if activa_ahora:
+            for dia, mascara in mascaras_por_dia(actual['fecha_inicio'], actual['fecha_fin']).items():
+                sumar[actual['lugar_id']][dia] |= mascara
+
+    for lugar_id in set(sumar) | set(recalcular):
+        with transaction.atomic():
+            bloquear_lugar(lugar_id)
+            mascaras = calcular_mascaras(lugar_id, recalcular[lugar_id])
+            pendientes = {
+                dia: mascara for dia, mascara in sumar[lugar_id].items() if dia not in mascaras
+            }
+            if pendientes:
+                actuales = OcupacionDiaria.objects.filter(
+                    lugar_id=lugar_id, fecha__in=list(pendientes)
+                ).values_list('fecha', 'franjas')
+                for dia, franjas in actuales:
+                    pendientes[dia] |= _desde_bytes(franjas)
+                mascaras.update(pendientes)
+            _guardar_mascaras(lugar_id, mascaras)
+
+
+def reconstruir(lugar_ids=None):
+    """Recalcula toda la ocupación (o la de los lugares indicados) desde `Reserva`."""
+    consulta = Reserva.objects.exclude(estado__in=Reserva.ESTADOS_LIBERADOS)
+    if lugar_ids is not None:
+        consulta = consulta.filter(lugar_id__in=lugar_ids)
+    mascaras = defaultdict(lambda: defaultdict(int))
+    for lugar_id, inicio, fin in consulta.values_list('lugar_id', 'fecha_inicio', 'fecha_fin').iterator():
+        for dia, mascara in mascaras_por_dia(inicio, fin).items():
+            mascaras[lugar_id][dia] |= mascara
+
+    with transaction.atomic():
+        anteriores = OcupacionDiaria.objects.all()
+        if lugar_ids is not None:
+            anteriores = anteriores.filter(lugar_id__in=lugar_ids)
+        anteriores.delete()
+        OcupacionDiaria.objects.bulk_create(
+            [
+                OcupacionDiaria(lugar_id=lugar_id, fecha=dia, franjas=_a_bytes(mascara))
+                for lugar_id, dias in mascaras.items()
+                for dia, mascara in dias.items()
+            ],
+            batch_size=5000,
+        )
+    return sum(len(dias) for dias in mascaras.values())
+
+
+def calendario_mensual(lugar_ids, anio, mes):
+    """
+    Devuelve {lugar_id: {fecha_iso: máscara_hex}} para el mes indicado leyendo
+    solo `OcupacionDiaria`. Los días sin ocupación no aparecen.
+    """
+    primero = datetime(anio, mes, 1).date()
+    siguiente = (primero + timedelta(days=32)).replace(day=1)
+    calendario = {lugar_id: {} for lugar_id in lugar_ids}
+    filas = OcupacionDiaria.objects.filter(
+        lugar_id__in=lugar_ids, fecha__gte=primero, fecha__lt=siguiente
+    ).values_list('lugar_id', 'fecha', 'franjas')
+    for lugar_id, fecha, franjas in filas:
+        calendario[lugar_id][fecha.isoformat()] = format(_desde_bytes(franjas), f'0{BYTES_POR_DIA * 2}x')
+    return calendario
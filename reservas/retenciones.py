@@ -0,0 +1,166 @@
+# reservas/retenciones.py
+"""
+Retenciones temporales de horarios mientras un socio completa el formulario
+de reserva.
+
+Se guardan solo en la caché de Django, con caducidad: la caché en memoria
+del proceso para un único servidor o una caché compartida (archivos, Redis,
+Memcached...) cuando hay varios procesos. Por cada lugar hay una clave con sus
+retenciones vigentes y por cada usuario una clave con su retención actual: un
+socio solo retiene un horario a la vez.
+
+Las claves de un lugar se leen y reescriben con el lugar bloqueado en la base
+de datos (`services.bloquear_lugar`), el mismo bloqueo con el que
+`guardar_reserva` comprueba las retenciones ajenas. No se usa `cache.add`
+como bloqueo porque no es atómico en todos los backends (p. ej.
+FileBasedCache comprueba y escribe en dos pasos).
+"""
+import secrets
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, transaction
+
+DURACION_RETENCION = getattr(settings, 'RESERVAS_RETENCION_SEGUNDOS', 10 * 60)
+PREFIJO = 'reservas:retenciones'
+
+
+class RetencionNoDisponible(Exception):
+    """No se pudo tomar el bloqueo de retenciones del lugar a tiempo."""
+
+
+def _clave_lugar(lugar_id):
+    return f'{PREFIJO}:lugar:{lugar_id}'
+
+
+def _clave_usuario(usuario_id):
+    return f'{PREFIJO}:usuario:{usuario_id}'
+
+
+@contextmanager
+def _bloqueo(lugar_id):
+    """
+    Bloquea el lugar en una transacción de la base de datos mientras dura el
+    bloque. Lanza `RetencionNoDisponible` si el bloqueo no llega a tiempo.
+    """
+    from .services import bloquear_lugar
+
+    with transaction.atomic():
+        try:
+            bloquear_lugar(lugar_id)
+        except OperationalError as error:
+            raise RetencionNoDisponible(lugar_id) from error
+        yield
+
+
+def _vigentes(retenciones, ahora):
+    return {token: datos for token, datos in (retenciones or {}).items() if datos['expira'] > ahora}
+
+
+def _guardar_lugar(lugar_id, retenciones, ahora):
+    if retenciones:
+        caducidad = max(datos['expira'] for datos in retenciones.values()) - ahora
+        cache.set(_clave_lugar(lugar_id), retenciones, timeout=int(caducidad) + 1)
+    else:
+        cache.delete(_clave_lugar(lugar_id))
+
+
+def _a_fecha(segundos):
+    return datetime.fromtimestamp(segundos, tz=dt_timezone.utc)
+
+
+def retenciones_del_lugar(lugar_id, excluir_usuario=None):
+    """Lista de (inicio, fin) retenidos en el lugar por usuarios distintos de `excluir_usuario`."""
+    return retenciones_de_lugares([lugar_id], excluir_usuario)[lugar_id]
+
+
+def retenciones_de_lugares(lugar_ids, excluir_usuario=None):
+    """Como `retenciones_del_lugar` para varios lugares con una sola lectura de la caché."""
+    ahora = time.time()
+    encontradas = cache.get_many([_clave_lugar(lugar_id) for lugar_id in lugar_ids])
+    resultado = {}
+    for lugar_id in lugar_ids:
+        vigentes = _vigentes(encontradas.get(_clave_lugar(lugar_id)), ahora)
+        resultado[lugar_id] = sorted(
+            (_a_fecha(datos['inicio']), _a_fecha(datos['fin']))
+            for datos in vigentes.values()
+            if datos['usuario_id'] != excluir_usuario
+        )
+    return resultado
+
+
+def hay_retencion_ajena(lugar_id, inicio, fin, usuario_id):
+    """Indica si otro usuario retiene un horario que se solapa con [inicio, fin)."""
+    return any(
+        ret_inicio < fin and ret_fin > inicio
+        for ret_inicio, ret_fin in retenciones_del_lugar(lugar_id, excluir_usuario=usuario_id)
+    )
+
+
+def retener(usuario_id, lugar_id, inicio, fin, libre):
+    """
+    Retiene [inicio, fin) en el lugar para el usuario y libera su retención
+    anterior. `libre(lugar_id, inicio, fin)` se evalúa con el bloqueo tomado y
+    debe indicar si el horario está libre de reservas. Devuelve
+    (token, expira) o None si el horario no está disponible.
+    """
+    liberar_del_usuario(usuario_id)
+    with _bloqueo(lugar_id):
+        ahora = time.time()
+        retenciones = _vigentes(cache.get(_clave_lugar(lugar_id)), ahora)
+        inicio_s, fin_s = inicio.timestamp(), fin.timestamp()
+        ocupado = any(
+            datos['inicio'] < fin_s and datos['fin'] > inicio_s
+            for datos in retenciones.values()
+            if datos['usuario_id'] != usuario_id
+        )
+        if ocupado or not libre(lugar_id, inicio, fin):
+            return None
+        token = f'{lugar_id}-{secrets.token_urlsafe(16)}'
+        expira = ahora + DURACION_RETENCION
+        retenciones[token] = {'usuario_id': usuario_id, 'inicio': inicio_s, 'fin': fin_s, 'expira': expira}
+        _guardar_lugar(lugar_id, retenciones, ahora)
+        cache.set(_clave_usuario(usuario_id), token, timeout=DURACION_RETENCION)
+    return token, _a_fecha(expira)
+
+
+def liberar(token, usuario_id):
+    """Libera una retención del usuario. Devuelve False si no existía."""
+    lugar_id, _, _ = token.partition('-')
+    if not lugar_id.isdigit():
+        return False
+    with _bloqueo(int(lugar_id)):
+        ahora = time.time()
+        retenciones = _vigentes(cache.get(_clave_lugar(lugar_id)), ahora)
+        datos = retenciones.get(token)
+        if datos is None or datos['usuario_id'] != usuario_id:
+            return False
+        del retenciones[token]
+        _guardar_lugar(lugar_id, retenciones, ahora)
+    cache.delete(_clave_usuario(usuario_id))
+    return True
+
+
+def liberar_del_usuario(usuario_id):
+    """Libera la retención vigente del usuario, si tiene alguna."""
+    token = cache.get(_clave_usuario(usuario_id))
+    if token:
+        liberar(token, usuario_id)
+
+
+def liberar_horario(usuario_id, lugar_id, inicio, fin):
+    """
+    Libera la retención del usuario si es del lugar y se solapa con
+    [inicio, fin), es decir, si la reserva que acaba de crear la ocupa.
+    Las retenciones de otros horarios se conservan.
+    """
+    token = cache.get(_clave_usuario(usuario_id))
+    if not token or token.partition('-')[0] != str(lugar_id):
+        return False
+    datos = cache.get(_clave_lugar(lugar_id), {}).get(token)
+    if datos is None or not (datos['inicio'] < fin.timestamp() and datos['fin'] > inicio.timestamp()):
+        return False
+    return liberar(token, usuario_id)
@@ -0,0 +1,320 @@
+# reservas/services.py
+"""
+Operaciones de escritura sobre reservas que deben ser seguras ante
+peticiones simultáneas.
+"""
+import calendar
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from . import retenciones
+from .disponibilidad import fusionar_intervalos, indice_disponibilidad, matriz_disponibilidad_bd
+from .models import Lugar, Reserva
+from .signals import notificar_cambios
+
+MENSAJE_CONFLICTO = "El lugar ya está reservado en ese horario. Por favor, elija otro."
+MENSAJE_RETENIDO = (
+    "Otro socio está completando una reserva en ese horario. Por favor, elija otro "
+    "o inténtelo de nuevo en unos minutos."
+)
+
+
+# Campos de `Reserva.instantanea()` para leerlos con `values()` en operaciones masivas.
+CAMPOS_INSTANTANEA = ('pk', 'lugar_id', 'usuario_id', 'fecha_inicio', 'fecha_fin', 'estado')
+
+
+class ConflictoReserva(Exception):
+    """La reserva se solapa con otra reserva activa del mismo lugar."""
+
+
+def consulta_solapamiento(lugar_id, inicio, fin, excluir_pk=None):
+    """Reservas activas del lugar que chocan con [inicio, fin); la resuelve `reserva_lugar_rango_idx`."""
+    consulta = Reserva.objects.filter(
+        lugar_id=lugar_id, fecha_inicio__lt=fin, fecha_fin__gt=inicio,
+    ).exclude(estado__in=Reserva.ESTADOS_LIBERADOS)
+    if excluir_pk is not None:
+        consulta = consulta.exclude(pk=excluir_pk)
+    return consulta
+
+
+def hay_solapamiento(lugar_id, inicio, fin, excluir_pk=None):
+    """Consulta en la base de datos si [inicio, fin) choca con otra reserva activa."""
+    return consulta_solapamiento(lugar_id, inicio, fin, excluir_pk).exists()
+
+
+def bloquear_lugar(lugar_id):
+    """
+    Serializa las escrituras de reservas de un lugar dentro de la transacción
+    actual. En motores con SELECT ... FOR UPDATE se bloquea la fila del lugar;
+    en SQLite se hace una escritura sin efecto, que toma el bloqueo de
+    escritura de la base desde la primera sentencia de la transacción.
+    """
+    if connection.features.has_select_for_update:
+        list(Lugar.objects.select_for_update().filter(pk=lugar_id).values_list('pk'))
+    else:
+        Lugar.objects.filter(pk=lugar_id).update(activo=F('activo'))
+
+
+def guardar_reserva(reserva):
+    """
+    Guarda la reserva si no se solapa con otra: bloquea el lugar, vuelve a
+    comprobar el horario e inserta, todo en la misma transacción.
+    Lanza `ConflictoReserva` si el horario ya está ocupado o lo retiene otro
+    socio.
+    """
+    with transaction.atomic():
+        if reserva.estado not in Reserva.ESTADOS_LIBERADOS:
+            bloquear_lugar(reserva.lugar_id)
+            if hay_solapamiento(reserva.lugar_id, reserva.fecha_inicio, reserva.fecha_fin, reserva.pk):
+                raise ConflictoReserva(MENSAJE_CONFLICTO)
+            if retenciones.hay_retencion_ajena(
+                reserva.lugar_id, reserva.fecha_inicio, reserva.fecha_fin, reserva.usuario_id
+            ):
+                raise ConflictoReserva(MENSAJE_RETENIDO)
+        reserva.save()
+    return reserva
+
+
+def crear_retencion(usuario_id, lugar_id, inicio, fin):
+    """
+    Retiene [inicio, fin) para el usuario mientras completa el formulario.
+    Devuelve (token, expira) o None si el horario ya está reservado o retenido.
+    Lanza `KeyError` si el lugar no existe.
+
+    Como en `guardar_reserva`, el solapamiento se comprueba en la base de
+    datos con `bloquear_lugar` tomado (lo toma `retener`): el índice en
+    memoria puede no ver aún una reserva recién confirmada por otro proceso.
+    """
+    if not indice_disponibilidad.existe_lugar(lugar_id):
+        raise KeyError(lugar_id)
+    return retenciones.retener(
+        usuario_id, lugar_id, inicio, fin,
+        libre=lambda lugar, desde, hasta: not hay_solapamiento(lugar, desde, hasta),
+    )
+
+
+def expirar_pendientes(creadas_antes, ahora=None, lote=1000):
+    """
+    Marca como 'expirada' las reservas pendientes creadas antes de
+    `creadas_antes` o cuyo inicio ya pasó. Procesa `lote` filas por
+    transacción con un único UPDATE cada vez y devuelve cuántas expiró.
+    """
+    ahora = ahora or timezone.now()
+    candidatas = Reserva.objects.filter(estado='pendiente').filter(
+        Q(fecha_creacion__lt=creadas_antes) | Q(fecha_inicio__lte=ahora)
+    )
+    total = 0
+    while True:
+        with transaction.atomic():
+            if not connection.features.has_select_for_update:
+                # SQLite: se toma el bloqueo de escritura antes de leer, como en
+                # `bloquear_lugar`, con un UPDATE que no toca ninguna fila. Si la
+                # transacción empieza leyendo, el UPDATE posterior no espera al
+                # bloqueo y falla con "database is locked".
+                Reserva.objects.filter(pk=0).update(estado=F('estado'))
+            filas = list(candidatas.select_for_update().order_by('pk').values(*CAMPOS_INSTANTANEA)[:lote])
+            if not filas:
+                return total
+            pks = [fila['pk'] for fila in filas]
+            expiradas = Reserva.objects.filter(pk__in=pks, estado='pendiente').update(
+                estado='expirada', fecha_actualizacion=timezone.now()
+            )
+            total += expiradas
+            if expiradas == len(filas):
+                actuales = {fila['pk']: {**fila, 'estado': 'expirada'} for fila in filas}
+            else:
+                # Alguna cambió entre la lectura y el UPDATE: se notifica lo que quedó en la base.
+                actuales = {fila['pk']: fila for fila in Reserva.objects.filter(pk__in=pks).values(*CAMPOS_INSTANTANEA)}
+            notificar_cambios([(fila, actuales.get(fila['pk'])) for fila in filas])
+
+
+# ==============================================================================
+# CAMBIOS DE ESTADO MASIVOS
+# ==============================================================================
+RESULTADO_HECHO = 'hecho'
+RESULTADO_CONFLICTO = 'conflicto'
+RESULTADO_NO_PENDIENTE = 'no_pendiente'
+RESULTADO_NO_ENCONTRADA = 'no_encontrada'
+
+
+def _solapa(intervalos, inicio, fin):
+    """Indica si [inicio, fin) choca con `intervalos`, disjuntos y ordenados por inicio."""
+    posicion = bisect_left(intervalos, (fin,))
+    return posicion > 0 and intervalos[posicion - 1][1] > inicio
+
+
+def _confirmadas_por_lugar(filas):
+    """Intervalos fusionados de las reservas confirmadas que rodean a `filas`, por lugar."""
+    consulta = Reserva.objects.filter(
+        lugar_id__in={fila['lugar_id'] for fila in filas},
+        estado='confirmada',
+        fecha_inicio__lt=max(fila['fecha_fin'] for fila in filas),
+        fecha_fin__gt=min(fila['fecha_inicio'] for fila in filas),
+    ).order_by('lugar_id', 'fecha_inicio').values_list('lugar_id', 'fecha_inicio', 'fecha_fin')
+    intervalos = defaultdict(list)
+    for lugar_id, inicio, fin in consulta:
+        intervalos[lugar_id].append((inicio, fin))
+    return defaultdict(list, {lugar_id: fusionar_intervalos(lista) for lugar_id, lista in intervalos.items()})
+
+
+def cambiar_estado_pendientes(pks, estado):
+    """
+    Pasa a `estado` ('confirmada' o 'rechazada') las reservas pendientes de
+    `pks` con un único UPDATE.
+
+    Al confirmar se bloquean los lugares afectados y se descartan las reservas
+    que se solapan con una confirmada o con otra de la misma selección (gana
+    la que se solicitó primero); el UPDATE vuelve a excluir los solapamientos
+    por si acaso. Devuelve ({pk: resultado}, {pk: fila}), donde cada fila
+    trae los campos de la instantánea y `lugar__nombre`.
+    """
+    pks = list(dict.fromkeys(pks))
+    resultados = dict.fromkeys(pks, RESULTADO_NO_ENCONTRADA)
+    with transaction.atomic():
+        if estado == 'confirmada':
+            lugar_ids = Reserva.objects.filter(pk__in=pks).values_list('lugar_id', flat=True).distinct()
+            for lugar_id in sorted(lugar_ids):
+                bloquear_lugar(lugar_id)
+        filas = list(
+            Reserva.objects.select_for_update(of=('self',))
+            .filter(pk__in=pks)
+            .order_by('fecha_creacion', 'pk')
+            .values(*CAMPOS_INSTANTANEA, 'lugar__nombre')
+        )
+        pendientes = []
+        for fila in filas:
+            if fila['estado'] == 'pendiente':
+                pendientes.append(fila)
+            else:
+                resultados[fila['pk']] = RESULTADO_NO_PENDIENTE
+
+        aceptadas = pendientes
+        if estado == 'confirmada' and pendientes:
+            ocupados = _confirmadas_por_lugar(pendientes)
+            aceptadas = []
+            for fila in pendientes:
+                intervalos = ocupados[fila['lugar_id']]
+                if _solapa(intervalos, fila['fecha_inicio'], fila['fecha_fin']):
+                    resultados[fila['pk']] = RESULTADO_CONFLICTO
+                else:
+                    insort(intervalos, (fila['fecha_inicio'], fila['fecha_fin']))
+                    aceptadas.append(fila)
+
+        if aceptadas:
+            actualizar = Reserva.objects.filter(pk__in=[fila['pk'] for fila in aceptadas], estado='pendiente')
+            if estado == 'confirmada':
+                actualizar = actualizar.exclude(Exists(
+                    Reserva.objects.filter(
+                        lugar_id=OuterRef('lugar_id'),
+                        estado='confirmada',
+                        fecha_inicio__lt=OuterRef('fecha_fin'),
+                        fecha_fin__gt=OuterRef('fecha_inicio'),
+                    )
+                ))
+            if actualizar.update(estado=estado, fecha_actualizacion=timezone.now()) < len(aceptadas):
+                cambiadas = set(
+                    Reserva.objects.filter(pk__in=[fila['pk'] for fila in aceptadas], estado=estado)
+                    .values_list('pk', flat=True)
+                )
+                for fila in aceptadas:
+                    if fila['pk'] not in cambiadas:
+                        resultados[fila['pk']] = RESULTADO_CONFLICTO
+                aceptadas = [fila for fila in aceptadas if fila['pk'] in cambiadas]
+
+        cambios = []
+        for fila in aceptadas:
+            resultados[fila['pk']] = RESULTADO_HECHO
+            anterior = {campo: fila[campo] for campo in CAMPOS_INSTANTANEA}
+            cambios.append((anterior, {**anterior, 'estado': estado}))
+        notificar_cambios(cambios)
+    return resultados, {fila['pk']: fila for fila in filas}
+
+
+# ==============================================================================
+# SERIES DE RESERVAS
+# ==============================================================================
+MAX_OCURRENCIAS_SERIE = 366
+
+
+def _sumar_meses(fecha, meses):
+    """Suma meses a una fecha; devuelve None si el día no existe en el mes destino."""
+    mes = fecha.month - 1 + meses
+    anio = fecha.year + mes // 12
+    mes = mes % 12 + 1
+    if fecha.day > calendar.monthrange(anio, mes)[1]:
+        return None
+    return fecha.replace(year=anio, month=mes)
+
+
+def expandir_ocurrencias(inicio, fin, frecuencia, repetir_hasta, intervalo=1):
+    """
+    Devuelve las ocurrencias (inicio, fin) de una serie a partir de la
+    primera. Las horas se conservan en hora local; en la frecuencia mensual se
+    omiten los meses que no tienen ese día (p. ej. el 31).
+    """
+    inicio_local = timezone.localtime(inicio)
+    duracion = fin - inicio
+    ocurrencias = []
+    paso = 0
+    while len(ocurrencias) < MAX_OCURRENCIAS_SERIE:
+        if frecuencia == 'diaria':
+            dia = inicio_local.date() + timedelta(days=paso * intervalo)
+        elif frecuencia == 'semanal':
+            dia = inicio_local.date() + timedelta(weeks=paso * intervalo)
+        else:
+            if _sumar_meses(inicio_local.date().replace(day=1), paso * intervalo) > repetir_hasta:
+                break
+            dia = _sumar_meses(inicio_local.date(), paso * intervalo)
+            if dia is None:
+                paso += 1
+                continue
+        if dia > repetir_hasta:
+            break
+        comienzo = timezone.make_aware(datetime.combine(dia, inicio_local.time().replace(tzinfo=None)))
+        ocurrencias.append((comienzo, comienzo + duracion))
+        paso += 1
+    return ocurrencias
+
+
+def crear_serie(serie, fecha_inicio, fecha_fin, proposito='', notas_adicionales=''):
+    """
+    Expande la serie, comprueba todas sus ocurrencias contra las reservas
+    existentes con una sola consulta por rango y crea las que están libres con
+    un único `bulk_create`. Devuelve una lista de (inicio, fin, reserva) en la
+    que `reserva` es None para las ocurrencias rechazadas por conflicto.
+    """
+    ocurrencias = expandir_ocurrencias(
+        fecha_inicio, fecha_fin, serie.frecuencia, serie.repetir_hasta, serie.intervalo
+    )
+    with transaction.atomic():
+        bloquear_lugar(serie.lugar_id)
+        libres = matriz_disponibilidad_bd(
+            [serie.lugar_id], ocurrencias, usuario_id=serie.usuario_id
+        )[serie.lugar_id]
+        serie.save()
+        nuevas = [
+            Reserva(
+                usuario_id=serie.usuario_id,
+                lugar_id=serie.lugar_id,
+                serie=serie,
+                fecha_inicio=inicio,
+                fecha_fin=fin,
+                proposito=proposito,
+                notas_adicionales=notas_adicionales,
+            )
+            for (inicio, fin), libre in zip(ocurrencias, libres)
+            if libre
+        ]
+        Reserva.objects.bulk_create(nuevas)
+        notificar_cambios([(None, reserva.instantanea()) for reserva in nuevas])
+
+    creadas = iter(nuevas)
+    return [
+        (inicio, fin, next(creadas) if libre else None)
+        for (inicio, fin), libre in zip(ocurrencias, libres)
+    ]
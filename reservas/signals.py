@@ -0,0 +1,107 @@
+# reservas/signals.py
+"""
+Receptores que mantienen sincronizadas las estructuras derivadas de `Reserva`.
+
+Todo cambio de reservas se publica con la señal `reservas_modificadas`, tanto
+los de `save()`/`delete()` como los masivos (`bulk_create`, `update()`), que
+deben notificarse con `notificar_cambios`. Cada cambio es un par
+(anterior, actual) de diccionarios devueltos por `Reserva.instantanea()`;
+`anterior` es None para las altas y `actual` es None para los borrados.
+
+La señal se envía en `transaction.on_commit` para que una transacción
+revertida nunca deje las estructuras con datos que no existen en la base.
+Se envía con `send_robust`: el cambio ya está confirmado, así que el fallo de
+un receptor se registra en el log y no impide que se ejecuten los demás ni
+convierte la petición en un error 500.
+"""
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import catalogo, ocupacion, tarifas
+from .disponibilidad import indice_disponibilidad
+from .models import Lugar, ReglaTarifa, Reserva, TipoLugar
+
+logger = logging.getLogger(__name__)
+
+reservas_modificadas = Signal()
+
+
+def _enviar_cambios(cambios):
+    for receptor, resultado in reservas_modificadas.send_robust(sender=Reserva, cambios=cambios):
+        if isinstance(resultado, Exception):
+            logger.error(
+                "Falló el receptor %r de reservas_modificadas (%d cambios)", receptor, len(cambios),
+                exc_info=(type(resultado), resultado, resultado.__traceback__),
+            )
+
+
+def notificar_cambios(cambios):
+    """Publica `reservas_modificadas` cuando se confirme la transacción actual."""
+    if cambios:
+        transaction.on_commit(partial(_enviar_cambios, cambios))
+
+
+@receiver(post_save, sender=Reserva)
+def reserva_guardada(sender, instance, created, **kwargs):
+    actual = instance.instantanea()
+    anterior = None if created else getattr(instance, '_valores_originales', None)
+    notificar_cambios([(anterior, actual)])
+    instance._valores_originales = actual
+
+
+@receiver(post_delete, sender=Reserva)
+def reserva_eliminada(sender, instance, **kwargs):
+    notificar_cambios([(instance.instantanea(), None)])
+
+
+@receiver(post_delete, sender=Lugar)
+def lugar_eliminado(sender, instance, **kwargs):
+    transaction.on_commit(partial(indice_disponibilidad.invalidar, instance.pk))
+
+
+@receiver(post_save, sender=Lugar)
+@receiver(post_delete, sender=Lugar)
+@receiver(post_save, sender=TipoLugar)
+@receiver(post_delete, sender=TipoLugar)
+def catalogo_modificado(sender, **kwargs):
+    transaction.on_commit(catalogo.invalidar)
+
+
+@receiver(post_save, sender=TipoLugar)
+@receiver(post_delete, sender=TipoLugar)
+@receiver(post_save, sender=ReglaTarifa)
+@receiver(post_delete, sender=ReglaTarifa)
+def tarifas_modificadas(sender, **kwargs):
+    transaction.on_commit(tarifas.invalidar)
+
+
+@receiver(reservas_modificadas)
+def actualizar_indice_disponibilidad(sender, cambios, **kwargs):
+    for anterior, actual in cambios:
+        if actual is None:
+            indice_disponibilidad.quitar(anterior['pk'], anterior['lugar_id'])
+        else:
+            indice_disponibilidad.registrar(
+                actual['pk'],
+                actual['lugar_id'],
+                actual['fecha_inicio'],
+                actual['fecha_fin'],
+                actual['estado'] not in Reserva.ESTADOS_LIBERADOS,
+                lugar_anterior=anterior['lugar_id'] if anterior else None,
+            )
+
+
+@receiver(reservas_modificadas)
+def actualizar_ocupacion_diaria(sender, cambios, **kwargs):
+    ocupacion.aplicar_cambios(cambios)
+
+
+@receiver(reservas_modificadas)
+def promover_lista_espera(sender, cambios, **kwargs):
+    from .lista_espera import promover_liberados
+
+    promover_liberados(cambios)
@@ -0,0 +1,203 @@
+# reservas/tarifas.py
+"""
+Motor de tarifas: convierte las `ReglaTarifa` activas en una tabla por tipo
+de lugar y cotiza ventanas de tiempo con resultados Decimal exactos.
+
+Para cada tipo se precalcula el ajuste de cada cuarto de hora de la semana
+(hora local, en centésimas de porcentaje) y su suma acumulada. Así el
+recargo de cualquier ventana, dure lo que dure, se obtiene con dos lecturas
+de la tabla. El precio base usa los segundos reales de la reserva; toda la
+cuenta se hace con enteros y se redondea una sola vez a centavos (mitad
+hacia arriba). Sin reglas, el resultado coincide con el que calcula
+`panel.reportes` en la base de datos.
+
+Las tablas se guardan en memoria por proceso y se reconstruyen cuando cambia
+un `TipoLugar` o una `ReglaTarifa` (ver `reservas/signals.py`).
+"""
+import threading
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .versiones import publicar_version, version_publicada
+
+CLAVE_VERSION = 'reservas:tarifas:version'
+
+SEGUNDOS_FRANJA = 15 * 60
+FRANJAS_POR_DIA = 24 * 3600 // SEGUNDOS_FRANJA
+FRANJAS_POR_SEMANA = 7 * FRANJAS_POR_DIA
+SEGUNDOS_SEMANA = 7 * 24 * 3600
+# El 1 de enero de 1970 fue jueves: se desplaza para que la semana empiece el lunes.
+DESPLAZAMIENTO_LUNES = 4 * 24 * 3600
+# Porcentajes en centésimas: 100 % = 10000.
+CIEN_POR_CIENTO = 10000
+
+
+def _centesimas(porcentaje):
+    return int(porcentaje * 100)
+
+
+def _franja(hora):
+    return (hora.hour * 3600 + hora.minute * 60) // SEGUNDOS_FRANJA
+
+
+class TarifaTipo:
+    """Tabla compilada de un tipo de lugar."""
+
+    __slots__ = ('precio_centavos', 'ajustes', 'acumulado', 'socio', 'largas')
+
+    def __init__(self, precio_por_hora, reglas):
+        self.precio_centavos = int(precio_por_hora * 100)
+        ajustes = [0] * FRANJAS_POR_SEMANA
+        self.socio = 0
+        largas = []
+        for regla in reglas:
+            porcentaje = _centesimas(regla.porcentaje)
+            if regla.clase == 'franja':
+                dias = [int(dia) for dia in regla.dias_semana] or range(7)
+                desde = _franja(regla.hora_desde) if regla.hora_desde else 0
+                hasta = _franja(regla.hora_hasta) if regla.hora_hasta else FRANJAS_POR_DIA
+                for dia in dias:
+                    for franja in range(dia * FRANJAS_POR_DIA + desde, dia * FRANJAS_POR_DIA + hasta):
+                        ajustes[franja] += porcentaje
+            elif regla.clase == 'socio':
+                self.socio += porcentaje
+            elif regla.clase == 'duracion':
+                largas.append((int(regla.horas_minimas * 3600), porcentaje))
+        # Un lugar nunca sale gratis con saldo a favor aunque se acumulen descuentos.
+        self.ajustes = [max(ajuste, -CIEN_POR_CIENTO) for ajuste in ajustes]
+        self.acumulado = [0]
+        for ajuste in self.ajustes:
+            self.acumulado.append(self.acumulado[-1] + ajuste * SEGUNDOS_FRANJA)
+        # De más horas a menos: se aplica la primera que se cumpla.
+        self.largas = sorted(largas, reverse=True)
+
+    def _ajuste_hasta(self, segundos_locales):
+        """Suma de ajuste × segundo desde el lunes 5 de enero de 1970 hasta el instante dado."""
+        semanas, resto = divmod(segundos_locales - DESPLAZAMIENTO_LUNES, SEGUNDOS_SEMANA)
+        franja, dentro = divmod(resto, SEGUNDOS_FRANJA)
+        return semanas * self.acumulado[-1] + self.acumulado[franja] + self.ajustes[franja] * dentro
+
+    def centavos(self, inicio, fin, inicio_local, fin_local, socio):
+        """
+        Costo en centavos de una ventana dada en segundos desde la época: reales
+        (`inicio`, `fin`) y de reloj local (`inicio_local`, `fin_local`).
+        """
+        segundos = fin - inicio
+        base = segundos * CIEN_POR_CIENTO + self._ajuste_hasta(fin_local) - self._ajuste_hasta(inicio_local)
+        global_ = self.socio if socio else 0
+        for minimo, porcentaje in self.largas:
+            if segundos >= minimo:
+                global_ += porcentaje
+                break
+        numerador = self.precio_centavos * max(base, 0) * max(CIEN_POR_CIENTO + global_, 0)
+        denominador = 3600 * CIEN_POR_CIENTO * CIEN_POR_CIENTO
+        return (2 * numerador + denominador) // (2 * denominador)
+
+
+class Tarifario:
+    __slots__ = ('version', 'tipos', 'hay_reglas')
+
+    def __init__(self, version, tipos, reglas):
+        self.version = version
+        self.hay_reglas = bool(reglas)
+        generales = [regla for regla in reglas if regla.tipo_id is None]
+        self.tipos = {
+            tipo_id: TarifaTipo(precio, generales + [regla for regla in reglas if regla.tipo_id == tipo_id])
+            for tipo_id, precio in tipos
+        }
+
+
+_actual = None
+_lock = threading.Lock()
+
+
+def _construir(version):
+    from .models import ReglaTarifa, TipoLugar
+
+    return Tarifario(
+        version,
+        TipoLugar.objects.values_list('pk', 'precio_por_hora'),
+        list(ReglaTarifa.objects.filter(activo=True)),
+    )
+
+
+def tarifario_actual():
+    """Devuelve las tablas vigentes, reconstruyéndolas si cambió su versión."""
+    global _actual
+    version = version_publicada(CLAVE_VERSION)
+    tarifario = _actual
+    if tarifario is not None and tarifario.version == version:
+        return tarifario
+    with _lock:
+        if _actual is None or _actual.version != version:
+            _actual = _construir(version)
+        return _actual
+
+
+def tarifa_de(tipo_id):
+    """Tabla del tipo de lugar; si aún no está (tipo recién creado en esta transacción) se recompila."""
+    global _actual
+    tarifa = tarifario_actual().tipos.get(tipo_id)
+    if tarifa is None:
+        with _lock:
+            _actual = _construir(_actual.version)
+        tarifa = _actual.tipos[tipo_id]
+    return tarifa
+
+
+def invalidar():
+    """Publica una versión nueva; se llama desde las señales de `TipoLugar` y `ReglaTarifa`."""
+    publicar_version(CLAVE_VERSION)
+
+
+def descuenta_socios(tipo_id):
+    """Indica si el precio del tipo de lugar depende de que el usuario sea socio."""
+    return tarifa_de(tipo_id).socio != 0
+
+
+def segundos_locales(segundos, zona=None):
+    """Segundos desde la época según el reloj de la zona horaria (actual por defecto)."""
+    zona = zona or timezone.get_current_timezone()
+    offset = datetime.fromtimestamp(segundos, dt_timezone.utc).astimezone(zona).utcoffset()
+    return segundos + int(offset.total_seconds())
+
+
+def _a_decimal(centavos):
+    return Decimal(centavos).scaleb(-2)
+
+
+def cotizar_lote(tipo_id, ventanas, socio=False):
+    """Costos (Decimal con dos decimales) de una lista de ventanas (inicio, fin) con datetimes."""
+    tarifa = tarifa_de(tipo_id)
+    zona = timezone.get_current_timezone()
+    costos = []
+    for inicio, fin in ventanas:
+        inicio_s, fin_s = int(inicio.timestamp()), int(fin.timestamp())
+        costos.append(_a_decimal(tarifa.centavos(
+            inicio_s, fin_s, segundos_locales(inicio_s, zona), segundos_locales(fin_s, zona), socio,
+        )))
+    return costos
+
+
+def cotizar(tipo_id, inicio, fin, socio=False):
+    return cotizar_lote(tipo_id, [(inicio, fin)], socio)[0]
+
+
+def centavos_de_filas(filas, socios):
+    """
+    Cotiza filas de reservas ya leídas como segundos desde la época (claves
+    `tipo_id`, `usuario_id`, `inicio`, `fin`), como las de los reportes.
+    Genera pares (fila, centavos); `socios` es el conjunto de ids de usuarios
+    con descuento de socio.
+    """
+    tarifario = tarifario_actual()
+    zona = timezone.get_current_timezone()
+    for fila in filas:
+        tarifa = tarifario.tipos.get(fila['tipo_id']) or tarifa_de(fila['tipo_id'])
+        yield fila, tarifa.centavos(
+            fila['inicio'], fila['fin'],
+            segundos_locales(fila['inicio'], zona), segundos_locales(fila['fin'], zona),
+            fila['usuario_id'] in socios,
+        )
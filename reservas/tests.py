@@ -1,3 +1,278 @@
-from django.test import TestCase
+# reservas/tests.py
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .disponibilidad import IndiceDisponibilidad, indice_disponibilidad
+from .ical import token_de_usuario
+from .management.commands._datos_sinteticos import FECHA_BASE, GeneradorReservas, crear_catalogo
+from .management.commands.contencion_reservas import contar_dobles_reservas
+from .models import Reserva
+from .services import ConflictoReserva, consulta_solapamiento, guardar_reserva
+from .signals import notificar_cambios, reservas_modificadas
+
+
+class PlanSolapamientoTests(TestCase):
+    """La comprobación de solapamiento debe resolverse con `reserva_lugar_rango_idx`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        lugares, usuarios = crear_catalogo(num_lugares=10, num_usuarios=50)
+        GeneradorReservas(lugares, usuarios).generar(2000)
+        cls.lugar = lugares[0]
+        if connection.vendor in ('sqlite', 'postgresql'):
+            # Con estadísticas el planificador elige como en producción.
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def test_usa_indice_de_rango(self):
+        inicio = FECHA_BASE + timedelta(days=3)
+        for excluir_pk in (None, 1):
+            with self.subTest(excluir_pk=excluir_pk):
+                plan = consulta_solapamiento(
+                    self.lugar.pk, inicio, inicio + timedelta(hours=2), excluir_pk
+                ).explain()
+                self.assertIn('reserva_lugar_rango_idx', plan)
+
+
+class ReservasSimultaneasTests(TransactionTestCase):
+    """Varios socios reservan a la vez los mismos horarios de un lugar."""
+
+    HILOS = 50
+    HORARIOS = 5
+    # Cota holgada: aquí se miden ~150 intentos/s con 50 hilos sobre SQLite;
+    # bajar de esto indica que el bloqueo por lugar serializa de más o espera
+    # al timeout de la base de datos.
+    MIN_INTENTOS_POR_SEGUNDO = 25
+
+    def test_no_hay_reservas_dobles(self):
+        lugares, usuarios = crear_catalogo(num_lugares=1, num_usuarios=self.HILOS)
+        lugar = lugares[0]
+        horarios = [
+            (FECHA_BASE + timedelta(hours=i), FECHA_BASE + timedelta(hours=i + 1))
+            for i in range(self.HORARIOS)
+        ]
+        aceptadas, errores = [], []
+        barrera = threading.Barrier(self.HILOS)
+
+        def socio(usuario):
+            barrera.wait()
+            try:
+                for inicio, fin in horarios:
+                    try:
+                        guardar_reserva(Reserva(usuario=usuario, lugar=lugar, fecha_inicio=inicio, fecha_fin=fin))
+                        aceptadas.append((inicio, fin))
+                    except ConflictoReserva:
+                        pass
+                    except OperationalError as error:
+                        errores.append(error)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=socio, args=(usuario,)) for usuario in usuarios]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        self.assertEqual(errores, [])
+        self.assertEqual(contar_dobles_reservas(lugar.pk), 0)
+        self.assertEqual(sorted(aceptadas), horarios)
+        self.assertGreaterEqual(self.HILOS * self.HORARIOS / duracion, self.MIN_INTENTOS_POR_SEGUNDO)
+
+
+class RetencionListaEsperaTests(TestCase):
+    """La lista de espera solo se ofrece para horarios reservados, no para los retenidos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        lugares, usuarios = crear_catalogo(num_lugares=1, num_usuarios=3)
+        cls.lugar = lugares[0]
+        cls.usuarios = usuarios
+
+    def setUp(self):
+        cache.clear()
+        self.inicio = timezone.now().replace(microsecond=0) + timedelta(days=2)
+        self.datos = {
+            'lugar_id': self.lugar.pk,
+            'fecha_inicio': self.inicio.isoformat(),
+            'fecha_fin': (self.inicio + timedelta(hours=1)).isoformat(),
+        }
+
+    def retener(self, usuario):
+        self.client.force_login(usuario)
+        return self.client.post(reverse('reservas:retener_horario'), self.datos)
+
+    def test_horario_retenido_no_ofrece_lista_espera(self):
+        self.assertEqual(self.retener(self.usuarios[0]).status_code, 201)
+        respuesta = self.retener(self.usuarios[1])
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertFalse(respuesta.json()['reservado'])
+        espera = self.client.post(reverse('reservas:unirse_lista_espera'), self.datos)
+        self.assertEqual(espera.status_code, 409)
+
+    def test_horario_reservado_ofrece_lista_espera(self):
+        guardar_reserva(Reserva(
+            usuario=self.usuarios[0], lugar=self.lugar,
+            fecha_inicio=self.inicio, fecha_fin=self.inicio + timedelta(hours=1),
+        ))
+        respuesta = self.retener(self.usuarios[1])
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertTrue(respuesta.json()['reservado'])
+        espera = self.client.post(reverse('reservas:unirse_lista_espera'), self.datos)
+        self.assertEqual(espera.status_code, 201)
+
+    def test_reserva_que_el_indice_aun_no_ve_impide_retener(self):
+        fin = self.inicio + timedelta(hours=1)
+        self.assertFalse(indice_disponibilidad.hay_conflicto(self.lugar.pk, self.inicio, fin))
+        # Otro proceso confirma la reserva; bulk_create no avisa al índice de este.
+        Reserva.objects.bulk_create([Reserva(
+            usuario=self.usuarios[0], lugar=self.lugar, fecha_inicio=self.inicio, fecha_fin=fin, estado='confirmada',
+        )])
+        self.assertEqual(self.retener(self.usuarios[1]).status_code, 409)
+
+
+class NotificarCambiosTests(TestCase):
+    """Un receptor de `reservas_modificadas` que falla no detiene a los demás."""
+
+    def test_receptor_que_falla_no_impide_los_siguientes(self):
+        recibidos = []
+
+        def roto(sender, cambios, **kwargs):
+            raise RuntimeError('receptor roto')
+
+        def sano(sender, cambios, **kwargs):
+            recibidos.extend(cambios)
+
+        reservas_modificadas.connect(roto, weak=False)
+        reservas_modificadas.connect(sano, weak=False)
+        self.addCleanup(reservas_modificadas.disconnect, roto)
+        self.addCleanup(reservas_modificadas.disconnect, sano)
+
+        cambio = (None, {'pk': 1})
+        with self.assertLogs('reservas.signals', level='ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                notificar_cambios([cambio])
+        self.assertEqual(recibidos, [cambio])
+
+
+class CalendarioIcalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        lugares, usuarios = crear_catalogo(num_lugares=1, num_usuarios=1)
+        cls.lugar, cls.usuario = lugares[0], usuarios[0]
+        Reserva.objects.create(
+            usuario=cls.usuario, lugar=cls.lugar,
+            fecha_inicio=FECHA_BASE, fecha_fin=FECHA_BASE + timedelta(hours=1),
+        )
+
+    def url(self):
+        self.usuario.refresh_from_db()
+        return reverse('reservas:calendario_socio', args=[token_de_usuario(self.usuario)])
+
+    def test_regenerar_clave_revoca_el_enlace_anterior(self):
+        anterior = self.url()
+        self.assertEqual(self.client.get(anterior).status_code, 200)
+        self.client.force_login(self.usuario)
+        self.client.post(reverse('reservas:regenerar_enlace_calendario'))
+        nuevo = self.url()
+        self.assertNotEqual(nuevo, anterior)
+        self.assertEqual(self.client.get(anterior).status_code, 404)
+        self.assertEqual(self.client.get(nuevo).status_code, 200)
+
+    def test_renombrar_lugar_cambia_el_etag(self):
+        url = self.url()
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lugar.nombre = 'Sala renombrada'
+            self.lugar.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Sala renombrada', b''.join(respuesta.streaming_content).decode())
+
+    def test_renombrar_socio_cambia_el_etag_del_lugar(self):
+        staff = get_user_model().objects.create_user('staff@example.com', 'clave', is_staff=True)
+        url = reverse('reservas:calendario_lugar', args=[token_de_usuario(staff), self.lugar.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.usuario.first_name = 'Renombrado'
+        self.usuario.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Renombrado', b''.join(respuesta.streaming_content).decode())
+
+
+class IndiceCompartidoTests(TestCase):
+    """Dos índices (como dos procesos) que comparten la caché de versiones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        lugares, usuarios = crear_catalogo(num_lugares=1, num_usuarios=1)
+        cls.lugar, cls.usuario = lugares[0], usuarios[0]
+
+    def setUp(self):
+        self.a, self.b = IndiceDisponibilidad(), IndiceDisponibilidad()
+
+    def crear(self, horas):
+        """Crea una reserva sin señales y devuelve (pk, inicio, fin)."""
+        inicio = FECHA_BASE + timedelta(hours=horas)
+        reserva = Reserva.objects.bulk_create([Reserva(
+            usuario=self.usuario, lugar=self.lugar, fecha_inicio=inicio, fecha_fin=inicio + timedelta(hours=1),
+        )])[0]
+        return reserva.pk, inicio, inicio + timedelta(hours=1)
+
+    def publicar_a_la_vez(self):
+        """Cada índice registra una reserva distinta del lugar desde su propio hilo, a la vez."""
+        for indice in (self.a, self.b):
+            self.assertFalse(indice.hay_conflicto(self.lugar.pk, FECHA_BASE, FECHA_BASE + timedelta(hours=4)))
+        primera, segunda = self.crear(0), self.crear(2)
+        hilos = [
+            threading.Thread(target=indice.registrar, args=(pk, self.lugar.pk, inicio, fin, True))
+            for indice, (pk, inicio, fin) in ((self.a, primera), (self.b, segunda))
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return primera, segunda
+
+    def comprobar_que_ambos_ven_ambas(self, primera, segunda):
+        for indice in (self.a, self.b):
+            for _, inicio, fin in (primera, segunda):
+                self.assertTrue(indice.hay_conflicto(self.lugar.pk, inicio, fin))
+
+    def test_cache_con_incr_atomico(self):
+        cache.clear()
+        self.comprobar_que_ambos_ven_ambas(*self.publicar_a_la_vez())
+
+    def test_cache_en_disco_con_incr_no_atomico(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        barrera = threading.Barrier(2, timeout=2)
+
+        def incr_con_carrera(backend, clave, delta=1, version=None):
+            # Como `BaseCache.incr`, pero forzando que los dos hilos lean antes de escribir.
+            valor = backend.get(clave, version=version)
+            barrera.wait()
+            backend.set(clave, valor + delta, version=version)
+            return valor + delta
+
+        ajustes = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                               'LOCATION': directorio}}
+        with override_settings(CACHES=ajustes), mock.patch.object(FileBasedCache, 'incr', incr_con_carrera):
+            self.comprobar_que_ambos_ven_ambas(*self.publicar_a_la_vez())
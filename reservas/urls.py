@@ -5,9 +5,24 @@ app_name = 'reservas'
 
 urlpatterns = [
     path('lugares/', views.LugarListView.as_view(), name='lugares_list'),
+    path('lugares/buscar/', views.buscar_lugares, name='buscar_lugares'),
+    path('lugares/buscar.json', views.buscar_lugares_json, name='buscar_lugares_json'),
+    path('cotizacion/', views.cotizar_ventanas, name='cotizar_ventanas'),
+    path('catalogo.json', views.catalogo_lugares, name='catalogo_lugares'),
     path('nueva/', views.ReservaCreateView.as_view(), name='nueva_reserva'),
+    path('serie/nueva/', views.SerieReservaCreateView.as_view(), name='nueva_serie'),
     path('mis-reservas/', views.MisReservasView.as_view(), name='mis_reservas'),
     path('reserva/<int:pk>/', views.ReservaDetailView.as_view(), name='reserva_detail'),
     path('cancelar/<int:pk>/', views.cancelar_reserva, name='cancelar_reserva'),
+    path('lugares/<int:pk>/huecos/', views.huecos_disponibles, name='huecos_disponibles'),
+    path('retenciones/', views.retener_horario, name='retener_horario'),
+    path('retenciones/<str:token>/liberar/', views.liberar_retencion, name='liberar_retencion'),
+    path('lista-espera/', views.unirse_lista_espera, name='unirse_lista_espera'),
+    path('lista-espera/<int:pk>/cancelar/', views.cancelar_solicitud_espera, name='cancelar_solicitud_espera'),
+    path('calendario/regenerar/', views.regenerar_enlace_calendario, name='regenerar_enlace_calendario'),
+    path('calendario/<str:token>/mis-reservas.ics', views.calendario_socio, name='calendario_socio'),
+    path('calendario/<str:token>/lugares/<int:pk>.ics', views.calendario_lugar, name='calendario_lugar'),
+    path('calendario/', views.calendario_ocupacion, name='calendario_ocupacion'),
+    path('disponibilidad/matriz/', views.disponibilidad_lugares, name='disponibilidad_lugares'),
     path('verificar-disponibilidad/', views.verificar_disponibilidad, name='verificar_disponibilidad'),
 ]
\ No newline at end of file
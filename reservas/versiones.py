@@ -0,0 +1,27 @@
+# reservas/versiones.py
+"""
+Versiones compartidas entre procesos para las estructuras que cada proceso
+guarda en memoria (catálogo, tarifas...). La versión vive en la caché; quien
+cambia los datos publica una nueva y cada proceso reconstruye su copia cuando
+la versión publicada ya no coincide con la suya.
+"""
+import uuid
+
+from django.core.cache import cache
+
+
+def version_publicada(clave):
+    version = cache.get(clave)
+    if version is None:
+        # Caché vacía o clave expulsada: se publica una versión nueva para que
+        # todos los procesos reconstruyan en lugar de fiarse de su copia.
+        version = uuid.uuid4().hex
+        if not cache.add(clave, version, timeout=None):
+            version = cache.get(clave, version)
+    return version
+
+
+def publicar_version(clave):
+    # Valor único (no un contador) para que una clave expulsada de la caché
+    # nunca vuelva a coincidir con una versión antigua.
+    cache.set(clave, uuid.uuid4().hex, timeout=None)
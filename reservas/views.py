@@ -1,18 +1,38 @@
 # reservas/views.py
 
 import json
-from django.core.serializers.json import DjangoJSONEncoder # 1. IMPORTAR EL CODIFICADOR
-from django.shortcuts import get_object_or_404, redirect
+from datetime import timedelta
+from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
-from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.urls import reverse, reverse_lazy
+from django.contrib.auth import get_user_model
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.db import transaction
+from django.utils import timezone
 from django.contrib.messages.views import SuccessMessageMixin
 
-from .models import Lugar, Reserva
-from .forms import ReservaForm, LugarForm
+from .models import Lugar, Reserva, SerieReserva, OcupacionDiaria, SolicitudEspera
+from . import lista_espera
+from .ocupacion import calendario_mensual
+from .catalogo import catalogo_actual
+from .ical import generar_calendario, regenerar_clave, token_de_usuario, usuario_del_token, version_de
+from .forms import ReservaForm, LugarForm, SerieReservaForm, BusquedaLugaresForm
+from .busqueda import lugares_libres
+from .tarifas import cotizar_lote
+from .services import MENSAJE_RETENIDO, ConflictoReserva, guardar_reserva, crear_serie, crear_retencion
+from .retenciones import RetencionNoDisponible, hay_retencion_ajena, liberar, liberar_horario
+from .disponibilidad import (
+    indice_disponibilidad,
+    parsear_fecha,
+    huecos_de_lugar,
+    matriz_disponibilidad,
+)
 
 # ==============================================================================
 # VISTAS PÚBLICAS (PARA SOCIOS)
@@ -31,6 +51,55 @@ class LugarListView(ListView):
         return Lugar.objects.filter(activo=True, tipo__activo=True).select_related('tipo')
 
 
+def _buscar_lugares(request):
+    """Valida los criterios de la búsqueda y devuelve (formulario, lugares libres o None)."""
+    form = BusquedaLugaresForm(request.GET or None)
+    if not form.is_valid():
+        return form, None
+    datos = form.cleaned_data
+    return form, lugares_libres(
+        datos["fecha_inicio"],
+        datos["fecha_fin"],
+        personas=datos["personas"],
+        tipo_id=datos["tipo"].pk if datos["tipo"] else None,
+        precio_min=datos["precio_min"],
+        precio_max=datos["precio_max"],
+        orden=datos["orden"],
+        usuario_id=request.user.pk,
+        socio=request.user.is_authenticated and request.user.es_socio,
+    )
+
+
+def buscar_lugares(request):
+    """Busca los lugares libres en un horario que cumplen capacidad, tipo y precio."""
+    form, lugares = _buscar_lugares(request)
+    return render(request, "reservas/buscar_lugares.html", {
+        "form": form,
+        "lugares": lugares,
+        "fecha_inicio": request.GET.get("fecha_inicio", ""),
+        "fecha_fin": request.GET.get("fecha_fin", ""),
+    })
+
+
+def buscar_lugares_json(request):
+    form, lugares = _buscar_lugares(request)
+    if lugares is None:
+        return JsonResponse({"mensaje": "Datos de consulta inválidos", "errores": form.errors}, status=400)
+    return JsonResponse({
+        "lugares": [
+            {
+                "id": lugar.pk,
+                "nombre": lugar.nombre,
+                "tipo": lugar.tipo.nombre,
+                "capacidad": lugar.tipo.capacidad_maxima,
+                "precio_por_hora": lugar.tipo.precio_por_hora,
+                "costo": lugar.costo,
+            }
+            for lugar in lugares
+        ],
+    })
+
+
 class LugarDetailView(DetailView):
     model = Lugar
     template_name = 'reservas/lugar_detail.html'
@@ -46,35 +115,87 @@ class ReservaCreateView(LoginRequiredMixin, CreateView):
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
         form.fields['lugar'].queryset = Lugar.objects.filter(tipo__activo=True)
+        # Las opciones salen de la instantánea del catálogo: mostrar el
+        # formulario no consulta los lugares (validar el envío sí, con un get()).
+        form.fields['lugar'].choices = [("", "---------")] + catalogo_actual().opciones
         return form
 
     def get_initial(self):
         initial = super().get_initial()
         lugar_id = self.request.GET.get('lugar')
-        if lugar_id:
-            try:
-                lugar = Lugar.objects.get(pk=lugar_id, tipo__activo=True)
-                initial['lugar'] = lugar
-            except Lugar.DoesNotExist:
-                pass
+        if lugar_id and lugar_id.isdigit() and int(lugar_id) in catalogo_actual().lugares:
+            initial['lugar'] = int(lugar_id)
+        # Horario elegido en la búsqueda de lugares libres.
+        for campo in ('fecha_inicio', 'fecha_fin'):
+            fecha = parsear_fecha(self.request.GET.get(campo))
+            if fecha:
+                initial[campo] = timezone.localtime(fecha)
         return initial
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        lugares_qs = Lugar.objects.filter(tipo__activo=True).values(
-            'id',
-            'nombre',
-            'tipo__capacidad_maxima',
-            'tipo__precio_por_hora'
+        # La URL lleva la versión del catálogo, así el navegador puede guardarlo
+        # en caché hasta que cambie algún lugar.
+        context['url_catalogo'] = (
+            f"{reverse('reservas:catalogo_lugares')}?v={catalogo_actual().version}"
         )
-        # 2. USAR EL CODIFICADOR PARA MANEJAR TIPOS DECIMAL
-        context['lugares_data_json'] = json.dumps(list(lugares_qs), cls=DjangoJSONEncoder)
         return context
 
     def form_valid(self, form):
         form.instance.usuario = self.request.user
+        # Se vuelve a comprobar el horario con el lugar bloqueado: la validación
+        # del formulario no impide que otra petición simultánea ocupe el hueco.
+        try:
+            self.object = guardar_reserva(form.save(commit=False))
+        except ConflictoReserva as error:
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
+        # La retención que el socio tomó para este horario ya no hace falta.
+        reserva = self.object
+        transaction.on_commit(lambda: liberar_horario(
+            reserva.usuario_id, reserva.lugar_id, reserva.fecha_inicio, reserva.fecha_fin
+        ))
         messages.success(self.request, "Tu solicitud de reserva ha sido enviada con éxito.")
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
+
+
+class SerieReservaCreateView(LoginRequiredMixin, CreateView):
+    """
+    Crea de una vez todas las reservas de una serie. Las ocurrencias que chocan
+    con reservas existentes se informan y el resto se crea igualmente.
+    """
+    model = SerieReserva
+    form_class = SerieReservaForm
+    template_name = 'reservas/serie_form.html'
+
+    def get_initial(self):
+        initial = super().get_initial()
+        lugar_id = self.request.GET.get('lugar')
+        if lugar_id and lugar_id.isdigit():
+            initial['lugar'] = lugar_id
+        return initial
+
+    def form_valid(self, form):
+        serie = form.save(commit=False)
+        serie.usuario = self.request.user
+        resultados = crear_serie(
+            serie,
+            form.cleaned_data['fecha_inicio'],
+            form.cleaned_data['fecha_fin'],
+            proposito=form.cleaned_data['proposito'],
+            notas_adicionales=form.cleaned_data['notas_adicionales'],
+        )
+        creadas = sum(1 for _, _, reserva in resultados if reserva)
+        if creadas:
+            messages.success(self.request, f"Se enviaron {creadas} de {len(resultados)} reservas de la serie.")
+        else:
+            messages.error(self.request, "Ninguna reserva de la serie estaba disponible.")
+        return render(self.request, 'reservas/serie_resultado.html', {
+            'serie': serie,
+            'resultados': resultados,
+            'creadas': creadas,
+            'rechazadas': len(resultados) - creadas,
+        })
 
 
 class MisReservasView(LoginRequiredMixin, ListView):
@@ -88,6 +209,16 @@ class MisReservasView(LoginRequiredMixin, ListView):
             "lugar", "lugar__tipo"
         ).order_by('-fecha_inicio')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["url_calendario"] = self.request.build_absolute_uri(
+            reverse("reservas:calendario_socio", args=[token_de_usuario(self.request.user)])
+        )
+        context["solicitudes_espera"] = SolicitudEspera.objects.filter(
+            usuario=self.request.user, estado="esperando", fecha_inicio__gt=timezone.now()
+        ).select_related("lugar")
+        return context
+
 
 class ReservaDetailView(LoginRequiredMixin, DetailView):
     model = Reserva
@@ -103,7 +234,7 @@ class ReservaDetailView(LoginRequiredMixin, DetailView):
 @login_required
 def cancelar_reserva(request, pk):
     reserva = get_object_or_404(Reserva, pk=pk, usuario=request.user)
-    if reserva.estado in ["pendiente", "aprobada"]:
+    if reserva.estado in ["pendiente", "confirmada"]:
         reserva.estado = "cancelada"
         reserva.save()
         messages.success(request, "Reserva cancelada exitosamente.")
@@ -111,6 +242,61 @@ def cancelar_reserva(request, pk):
         messages.error(request, f"No se puede cancelar una reserva en estado '{reserva.estado}'.")
     return redirect("reservas:mis_reservas")
 
+@login_required
+@require_POST
+def unirse_lista_espera(request):
+    """
+    Apunta al socio en la lista de espera de un horario ocupado. Responde 201
+    con {"id", "posicion"}; cuando el horario se libere se creará la reserva
+    pendiente y se le avisará por correo, sin que tenga que seguir consultando.
+    """
+    lugar_id = request.POST.get("lugar_id", "")
+    fecha_inicio = parsear_fecha(request.POST.get("fecha_inicio"))
+    fecha_fin = parsear_fecha(request.POST.get("fecha_fin"))
+    if not lugar_id.isdigit() or not fecha_inicio or not fecha_fin or fecha_fin <= fecha_inicio:
+        return JsonResponse({"mensaje": "Datos de consulta inválidos"}, status=400)
+    if fecha_inicio <= timezone.now():
+        return JsonResponse({"mensaje": "El horario ya pasó"}, status=400)
+    lugar = Lugar.objects.filter(pk=int(lugar_id), activo=True, tipo__activo=True).first()
+    if lugar is None:
+        return JsonResponse({"mensaje": "Datos de consulta inválidos"}, status=400)
+
+    try:
+        ocupado = indice_disponibilidad.hay_conflicto(lugar.pk, fecha_inicio, fecha_fin)
+    except KeyError:
+        ocupado = False
+    if not ocupado:
+        return JsonResponse({"mensaje": "El horario está libre; puede reservarlo ahora"}, status=409)
+
+    solicitudes = SolicitudEspera.objects.filter(usuario=request.user, estado="esperando")
+    existente = solicitudes.filter(lugar=lugar, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin).first()
+    if existente is None:
+        if solicitudes.filter(fecha_inicio__gt=timezone.now()).count() >= lista_espera.MAX_SOLICITUDES_POR_USUARIO:
+            return JsonResponse({
+                "mensaje": f"Solo puede esperar {lista_espera.MAX_SOLICITUDES_POR_USUARIO} horarios a la vez"
+            }, status=400)
+        existente = SolicitudEspera.objects.create(
+            usuario=request.user,
+            lugar=lugar,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            proposito=request.POST.get("proposito", "")[:255],
+        )
+    return JsonResponse({"id": existente.pk, "posicion": lista_espera.posicion(existente)}, status=201)
+
+
+@login_required
+@require_POST
+def cancelar_solicitud_espera(request, pk):
+    actualizadas = SolicitudEspera.objects.filter(pk=pk, usuario=request.user, estado="esperando").update(
+        estado="cancelada"
+    )
+    if actualizadas:
+        messages.success(request, "Ha salido de la lista de espera.")
+    else:
+        messages.error(request, "La solicitud ya no está en espera.")
+    return redirect("reservas:mis_reservas")
+
 # ==============================================================================
 # VISTA PARA AJAX
 # ==============================================================================
@@ -118,23 +304,291 @@ def cancelar_reserva(request, pk):
 def verificar_disponibilidad(request):
     if request.method == "GET":
         lugar_id = request.GET.get("lugar_id")
-        fecha_inicio = request.GET.get("fecha_inicio")
-        fecha_fin = request.GET.get("fecha_fin")
+        fecha_inicio = parsear_fecha(request.GET.get("fecha_inicio"))
+        fecha_fin = parsear_fecha(request.GET.get("fecha_fin"))
 
-        if lugar_id and fecha_inicio and fecha_fin:
+        if lugar_id and lugar_id.isdigit() and fecha_inicio and fecha_fin:
+            # Se responde desde el índice en memoria y las retenciones en caché,
+            # sin consultar la base de datos.
             try:
-                lugar = Lugar.objects.get(id=lugar_id)
-                conflictos = Reserva.objects.filter(
-                    lugar=lugar,
-                    fecha_inicio__lt=fecha_fin,
-                    fecha_fin__gt=fecha_inicio,
-                ).exclude(estado='cancelada').exists()
+                conflictos = indice_disponibilidad.hay_conflicto(int(lugar_id), fecha_inicio, fecha_fin)
+                conflictos = conflictos or hay_retencion_ajena(
+                    int(lugar_id), fecha_inicio, fecha_fin, request.user.pk
+                )
                 return JsonResponse({"disponible": not conflictos})
-            except Lugar.DoesNotExist:
+            except KeyError:
                 pass
     return JsonResponse({"disponible": False, "mensaje": "Datos de consulta inválidos"}, status=400)
 
 
+# Límites de la búsqueda de huecos para acotar el tamaño de la respuesta.
+MAX_DIAS_BUSQUEDA_HUECOS = 31
+DURACION_HUECO_POR_DEFECTO = 60  # minutos
+
+
+@login_required
+def huecos_disponibles(request, pk):
+    """
+    Devuelve los huecos libres de un lugar entre `desde` y `hasta` que duren
+    al menos `duracion` minutos.
+    """
+    lugar = get_object_or_404(Lugar, pk=pk, tipo__activo=True)
+    desde = parsear_fecha(request.GET.get("desde"))
+    hasta = parsear_fecha(request.GET.get("hasta"))
+    duracion = request.GET.get("duracion", str(DURACION_HUECO_POR_DEFECTO))
+
+    if not desde or not hasta or not duracion.isdigit() or int(duracion) <= 0 or hasta <= desde:
+        return JsonResponse({"mensaje": "Datos de consulta inválidos"}, status=400)
+    if hasta - desde > timedelta(days=MAX_DIAS_BUSQUEDA_HUECOS):
+        return JsonResponse(
+            {"mensaje": f"El rango no puede superar {MAX_DIAS_BUSQUEDA_HUECOS} días"}, status=400
+        )
+
+    huecos = huecos_de_lugar(
+        lugar.pk, desde, hasta, timedelta(minutes=int(duracion)), usuario_id=request.user.pk
+    )
+    return JsonResponse({
+        "lugar_id": lugar.pk,
+        "huecos": [
+            {"inicio": timezone.localtime(inicio), "fin": timezone.localtime(fin)}
+            for inicio, fin in huecos
+        ],
+    })
+
+
+@login_required
+@require_POST
+def retener_horario(request):
+    """
+    Retiene temporalmente un horario mientras el socio completa el formulario.
+    Responde 201 con {"token", "expira"} o 409 si el horario ya está reservado
+    o retenido por otro socio; "reservado" indica cuál de los dos, porque solo
+    un horario reservado admite lista de espera (la retención caduca sola en
+    pocos minutos). Cada socio mantiene una sola retención.
+    """
+    lugar_id = request.POST.get("lugar_id", "")
+    fecha_inicio = parsear_fecha(request.POST.get("fecha_inicio"))
+    fecha_fin = parsear_fecha(request.POST.get("fecha_fin"))
+    if not lugar_id.isdigit() or not fecha_inicio or not fecha_fin or fecha_fin <= fecha_inicio:
+        return JsonResponse({"mensaje": "Datos de consulta inválidos"}, status=400)
+
+    try:
+        retencion = crear_retencion(request.user.pk, int(lugar_id), fecha_inicio, fecha_fin)
+    except KeyError:
+        return JsonResponse({"mensaje": "Datos de consulta inválidos"}, status=400)
+    except RetencionNoDisponible:
+        return JsonResponse({"mensaje": "Inténtelo de nuevo en unos segundos"}, status=503)
+    if retencion is None:
+        if indice_disponibilidad.hay_conflicto(int(lugar_id), fecha_inicio, fecha_fin):
+            return JsonResponse({"mensaje": "El horario ya no está disponible", "reservado": True}, status=409)
+        return JsonResponse({"mensaje": MENSAJE_RETENIDO, "reservado": False}, status=409)
+    token, expira = retencion
+    return JsonResponse({"token": token, "expira": timezone.localtime(expira)}, status=201)
+
+
+@login_required
+@require_POST
+def liberar_retencion(request, token):
+    """Libera una retención del socio antes de que caduque."""
+    try:
+        liberada = liberar(token, request.user.pk)
+    except RetencionNoDisponible:
+        return JsonResponse({"mensaje": "Inténtelo de nuevo en unos segundos"}, status=503)
+    if not liberada:
+        return JsonResponse({"mensaje": "Retención no encontrada"}, status=404)
+    return JsonResponse({"liberada": True})
+
+
+MAX_LUGARES_MATRIZ = 100
+MAX_VENTANAS_MATRIZ = 500
+
+
+@login_required
+@require_POST
+def disponibilidad_lugares(request):
+    """
+    Matriz de disponibilidad para el personal.
+
+    Recibe un JSON {"lugares": [id, ...], "ventanas": [[inicio, fin], ...]} y
+    responde {"lugares": [id, ...], "disponible": ["1010...", ...]}, una cadena
+    por lugar con un carácter por ventana ('1' libre, '0' ocupado). Los ids que
+    no corresponden a lugares activos se devuelven en "ignorados".
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"mensaje": "No autorizado"}, status=403)
+    try:
+        datos = json.loads(request.body)
+        ids = [int(lugar_id) for lugar_id in datos["lugares"]]
+        ventanas = [(parsear_fecha(inicio), parsear_fecha(fin)) for inicio, fin in datos["ventanas"]]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({"mensaje": "Datos de consulta inválidos"}, status=400)
+
+    if any(not inicio or not fin or fin <= inicio for inicio, fin in ventanas):
+        return JsonResponse({"mensaje": "Ventanas inválidas"}, status=400)
+    if len(ids) > MAX_LUGARES_MATRIZ or len(ventanas) > MAX_VENTANAS_MATRIZ:
+        return JsonResponse({
+            "mensaje": f"Máximo {MAX_LUGARES_MATRIZ} lugares y {MAX_VENTANAS_MATRIZ} ventanas por consulta"
+        }, status=400)
+
+    activos = set(
+        Lugar.objects.filter(pk__in=ids, activo=True, tipo__activo=True).values_list("pk", flat=True)
+    )
+    lugar_ids = [lugar_id for lugar_id in dict.fromkeys(ids) if lugar_id in activos]
+    matriz = matriz_disponibilidad(lugar_ids, ventanas)
+    return JsonResponse({
+        "lugares": lugar_ids,
+        "disponible": ["".join("1" if libre else "0" for libre in matriz[lugar_id]) for lugar_id in lugar_ids],
+        "ignorados": [lugar_id for lugar_id in dict.fromkeys(ids) if lugar_id not in activos],
+    })
+
+
+MAX_LUGARES_CALENDARIO = 50
+
+
+def calendario_ocupacion(request):
+    """
+    Ocupación de un mes para uno o varios lugares: `?lugares=1,2&mes=2025-09`.
+
+    Por cada lugar se devuelve {fecha: máscara}, donde la máscara es un número
+    hexadecimal de 96 bits y el bit i (desde el menos significativo) indica
+    que la franja de 15 minutos i del día está ocupada. Se lee solo la tabla
+    precalculada OcupacionDiaria.
+    """
+    try:
+        anio, mes = (int(parte) for parte in request.GET.get("mes", "").split("-"))
+        ids = [int(lugar_id) for lugar_id in request.GET.get("lugares", "").split(",") if lugar_id]
+        if not 1 <= mes <= 12 or not ids:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"mensaje": "Datos de consulta inválidos"}, status=400)
+    if len(ids) > MAX_LUGARES_CALENDARIO:
+        return JsonResponse({"mensaje": f"Máximo {MAX_LUGARES_CALENDARIO} lugares por consulta"}, status=400)
+
+    lugar_ids = list(
+        Lugar.objects.filter(pk__in=ids, activo=True, tipo__activo=True).values_list("pk", flat=True)
+    )
+    return JsonResponse({
+        "mes": f"{anio:04d}-{mes:02d}",
+        "minutos_por_franja": OcupacionDiaria.MINUTOS_POR_FRANJA,
+        "lugares": calendario_mensual(lugar_ids, anio, mes),
+    })
+
+
+MAX_VENTANAS_COTIZACION = 50
+
+
+@login_required
+def cotizar_ventanas(request):
+    """
+    Cotiza de una vez varias ventanas de un lugar para el socio:
+    `?lugar_id=..&ventana=<inicio>/<fin>&ventana=...` (fechas ISO). Devuelve
+    los costos en el mismo orden, como texto decimal.
+    """
+    lugar_id = request.GET.get("lugar_id", "")
+    tipo_id = None
+    if lugar_id.isdigit():
+        datos = catalogo_actual().lugares.get(int(lugar_id))
+        tipo_id = datos and datos["tipo_id"]
+    ventanas = []
+    for ventana in request.GET.getlist("ventana"):
+        inicio, _, fin = ventana.partition("/")
+        inicio, fin = parsear_fecha(inicio), parsear_fecha(fin)
+        if not inicio or not fin or fin <= inicio:
+            ventanas = None
+            break
+        ventanas.append((inicio, fin))
+    if tipo_id is None or not ventanas:
+        return JsonResponse({"mensaje": "Datos de consulta inválidos"}, status=400)
+    if len(ventanas) > MAX_VENTANAS_COTIZACION:
+        return JsonResponse({"mensaje": f"Máximo {MAX_VENTANAS_COTIZACION} ventanas por consulta"}, status=400)
+    costos = cotizar_lote(tipo_id, ventanas, socio=request.user.es_socio)
+    return JsonResponse({"lugar_id": int(lugar_id), "costos": costos})
+
+
+def catalogo_lugares(request):
+    """
+    Catálogo de lugares reservables en JSON, servido desde la instantánea en
+    memoria. Con `?v=` igual a la versión vigente se puede guardar en caché
+    indefinidamente; sin ella, el navegador lo revalida con el ETag.
+    """
+    catalogo = catalogo_actual()
+    respuesta = get_conditional_response(request, etag=catalogo.etag)
+    if respuesta is None:
+        respuesta = HttpResponse(catalogo.json, content_type="application/json")
+    respuesta["ETag"] = catalogo.etag
+    if request.GET.get("v") == catalogo.version:
+        respuesta["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        respuesta["Cache-Control"] = "public, no-cache"
+    return respuesta
+
+
+# ==============================================================================
+# CALENDARIOS ICS
+# ==============================================================================
+def _respuesta_calendario(request, consulta, nombre, resumen, archivo, con_usuarios=False):
+    """
+    Responde 304 si el cliente ya tiene la versión actual (ETag o
+    If-Modified-Since); si no, transmite el calendario por fragmentos.
+    `con_usuarios` indica que `resumen` muestra el nombre del socio.
+    """
+    etag, ultima = version_de(consulta, con_usuarios=con_usuarios)
+    ultima = int(ultima.timestamp()) if ultima else None
+    respuesta = get_conditional_response(request, etag=etag, last_modified=ultima)
+    if respuesta is None:
+        respuesta = StreamingHttpResponse(
+            generar_calendario(consulta, nombre, request.get_host().split(":")[0], resumen),
+            content_type="text/calendar; charset=utf-8",
+        )
+        respuesta["Content-Disposition"] = f'inline; filename="{archivo}"'
+    respuesta["ETag"] = etag
+    if ultima:
+        respuesta["Last-Modified"] = http_date(ultima)
+    respuesta["Cache-Control"] = "private, no-cache"
+    return respuesta
+
+
+@login_required
+@require_POST
+def regenerar_enlace_calendario(request):
+    """Cambia la clave de calendario del socio: los enlaces .ics anteriores dejan de funcionar."""
+    regenerar_clave(request.user)
+    messages.success(request, "Se generó un enlace de calendario nuevo; el anterior ya no funciona.")
+    return redirect("reservas:mis_reservas")
+
+
+def calendario_socio(request, token):
+    """Calendario .ics con todas las reservas del socio dueño del token."""
+    filtro = usuario_del_token(token)
+    if filtro is None or not get_user_model().objects.filter(is_active=True, **filtro).exists():
+        raise Http404
+    return _respuesta_calendario(
+        request,
+        Reserva.objects.filter(usuario_id=filtro["pk"]),
+        "Mis reservas - Cámara de Comercio de Loja",
+        lambda fila: fila["proposito"] or f"Reserva en {fila['lugar__nombre']}",
+        "mis-reservas.ics",
+    )
+
+
+def calendario_lugar(request, token, pk):
+    """Calendario .ics con todas las reservas de un lugar; el token debe ser de un usuario staff."""
+    filtro = usuario_del_token(token)
+    if filtro is None or not get_user_model().objects.filter(is_active=True, is_staff=True, **filtro).exists():
+        raise Http404
+    lugar = get_object_or_404(Lugar, pk=pk)
+    return _respuesta_calendario(
+        request,
+        Reserva.objects.filter(lugar_id=lugar.pk),
+        f"Reservas de {lugar.nombre}",
+        lambda fila: " - ".join(filter(None, [
+            f"{fila['usuario__first_name']} {fila['usuario__last_name']}".strip(), fila["proposito"]
+        ])) or "Reserva",
+        f"lugar-{lugar.pk}.ics",
+        con_usuarios=True,
+    )
+
+
 # ==============================================================================
 # VISTAS DEL PANEL DE ADMINISTRACIÓN (Mover a 'panel.views' en el futuro)
 # ==============================================================================
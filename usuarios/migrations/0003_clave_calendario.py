@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_alter_usuario_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='clave_calendario',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
@@ -39,6 +39,8 @@ class Usuario(AbstractUser):
     # Campos adicionales para todos los usuarios.
     cedula = models.CharField(max_length=20, unique=True, blank=True, null=True)
     telefono = models.CharField(max_length=20, blank=True, null=True)
+    # Secreto de los enlaces de calendario (.ics); cambiarlo revoca los enlaces anteriores.
+    clave_calendario = models.CharField(max_length=32, blank=True, editable=False)
 
     # Se configura el email como el campo para iniciar sesión.
     USERNAME_FIELD = 'email'